@@ -1,7 +1,8 @@
 CREATE TABLE indexes (
     id SERIAL PRIMARY KEY,
     name TEXT NOT NULL UNIQUE,
-    source_url TEXT NOT NULL
+    source_url TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'ready' -- 'ingesting' until an ingest completes
 );
 
 CREATE TABLE chunks (
@@ -9,6 +10,8 @@ CREATE TABLE chunks (
     content TEXT NOT NULL,
     embedding vector(1536) NOT NULL,
     url TEXT NOT NULL,
+    section TEXT NOT NULL DEFAULT '',
+    content_hash BYTEA, -- sha256 of content
     index_id INTEGER NOT NULL,
     CONSTRAINT fk_index_id
         FOREIGN KEY(index_id)
@@ -19,3 +22,21 @@ CREATE TABLE chunks (
 CREATE INDEX ON chunks (index_id); -- WHERE
 
 CREATE INDEX ON chunks USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);  -- ORDER BY <=>
+
+CREATE TABLE embedding_cache (
+    model TEXT NOT NULL,
+    content_hash BYTEA NOT NULL, -- sha256 of the embedded text
+    embedding vector(1536) NOT NULL,
+    PRIMARY KEY (model, content_hash)
+);
+
+CREATE TABLE ingest_checkpoints (
+    index_id INTEGER NOT NULL,
+    url TEXT NOT NULL, -- page whose chunks are all stored
+    chunk_count INTEGER NOT NULL,
+    PRIMARY KEY (index_id, url),
+    CONSTRAINT fk_index_id
+        FOREIGN KEY(index_id)
+        REFERENCES indexes(id)
+        ON DELETE CASCADE
+);
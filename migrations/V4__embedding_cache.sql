@@ -0,0 +1,6 @@
+CREATE TABLE embedding_cache (
+    model TEXT NOT NULL,
+    content_hash BYTEA NOT NULL, -- sha256 of the embedded text
+    embedding vector(1536) NOT NULL,
+    PRIMARY KEY (model, content_hash)
+);
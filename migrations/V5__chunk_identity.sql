@@ -0,0 +1,5 @@
+-- Stable chunk identity (url, section, content_hash) used by incremental re-ingest
+ALTER TABLE chunks ADD COLUMN section TEXT NOT NULL DEFAULT '';
+ALTER TABLE chunks ADD COLUMN content_hash BYTEA;
+
+UPDATE chunks SET content_hash = sha256(convert_to(content, 'UTF8'));
@@ -0,0 +1,14 @@
+-- Resumable ingest: an index stays 'ingesting' until all of its chunks are stored,
+-- ingest_checkpoints records the pages (by url) whose chunks are durably stored
+ALTER TABLE indexes ADD COLUMN status TEXT NOT NULL DEFAULT 'ready';
+
+CREATE TABLE ingest_checkpoints (
+    index_id INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    chunk_count INTEGER NOT NULL,
+    PRIMARY KEY (index_id, url),
+    CONSTRAINT fk_index_id
+        FOREIGN KEY(index_id)
+        REFERENCES indexes(id)
+        ON DELETE CASCADE
+);
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Script for comparing per-page extraction time of the legacy and single pass extractors
+on saved html pages (e.g. `curl -o page.html <url>` or a browser "save page as").
+Usage: python -m scripts.benchmark_extraction <html_dir> [--repeat N] [--parser NAME]
+"""
+
+import argparse
+from pathlib import Path
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+from bs4 import BeautifulSoup
+
+from src.services.documentation_scraper import DocumentationScraper, ScraperConfig
+
+
+def time_extractor(
+  extractor: str, pages: List[str], repeat: int, parser: str
+) -> List[float]:
+  """Seconds per page for every page and repeat, parsing is not timed."""
+  scraper = DocumentationScraper(
+    ScraperConfig(enable_structured_extraction=True, extractor=extractor)
+  )
+  timings = []
+  for _ in range(repeat):
+    for html in pages:
+      # Extraction removes tags from the soup, so every run gets a fresh one
+      soup = BeautifulSoup(html, parser)
+      start = time.perf_counter()
+      scraper._extract_content(soup, "https://example.com/page")
+      timings.append(time.perf_counter() - start)
+  return timings
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark page content extraction")
+  parser.add_argument("html_dir", help="Directory with saved .html pages")
+  parser.add_argument("--repeat", type=int, default=3, help="Runs over all pages")
+  parser.add_argument("--parser", default="html.parser", help="BeautifulSoup parser")
+  args = parser.parse_args()
+
+  files = sorted(Path(args.html_dir).rglob("*.htm*"))
+  if not files:
+    print(f"No .html files found in {args.html_dir}")
+    sys.exit(1)
+  pages = [file.read_text(encoding="utf-8", errors="replace") for file in files]
+  print(f"Pages: {len(pages)}, repeat: {args.repeat}, parser: {args.parser}")
+
+  results: Dict[str, List[float]] = {}
+  for extractor in ["legacy", "single_pass"]:
+    timings = time_extractor(extractor, pages, args.repeat, args.parser)
+    results[extractor] = timings
+    print(
+      f"{extractor:>12}: mean {statistics.mean(timings) * 1000:.2f} ms/page, "
+      f"median {statistics.median(timings) * 1000:.2f} ms/page, "
+      f"max {max(timings) * 1000:.2f} ms/page"
+    )
+
+  speedup = statistics.mean(results["legacy"]) / statistics.mean(results["single_pass"])
+  print(f"Speedup: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Script for benchmarking the scraper against a recorded site.
+Record a site once, then replay it from a local server as often as needed:
+  python -m scripts.benchmark_scraper <archive> --record <url> [--max-pages N]
+  python -m scripts.benchmark_scraper <archive> [--latency S] [--error-rate R]
+Reports pages/sec, bytes/sec and CPU time per page of the scraper process. The
+replay server runs in its own process so its CPU time is not counted.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import queue
+import sys
+import time
+from typing import Dict
+
+from result import Err
+
+from src.services.documentation_scraper import DocumentationScraper, ScraperConfig
+from src.services.replay_server import ReplayServer
+
+
+def run_replay_server(archive_path: str, options: Dict, ready) -> None:
+  """Replay server process: sends its base url through `ready`, runs until killed."""
+
+  async def serve() -> None:
+    server = ReplayServer(archive_path, **options)
+    async with server.serve() as base_url:
+      ready.put(base_url)
+      await asyncio.Event().wait()
+
+  asyncio.run(serve())
+
+
+async def crawl(url: str, config: ScraperConfig) -> Dict:
+  scraper = DocumentationScraper(config)
+  wall_start = time.perf_counter()
+  cpu_start = time.process_time()
+  scrape_result = await scraper.scrape_website(url, "benchmark", save_to_disk=False)
+  cpu_seconds = time.process_time() - cpu_start
+  wall_seconds = time.perf_counter() - wall_start
+  if isinstance(scrape_result, Err):
+    print(f"Error occured: {scrape_result.err()}")
+    sys.exit(1)
+
+  summary = scrape_result.ok()
+  pages = summary["total_pages"]
+  return {
+    "pages": pages,
+    "http_requests": summary["http_requests"],
+    "seconds": round(wall_seconds, 3),
+    "pages_per_second": round(pages / wall_seconds, 2),
+    "bytes_per_second": round(summary["bytes_downloaded"] / wall_seconds),
+    "cpu_ms_per_page": round(cpu_seconds * 1000 / pages, 2) if pages else 0.0,
+    "parse_ms_per_page": summary["parse_ms_per_page"],
+    "extract_ms_per_page": summary["extract_ms_per_page"],
+    "stop_reason": summary["stop_reason"],
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark the documentation scraper")
+  parser.add_argument("archive", help="Response archive (sqlite) to record or replay")
+  parser.add_argument("--record", metavar="URL", help="Record a live crawl of URL")
+  parser.add_argument("--max-pages", type=int, default=200)
+  parser.add_argument("--max-depth", type=int, default=5)
+  parser.add_argument("--concurrency", type=int, default=10)
+  parser.add_argument("--concurrency-per-host", type=int, default=10)
+  parser.add_argument(
+    "--extraction-workers",
+    type=int,
+    default=0,
+    help="Process pool size for extraction (their CPU time is not included)",
+  )
+  parser.add_argument("--repeat", type=int, default=1, help="Replayed crawls")
+  parser.add_argument("--latency", type=float, default=0.0, help="Seconds/response")
+  parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency")
+  parser.add_argument(
+    "--error-rate", type=float, default=0.0, help="Share of 503 responses"
+  )
+  parser.add_argument("--seed", type=int, default=0)
+  args = parser.parse_args()
+
+  config = ScraperConfig(
+    max_pages=args.max_pages,
+    max_depth=args.max_depth,
+    max_concurrency=args.concurrency,
+    max_concurrency_per_host=args.concurrency_per_host,
+    extraction_workers=args.extraction_workers,
+  )
+
+  if args.record:
+    # Polite live crawl, the recorded archive is replayed without delays
+    record_config = config.model_copy(
+      update={"record_path": args.archive, "max_concurrency_per_host": 3}
+    )
+    print(f"Recording {args.record} into {args.archive}")
+    print(asyncio.run(crawl(args.record, record_config)))
+    return
+
+  options = {
+    "latency": args.latency,
+    "jitter": args.jitter,
+    "error_rate": args.error_rate,
+    "seed": args.seed,
+  }
+  ready = multiprocessing.Queue()
+  server = multiprocessing.Process(
+    target=run_replay_server, args=(args.archive, options, ready), daemon=True
+  )
+  server.start()
+  try:
+    while True:
+      try:
+        base_url = ready.get(timeout=0.5)
+        break
+      except queue.Empty:
+        if not server.is_alive():
+          print("Replay server failed to start")
+          sys.exit(1)
+    print(f"Replaying {args.archive} from {base_url} ({options})")
+    replay_config = config.model_copy(
+      update={"delay_between_requests": 0.0, "respect_crawl_delay": False}
+    )
+    for run in range(args.repeat):
+      print(f"Run {run + 1}: {asyncio.run(crawl(base_url, replay_config))}")
+  finally:
+    server.terminate()
+    server.join()
+
+
+if __name__ == "__main__":
+  main()
@@ -6,6 +6,7 @@ Usage: python -m scripts.scrape_data <url> <index_name> [--debug] [--max-depth N
 
 import argparse
 import asyncio
+import itertools
 import sys
 
 from typing import Dict
@@ -21,6 +22,8 @@ async def scrape_and_print(
     max_depth=max_depth,
     max_pages=max_pages,
     enable_structured_extraction=True,
+    stream_output=True,
+    output_format="shards",
     clean_code_blocks=False,
     remove_line_numbers=False,
   )
@@ -40,13 +43,13 @@ async def scrape_and_print(
   print(scrape_result.ok())
 
   if debug:
-    pages = scraper.get_scraped_data()
+    pages = list(itertools.islice(scraper.get_scraped_data(), 2))
     if not pages:
       print("No pages were scraped.")
       sys.exit(1)
 
     print("\nStructured extraction results:")
-    for page in pages[:2]:
+    for page in pages:
       print(f"\nPage: {page.title}")
       print(f"Sections: {len(page.structured_content)}")
       for section in page.structured_content[:3]:
@@ -10,7 +10,8 @@ from pathlib import Path
 
 from result import Err, Result
 
-from src.services.s3_uploader import upload_to_s3
+from src.models.models import UploadStats
+from src.services.s3_uploader import upload_stats_summary, upload_to_s3
 
 
 async def main():
@@ -20,11 +21,12 @@ async def main():
 
   print(f"Starting upload for target_dir: {args.target_dir}")
 
-  upload_result: Result[None, str] = await upload_to_s3(Path(args.target_dir))
+  upload_result: Result[UploadStats, str] = await upload_to_s3(Path(args.target_dir))
   if isinstance(upload_result, Err):
     print(f"Error: S3 upload failed: {upload_result.err()}")
   else:
     print("S3 upload completed successfully")
+    print(upload_stats_summary(upload_result.ok()))
 
 
 if __name__ == "__main__":
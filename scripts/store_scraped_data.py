@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
 """
 Script for storing scraped data in the database.
-Usage: python -m scripts.manual_ingest <index_name> [--debug] [--max-chunks N]
+Usage: python -m scripts.store_scraped_data <index_name> [--debug] [--max-chunks N]
+  [--source local|s3]
 """
 
 import argparse
 import asyncio
 import sys
 
+from psycopg import AsyncConnection
+
+from src.services.database_service import get_db_connection_string
 from src.services.store_data import store_data
 
 
@@ -18,6 +22,12 @@ async def main():
   parser.add_argument(
     "--max-chunks", type=int, default=20, help="Max chunks in debug mode"
   )
+  parser.add_argument(
+    "--source",
+    choices=["local", "s3"],
+    default="local",
+    help="Read data/<index_name> or the <index_name>/ prefix of the S3 bucket",
+  )
 
   args = parser.parse_args()
 
@@ -25,9 +35,17 @@ async def main():
   if args.debug:
     print(f"Running in DEBUG mode (max {args.max_chunks} chunks)")
 
-  result = await store_data(
-    args.index_name, debug_mode=args.debug, max_debug_chunks=args.max_chunks
-  )
+  conn = await AsyncConnection.connect(get_db_connection_string())
+  try:
+    result = await store_data(
+      conn,
+      args.index_name,
+      debug_mode=args.debug,
+      max_debug_chunks=args.max_chunks,
+      source=args.source,
+    )
+  finally:
+    await conn.close()
 
   if result.is_ok():
     stats = result.ok()
@@ -5,6 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from result import Err, Ok, Result
 
+from ....rag.rate_limiter import get_embedding_rate_limiter
 from ....repositories.index_repository import get_indexes_state
 from ....services.database_service import get_db_conn
 
@@ -49,6 +50,12 @@ async def get_indexes_info(conn: AsyncConnection = Depends(get_db_conn)):
     raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/embeddings")
+async def get_embeddings_info():
+  """Embedding request throughput over the last minute against the configured limits."""
+  return get_embedding_rate_limiter().throughput()
+
+
 @router.get("/state")
 async def get_state_info():
   # TODO: todo
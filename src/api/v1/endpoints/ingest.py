@@ -1,17 +1,23 @@
 from __future__ import annotations
-from typing import Annotated, Any, Dict, TYPE_CHECKING
+from typing import Annotated, Any, AsyncIterator, Dict, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, HttpUrl, StringConstraints
 from result import Err, Ok, Result
 
-from src.services.database_service import get_db_conn
+from src.services.database_service import ConnectionFactory, get_db_connection_factory
 
+from ....core.config import config
+from ....models.models import IngestProgress
 from ....services.documentation_scraper import DocumentationScraper, ScraperConfig
-from ....services.store_data import store_data
-
-if TYPE_CHECKING:
-  from psycopg import AsyncConnection
+from ....services.ingest_jobs import (
+  IngestJobManager,
+  IngestJobSchema,
+  get_ingest_job_manager,
+)
+from ....services.store_data import StorageStatistics, store_data
+from ....services.stream_ingest import stream_ingest
 
 
 router = APIRouter(prefix="/ingest")
@@ -25,6 +31,13 @@ class IngestLinkSchema(BaseModel):
   ]
   max_depth: Annotated[int, Field(strict=True, gt=0)]
   max_pages: Annotated[int, Field(strict=True, gt=0)]
+  incremental: bool = False  # update an existing index instead of failing
+  # With incremental: also remove the pages the crawl did not return
+  prune: bool = False
+  resume: bool = False  # continue an interrupted ingest of the index
+  # Scrape, embed and insert concurrently without writing pages to disk
+  streaming: bool = False
+  useSitemap: bool = False  # seed the crawl with the site's sitemap urls
 
 
 class IngestLinkResponseSchema(BaseModel):
@@ -33,21 +46,69 @@ class IngestLinkResponseSchema(BaseModel):
   status: str
 
 
+class IngestJobSubmittedSchema(BaseModel):
+  jobId: str
+  status: str
+
+
 async def _ingest_link(
-  ingest_link_data: IngestLinkSchema, conn: AsyncConnection
+  ingest_link_data: IngestLinkSchema,
+  connection: ConnectionFactory,
+  progress: IngestProgress | None = None,
 ) -> Result[IngestLinkResponseSchema, str]:
+  """
+  Scrape, then store the pages with a connection taken for the storage only. The
+  streaming ingest inserts while crawling and holds a connection throughout.
+  """
   scraper_config = ScraperConfig(
-    max_depth=ingest_link_data.max_depth, max_pages=ingest_link_data.max_pages
+    max_depth=ingest_link_data.max_depth,
+    max_pages=ingest_link_data.max_pages,
+    cache_path=config.CRAWL_CACHE_PATH or None,
+    use_sitemap=ingest_link_data.useSitemap,
+    stream_output=True,
+    output_format="shards",
   )
+
+  if ingest_link_data.streaming:
+    if ingest_link_data.incremental:
+      return Err("Streaming ingest does not support incremental updates")
+    async with connection() as conn:
+      stream_result: Result[Tuple[Dict, StorageStatistics], str] = await stream_ingest(
+        conn,
+        ingest_link_data.url,
+        ingest_link_data.indexName,
+        scraper_config,
+        progress=progress,
+        resume=ingest_link_data.resume,
+      )
+    if isinstance(stream_result, Err):
+      return Err(stream_result.err())
+    scraping_summary, storage_statistics = stream_result.ok()
+    return Ok(
+      IngestLinkResponseSchema(
+        scraping_summary=scraping_summary,
+        storage_summary=storage_statistics.model_dump(),
+        status="complete",
+      )
+    )
+
   scraper = DocumentationScraper(scraper_config)
 
   scrape_result: Result[Dict, str] = await scraper.scrape_website(
-    ingest_link_data.url, ingest_link_data.indexName
+    ingest_link_data.url, ingest_link_data.indexName, progress=progress
   )
   if isinstance(scrape_result, Err):
     return Err(scrape_result.err())
 
-  data_storage_result = await store_data(conn, ingest_link_data.indexName)
+  async with connection() as conn:
+    data_storage_result = await store_data(
+      conn,
+      ingest_link_data.indexName,
+      incremental=ingest_link_data.incremental,
+      prune=ingest_link_data.prune,
+      progress=progress,
+      resume=ingest_link_data.resume,
+    )
   if isinstance(data_storage_result, Err):
     return Err(data_storage_result.err())
 
@@ -62,11 +123,12 @@ async def _ingest_link(
 
 @router.post("/link", response_model=IngestLinkResponseSchema)
 async def ingest_link(
-  ingest_link_data: IngestLinkSchema, conn: AsyncConnection = Depends(get_db_conn)
+  ingest_link_data: IngestLinkSchema,
+  connection: ConnectionFactory = Depends(get_db_connection_factory),
 ):
   try:
     result: Result[IngestLinkResponseSchema, str] = await _ingest_link(
-      ingest_link_data, conn
+      ingest_link_data, connection
     )
     match result:
       case Ok(summary):
@@ -75,3 +137,58 @@ async def ingest_link(
         raise HTTPException(status_code=400, detail=(e))
   except Exception as e:
     raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post(
+  "/jobs",
+  response_model=IngestJobSubmittedSchema,
+  status_code=status.HTTP_202_ACCEPTED,
+)
+async def submit_ingest_job(
+  ingest_link_data: IngestLinkSchema,
+  job_manager: IngestJobManager = Depends(get_ingest_job_manager),
+):
+  async def run(
+    connection: ConnectionFactory, progress: IngestProgress
+  ) -> Result[Dict[str, Any], str]:
+    result = await _ingest_link(ingest_link_data, connection, progress)
+    return result.map(lambda response: response.model_dump())
+
+  job = job_manager.submit(ingest_link_data.indexName, run)
+  return IngestJobSubmittedSchema(jobId=job.id, status=job.status.value)
+
+
+@router.get("/jobs/{job_id}", response_model=IngestJobSchema)
+async def get_ingest_job(
+  job_id: str, job_manager: IngestJobManager = Depends(get_ingest_job_manager)
+):
+  if (job := job_manager.get(job_id)) is None:
+    raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+  return job.to_schema()
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_ingest_job_events(
+  job_id: str, job_manager: IngestJobManager = Depends(get_ingest_job_manager)
+):
+  """Server-sent events with the job state, until the job finishes."""
+  if job_manager.get(job_id) is None:
+    raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+
+  async def event_stream() -> AsyncIterator[str]:
+    async for job_schema in job_manager.events(job_id):
+      yield f"event: progress\ndata: {job_schema.model_dump_json()}\n\n"
+    yield "event: end\ndata: {}\n\n"
+
+  return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@router.delete("/jobs/{job_id}", response_model=IngestJobSchema)
+async def cancel_ingest_job(
+  job_id: str, job_manager: IngestJobManager = Depends(get_ingest_job_manager)
+):
+  match job_manager.cancel(job_id):
+    case Ok(job):
+      return job.to_schema()
+    case Err(e):
+      raise HTTPException(status_code=400, detail=(e))
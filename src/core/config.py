@@ -15,17 +15,60 @@ class Config(BaseSettings):
   DB_NAME: str = "rtfm-rag"
   DB_USER: str = "developer"
   DB_PASSWORD: str = "password"
+  DB_COPY_BATCH_SIZE: int = 1000  # rows per COPY statement when bulk loading chunks
 
   LOG_LEVEL: str = "INFO"
   LOG_FILE: str | None = None
   LOG_FORMAT: str = "console"  # "json" or "console"
 
   OPENAI_API_KEY: str = ""
+  OPENAI_MAX_CONNECTIONS: int = 32
+  OPENAI_MAX_CONCURRENCY: int = 16
+
+  # "openai" or "local" (deterministic offline stand-ins, no api key needed)
+  EMBEDDING_PROVIDER: str = "openai"
+  GENERATION_PROVIDER: str = "openai"
+  LOCAL_EMBEDDING_LATENCY_SECONDS: float = 0.0
+  LOCAL_GENERATION_LATENCY_SECONDS: float = 0.0
+
+  # Per-request limits for multi-input embedding calls
+  EMBEDDING_BATCH_MAX_TOKENS: int = 100_000
+  EMBEDDING_BATCH_MAX_ITEMS: int = 512
+  EMBEDDING_CACHE_ENABLED: bool = True
+  # Client side rate limiting and retries of embedding requests
+  EMBEDDING_RPM: int = 3000
+  EMBEDDING_TPM: int = 1_000_000
+  EMBEDDING_MAX_RETRIES: int = 8
+  EMBEDDING_QUERY_MAX_RETRIES: int = 2  # query embeddings fail fast instead
+  EMBEDDING_BACKOFF_BASE_SECONDS: float = 1.0
+  EMBEDDING_BACKOFF_MAX_SECONDS: float = 60.0
+
+  # Token-window chunking of scraped sections
+  CHUNK_MAX_TOKENS: int = 512
+  CHUNK_OVERLAP_TOKENS: int = 64
+
+  # Background ingest jobs
+  INGEST_MAX_CONCURRENT_JOBS: int = 2
+  INGEST_JOBS_RETAINED: int = 100  # finished jobs kept for status polling
+  INGEST_JOB_EVENT_INTERVAL_SECONDS: float = 1.0
+  # Chunks stored per commit, an interrupted ingest resumes from the last commit
+  INGEST_CHECKPOINT_CHUNKS: int = 500
+
+  # Parallel parsing/tokenization of scraped files in store_data (1 = serial)
+  INGEST_PREPROCESS_WORKERS: int = 1
+  INGEST_PREPROCESS_EXECUTOR: str = "process"  # "process" or "thread"
+
+  # Revalidation cache of crawled pages (ETag / Last-Modified), empty disables it
+  CRAWL_CACHE_PATH: str = "data/crawl_cache.sqlite"
 
   AWS_ACCESS_KEY_ID: str = ""
   AWS_SECRET_ACCESS_KEY: str = ""
   AWS_S3_BUCKET_NAME: str = ""
   AWS_REGION: str = ""
+  AWS_ENDPOINT_URL: str = ""  # S3 compatible endpoint (MinIO, localstack), "" = AWS
+  S3_UPLOAD_WORKERS: int = 8  # concurrent uploads (threads)
+  # Concurrent object reads when ingesting from S3, prefetching up to twice as many
+  S3_INGEST_WORKERS: int = 8
 
   model_config = SettingsConfigDict(env_file=".env")
 
@@ -5,6 +5,7 @@ class RagNamespace(NamedTuple):
   MAX_RELEVANT_DISTANCE: float
   EMBEDDING_MODEL: str
   EMBEDDING_TOKEN_LIMIT: int
+  EMBEDDING_DIMENSIONS: int
   GENERATOR_MODEL: str
   GENERATOR_SYSTEM_PROMPT: str
   GENERATOR_USER_PROMPT_TEMPLATE: str
@@ -14,6 +15,7 @@ rag = RagNamespace(
   MAX_RELEVANT_DISTANCE=1.0,
   EMBEDDING_MODEL="text-embedding-3-small",
   EMBEDDING_TOKEN_LIMIT=8192,
+  EMBEDDING_DIMENSIONS=1536,
   GENERATOR_MODEL="gpt-4.1-nano-2025-04-14",
   GENERATOR_SYSTEM_PROMPT="""
 You are an expert assistant specialized in providing precise, clear, and
@@ -9,6 +9,7 @@ from psycopg_pool import AsyncConnectionPool
 from .api.v1.master_router import rounter
 from .core.config import config
 from .services.database_service import get_db_connection_string
+from .services.ingest_jobs import IngestJobManager
 
 
 @asynccontextmanager
@@ -22,6 +23,7 @@ async def lifespan(app: FastAPI):
   )
   await pool.open()
   app.state.db_pool = pool
+  app.state.ingest_jobs = IngestJobManager(pool)
 
   async def connection_reaping():
     while True:
@@ -32,6 +34,7 @@ async def lifespan(app: FastAPI):
 
   yield
 
+  await app.state.ingest_jobs.shutdown()
   task.cancel()
   try:
     await task
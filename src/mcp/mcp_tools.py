@@ -5,14 +5,15 @@ from result import Err, Ok, Result, UnwrapError
 
 from ..core.constants import rag
 from ..rag.embedder import embed_data
+from ..rag.providers import get_embedding_provider
 from ..repositories.chunk_repository import ChunkRetriveData, find_closest_chunks
 from ..repositories.index_repository import get_index_id_by_name
-from ..services.openai_service import get_openai_client
 
 if TYPE_CHECKING:
-  from openai import OpenAI
   from psycopg import AsyncConnection
 
+  from ..rag.providers import EmbeddingProvider
+
 
 async def fetch_docs_candidate_context_impl(
   query: str, index_name: str, conn: AsyncConnection
@@ -22,9 +23,9 @@ async def fetch_docs_candidate_context_impl(
     if index_id is None:
       return Err("This index name is not present in the database")
 
-    openai_client: OpenAI = get_openai_client().unwrap()
+    embedding_provider: EmbeddingProvider = get_embedding_provider().unwrap()
 
-    embedding: List[float] = (await embed_data(openai_client, query)).unwrap()
+    embedding: List[float] = (await embed_data(embedding_provider, query)).unwrap()
 
     retrived_chunks: List[ChunkRetriveData] = (
       await find_closest_chunks(conn, embedding, index_id)
@@ -1,4 +1,8 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import cached_property
+import time
+
+from ..utils.utils import get_content_hash
 
 
 @dataclass
@@ -7,3 +11,70 @@ class ChunkData:
   url: str
   char_length: int
   tokens: int
+  section: str = ""
+
+  @cached_property
+  def content_hash(self) -> bytes:
+    return get_content_hash(self.content)
+
+  @property
+  def identity(self) -> tuple[str, str, bytes]:
+    """Stable identity used to diff a new scrape against stored chunks."""
+    return (self.url, self.section, self.content_hash)
+
+
+@dataclass
+class InsertStats:
+  chunks_inserted: int = 0
+  chunks_failed: int = 0
+  embedding_cache_hits: int = 0  # chunks not sent to the embedding api
+  embeddings_requested: int = 0
+  # Pages with a chunk that was not stored, they must not be checkpointed
+  failed_urls: set[str] = field(default_factory=set)
+
+  @property
+  def embedding_cache_hit_rate(self) -> float:
+    total = self.embedding_cache_hits + self.embeddings_requested
+    return self.embedding_cache_hits / total if total else 0.0
+
+
+@dataclass
+class UploadStats:
+  files_uploaded: int = 0
+  files_skipped: int = 0  # already in the bucket with the same MD5
+  bytes_uploaded: int = 0
+  seconds: float = 0.0
+
+  @property
+  def bytes_per_second(self) -> float:
+    return self.bytes_uploaded / self.seconds if self.seconds else 0.0
+
+  @property
+  def files_per_second(self) -> float:
+    total = self.files_uploaded + self.files_skipped
+    return total / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class IngestProgress:
+  """Counters updated in place by the scraper and the ingest code while a job runs."""
+
+  pages_total: int = 0  # page budget (max_pages), the crawl may stop earlier
+  pages_scraped: int = 0
+  chunks_total: int = 0
+  chunks_embedded: int = 0
+  chunks_inserted: int = 0
+  started_at: float = field(default_factory=time.monotonic)
+
+  def fraction_done(self) -> float:
+    """Rough overall progress, scraping and storing weighted equally."""
+    scraped = min(self.pages_scraped / self.pages_total, 1.0) if self.pages_total else 0
+    stored = self.chunks_inserted / self.chunks_total if self.chunks_total else 0
+    return (scraped + stored) / 2
+
+  def eta_seconds(self) -> float | None:
+    fraction = self.fraction_done()
+    if fraction <= 0:
+      return None
+    elapsed = time.monotonic() - self.started_at
+    return elapsed * (1 - fraction) / fraction
@@ -0,0 +1,133 @@
+from __future__ import annotations
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+import re
+from typing import List, TYPE_CHECKING
+
+from ..utils.utils import get_embed_model_encoding
+
+if TYPE_CHECKING:
+  from tiktoken import Encoding
+
+
+@dataclass
+class TextWindow:
+  text: str
+  tokens: int
+
+
+_PARAGRAPH_RE = re.compile(r"\n[ \t]*\n")
+_FENCE_RE = re.compile(r"^[ \t]*```.*$", re.MULTILINE)
+_SENTENCE_RE = re.compile(r"[.!?:;][\"')\]]*\s+")
+_NEWLINE_RE = re.compile(r"\n")
+
+
+def _code_fence_ranges(text: str) -> List[tuple[int, int]]:
+  """(start, end) char ranges of fenced code blocks, fence lines included."""
+  fences = list(_FENCE_RE.finditer(text))
+  return [
+    (opening.start(), closing.end())
+    for opening, closing in zip(fences[::2], fences[1::2])
+  ]
+
+
+def _boundary_levels(text: str, offsets: List[int]) -> List[List[int]]:
+  """
+  Candidate cut positions as token indices, grouped from most to least preferred:
+  paragraph breaks and code fence edges, sentence ends, line breaks.
+  Paragraph and sentence cuts inside a fenced code block are not allowed.
+  """
+  fence_ranges = _code_fence_ranges(text)
+
+  def outside_fences(pos: int) -> bool:
+    return not any(start < pos < end for start, end in fence_ranges)
+
+  def to_token_indices(char_positions: List[int]) -> List[int]:
+    indices = {bisect_left(offsets, pos) for pos in char_positions}
+    return sorted(i for i in indices if 0 < i < len(offsets))
+
+  paragraphs = [
+    m.end() for m in _PARAGRAPH_RE.finditer(text) if outside_fences(m.end())
+  ]
+  fences = [pos for fence_range in fence_ranges for pos in fence_range]
+  sentences = [m.end() for m in _SENTENCE_RE.finditer(text) if outside_fences(m.end())]
+  newlines = [m.end() for m in _NEWLINE_RE.finditer(text)]
+
+  return [
+    to_token_indices(paragraphs + fences),
+    to_token_indices(sentences),
+    to_token_indices(newlines),
+  ]
+
+
+def split_into_token_windows(
+  text: str,
+  max_tokens: int,
+  overlap_tokens: int = 0,
+  encoding: Encoding | None = None,
+) -> List[TextWindow]:
+  """
+  Split text into windows of at most `max_tokens` tokens, encoding it only once.
+  Cuts prefer paragraph/code fence boundaries, then sentence ends, then line breaks,
+  and fall back to a hard cut. Consecutive windows share up to `overlap_tokens`
+  tokens. The token count of every window is returned with it.
+  """
+  encoding = encoding or get_embed_model_encoding()
+  tokens = encoding.encode(text, disallowed_special=())
+  if len(tokens) <= max_tokens:
+    return [TextWindow(text=text, tokens=len(tokens))]
+
+  _, offsets = encoding.decode_with_offsets(tokens)
+  levels = _boundary_levels(text, offsets)
+  overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2 - 1))
+  n_tokens = len(tokens)
+
+  def char_at(token_index: int) -> int:
+    return offsets[token_index] if token_index < n_tokens else len(text)
+
+  windows: List[TextWindow] = []
+  start = 0
+  while start < n_tokens:
+    limit = start + max_tokens
+    if limit >= n_tokens:
+      end = n_tokens
+    else:
+      # Take the latest preferred boundary, unless it would make a tiny window
+      end = limit
+      for level in levels:
+        j = bisect_right(level, limit) - 1
+        if j >= 0 and level[j] > start + max_tokens // 2:
+          end = level[j]
+          break
+
+    windows.append(
+      TextWindow(text=text[char_at(start) : char_at(end)], tokens=end - start)
+    )
+    if end >= n_tokens:
+      break
+
+    next_start = end - overlap_tokens
+    if overlap_tokens:
+      # Start the overlap on a boundary when there is one
+      for level in levels[1:]:
+        j = bisect_left(level, next_start)
+        if j < len(level) and level[j] < end:
+          next_start = level[j]
+          break
+    start = max(next_start, start + 1)
+
+  return windows
+
+
+def truncate_to_tokens(
+  text: str, max_tokens: int, encoding: Encoding | None = None
+) -> str:
+  """The longest prefix of `text` of at most `max_tokens` tokens (cut on a token)."""
+  encoding = encoding or get_embed_model_encoding()
+  tokens = encoding.encode(text, disallowed_special=())
+  if len(tokens) <= max_tokens:
+    return text
+  if max_tokens <= 0:
+    return ""
+  _, offsets = encoding.decode_with_offsets(tokens)
+  return text[: offsets[max_tokens]]
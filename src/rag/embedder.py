@@ -1,22 +1,187 @@
 from __future__ import annotations
-from typing import List, TYPE_CHECKING
+import asyncio
+from typing import Dict, List, TYPE_CHECKING, Tuple
 
 from result import Err, Ok, Result
 
+from ..core.config import config
 from ..core.constants import rag
+from ..repositories.embedding_cache_repository import (
+  get_cached_embeddings,
+  store_cached_embeddings,
+)
 from ..utils.utils import get_embed_token_count
+from .rate_limiter import is_input_error
 
 if TYPE_CHECKING:
-  from openai import OpenAI
+  from psycopg import AsyncConnection
 
+  from ..models.models import ChunkData, IngestProgress
+  from .providers import EmbeddingProvider
 
-async def embed_data(openai_client: OpenAI, text: str) -> Result[List[float], str]:
+
+async def embed_data(
+  provider: EmbeddingProvider, text: str
+) -> Result[List[float], str]:
   if (n_tokens := get_embed_token_count(text)) > rag.EMBEDDING_TOKEN_LIMIT:
     return Err(
       f"Input text is too long to embed: {n_tokens} tokens (limit is {rag.EMBEDDING_TOKEN_LIMIT})"
     )
   try:
-    response = openai_client.embeddings.create(model=rag.EMBEDDING_MODEL, input=text)
-    return Ok(response.data[0].embedding)
+    embeddings = await provider.embed([text], n_tokens, interactive=True)
+    return Ok(embeddings[0])
   except Exception as e:
     return Err(f"Failed to generate an embedding: {e}")
+
+
+def pack_batches(
+  chunks: List[ChunkData], max_batch_tokens: int, max_batch_items: int
+) -> List[List[int]]:
+  """
+  Greedily pack chunk positions into batches that fit under both the token budget
+  and the item count. Chunks over the per-input token limit are left out.
+  """
+  batches: List[List[int]] = []
+  current: List[int] = []
+  current_tokens = 0
+
+  for i, chunk in enumerate(chunks):
+    if chunk.tokens > rag.EMBEDDING_TOKEN_LIMIT:
+      continue
+    if current and (
+      current_tokens + chunk.tokens > max_batch_tokens
+      or len(current) >= max_batch_items
+    ):
+      batches.append(current)
+      current = []
+      current_tokens = 0
+    current.append(i)
+    current_tokens += chunk.tokens
+
+  if current:
+    batches.append(current)
+
+  return batches
+
+
+async def _embed_batch_with_split(
+  provider: EmbeddingProvider, chunks: List[ChunkData]
+) -> List[Result[List[float], str]]:
+  """
+  When the api rejects the batch for its input, split it in halves and retry, so
+  one bad input fails alone. Other errors (rate limit, 5xx, connection, already
+  retried by the provider) fail the whole batch: splitting would only multiply
+  the requests of a throttled client.
+  """
+  texts = [chunk.content for chunk in chunks]
+  try:
+    embeddings = await provider.embed(texts, sum(chunk.tokens for chunk in chunks))
+  except Exception as e:
+    if len(chunks) == 1 or not is_input_error(e):
+      return [Err(f"Failed to generate a batch of embeddings: {e}")] * len(chunks)
+    middle = len(chunks) // 2
+    first_half, second_half = await asyncio.gather(
+      _embed_batch_with_split(provider, chunks[:middle]),
+      _embed_batch_with_split(provider, chunks[middle:]),
+    )
+    return first_half + second_half
+
+  if len(embeddings) != len(texts):
+    return [
+      Err(
+        f"Embedding response has a wrong number of items: got {len(embeddings)}, expected {len(texts)}"
+      )
+    ] * len(chunks)
+  return [Ok(embedding) for embedding in embeddings]
+
+
+async def embed_chunks(
+  provider: EmbeddingProvider,
+  chunks: List[ChunkData],
+  max_batch_tokens: int | None = None,
+  max_batch_items: int | None = None,
+  progress: IngestProgress | None = None,
+) -> List[Result[List[float], str]]:
+  """
+  Embed chunks using multi-input requests packed by `ChunkData.tokens`.
+  Batches are sent concurrently (the OpenAI provider bounds in-flight requests).
+  Returns one result per chunk, in the same order as `chunks`.
+  """
+  max_batch_tokens = max_batch_tokens or config.EMBEDDING_BATCH_MAX_TOKENS
+  max_batch_items = max_batch_items or config.EMBEDDING_BATCH_MAX_ITEMS
+
+  results: List[Result[List[float], str]] = [
+    Err(
+      f"Input text is too long to embed: {chunk.tokens} tokens (limit is {rag.EMBEDDING_TOKEN_LIMIT})"
+    )
+    for chunk in chunks
+  ]
+
+  async def embed_packed_batch(batch: List[int]) -> List[Result[List[float], str]]:
+    batch_results = await _embed_batch_with_split(provider, [chunks[i] for i in batch])
+    if progress:
+      progress.chunks_embedded += len(batch)
+    return batch_results
+
+  batches = pack_batches(chunks, max_batch_tokens, max_batch_items)
+  all_batch_results = await asyncio.gather(
+    *(embed_packed_batch(batch) for batch in batches)
+  )
+  for batch, batch_results in zip(batches, all_batch_results):
+    for i, result in zip(batch, batch_results):
+      results[i] = result
+
+  return results
+
+
+async def embed_chunks_cached(
+  conn: AsyncConnection,
+  provider: EmbeddingProvider,
+  chunks: List[ChunkData],
+  progress: IngestProgress | None = None,
+) -> Result[Tuple[List[Result[List[float], str]], int, int], str]:
+  """
+  Like embed_chunks, but identical texts are embedded once and texts already in the
+  embedding cache (keyed by model and sha256 of the text) are not sent at all.
+  New embeddings are added to the cache (not committed).
+  Returns (results, cache hits, number of texts sent to the api).
+  """
+  hashes: List[bytes] = [chunk.content_hash for chunk in chunks]
+  first_positions: Dict[bytes, int] = {}
+  for i, content_hash in enumerate(hashes):
+    first_positions.setdefault(content_hash, i)
+
+  cached_result: Result[Dict[bytes, List[float]], str] = await get_cached_embeddings(
+    conn, provider.model, list(first_positions)
+  )
+  if isinstance(cached_result, Err):
+    return cached_result
+
+  by_hash: Dict[bytes, Result[List[float], str]] = {
+    content_hash: Ok(embedding)
+    for content_hash, embedding in cached_result.ok().items()
+  }
+  to_embed: List[int] = [
+    i for content_hash, i in first_positions.items() if content_hash not in by_hash
+  ]
+
+  if progress:
+    progress.chunks_embedded += len(chunks) - len(to_embed)
+
+  new_items: List[Tuple[bytes, List[float]]] = []
+  embedded = await embed_chunks(
+    provider, [chunks[i] for i in to_embed], progress=progress
+  )
+  for i, embedding_result in zip(to_embed, embedded):
+    by_hash[hashes[i]] = embedding_result
+    if isinstance(embedding_result, Ok):
+      new_items.append((hashes[i], embedding_result.ok()))
+
+  store_result: Result[None, str] = await store_cached_embeddings(
+    conn, provider.model, new_items
+  )
+  if isinstance(store_result, Err):
+    return store_result
+
+  results = [by_hash[content_hash] for content_hash in hashes]
+  return Ok((results, len(chunks) - len(to_embed), len(to_embed)))
@@ -4,16 +4,18 @@ from result import Err, Ok, Result
 
 from ..core.constants import rag
 from ..repositories.chunk_repository import ChunkRetriveData
-from ..services.openai_service import get_openai_client
-from ..utils.utils import get_time
+from ..utils.utils import get_time_async
+from .providers import get_generation_provider
 
 
-@get_time
-def generate_response(query: str, chunks: List[ChunkRetriveData]) -> Result[str, str]:
+@get_time_async
+async def generate_response(
+  query: str, chunks: List[ChunkRetriveData]
+) -> Result[str, str]:
   # TODO: possibly utilize links
-  openai_clinet_result = get_openai_client()
-  if isinstance(openai_clinet_result, Err):
-    return openai_clinet_result
+  generation_provider_result = get_generation_provider()
+  if isinstance(generation_provider_result, Err):
+    return generation_provider_result
 
   context_list: List[str] = []
   for chunk in chunks:
@@ -26,18 +28,9 @@ def generate_response(query: str, chunks: List[ChunkRetriveData]) -> Result[str,
   )
 
   try:
-    response = openai_clinet_result.ok().responses.create(
-      model=rag.GENERATOR_MODEL,
-      temperature=0.2,
-      instructions=rag.GENERATOR_SYSTEM_PROMPT,
-      max_output_tokens=1500,
-      input=[
-        {
-          "role": "user",
-          "content": content,
-        }
-      ],
+    response = await generation_provider_result.ok().generate(
+      rag.GENERATOR_SYSTEM_PROMPT, content
     )
-    return Ok(response.output_text)
+    return Ok(response)
   except Exception as e:
     return Err(f"Exception occurred when trying to generate an llm answer: {e}")
@@ -7,14 +7,15 @@ from ..api.v1.schemas import MessageResponseSchema, MessageSchema
 from ..core.constants import rag
 from ..repositories.chunk_repository import ChunkRetriveData, find_closest_chunks
 from ..repositories.index_repository import get_index_id_by_name
-from ..services.openai_service import get_openai_client
 from .embedder import embed_data
 from .generator import generate_response
+from .providers import get_embedding_provider
 
 if TYPE_CHECKING:
-  from openai import OpenAI
   from psycopg import AsyncConnection
 
+  from .providers import EmbeddingProvider
+
 
 async def rag_pipeline(
   message: MessageSchema, conn: AsyncConnection
@@ -26,9 +27,11 @@ async def rag_pipeline(
     if index_id is None:
       return Err("This index name is not present in the database")
 
-    openai_client: OpenAI = get_openai_client().unwrap()
+    embedding_provider: EmbeddingProvider = get_embedding_provider().unwrap()
 
-    embedding: List[float] = (await embed_data(openai_client, message.text)).unwrap()
+    embedding: List[float] = (
+      await embed_data(embedding_provider, message.text)
+    ).unwrap()
 
     retrived_chunks: List[ChunkRetriveData] = (
       await find_closest_chunks(conn, embedding, index_id)
@@ -40,7 +43,7 @@ async def rag_pipeline(
       if chunk_data.distance < rag.MAX_RELEVANT_DISTANCE
     ]
 
-    response: str = generate_response(message.text, filtered_chunks).unwrap()
+    response: str = (await generate_response(message.text, filtered_chunks)).unwrap()
 
     links: List[str] = list(set(chunk_data.url for chunk_data in filtered_chunks))
 
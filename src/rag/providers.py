@@ -0,0 +1,211 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+import asyncio
+from functools import lru_cache
+import math
+import re
+from typing import List, TYPE_CHECKING
+import zlib
+
+from result import Err, Ok, Result
+
+from ..core.config import config
+from ..core.constants import rag
+from ..services.openai_service import get_async_openai_client, get_openai_semaphore
+from .rate_limiter import (
+  get_backoff_delay,
+  get_embedding_rate_limiter,
+  get_retry_after,
+  is_retryable_error,
+)
+
+if TYPE_CHECKING:
+  from openai import AsyncOpenAI
+
+
+class EmbeddingProvider(ABC):
+  # Stored with cached embeddings, so vectors of different providers never mix
+  model: str
+
+  @abstractmethod
+  async def embed(
+    self, texts: List[str], tokens: int, interactive: bool = False
+  ) -> List[List[float]]:
+    """
+    One vector per text, in the order of `texts`. `tokens` is the total token
+    count of `texts`. `interactive` requests (e.g. a query) are latency sensitive,
+    they are not queued behind batches and fail fast. Raises on failure.
+    """
+
+
+class GenerationProvider(ABC):
+  @abstractmethod
+  async def generate(self, instructions: str, content: str) -> str:
+    """Answer `content` (the user prompt) following `instructions`. Raises on failure."""
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+  def __init__(self, client: AsyncOpenAI, model: str = rag.EMBEDDING_MODEL):
+    self.client = client
+    self.model = model
+
+  async def _create(self, texts: List[str], tokens: int, interactive: bool = False):
+    """
+    embeddings.create behind the rate limiter. Rate limit, connection and 5xx errors
+    are retried with jittered exponential backoff (or the api's retry-after), up to
+    config.EMBEDDING_MAX_RETRIES times. A 429 pauses all embedding requests.
+    Interactive requests are retried config.EMBEDDING_QUERY_MAX_RETRIES times and
+    never wait longer than the backoff.
+    """
+    rate_limiter = get_embedding_rate_limiter()
+    # Retries are handled here, where the rate limiter sees them
+    client = self.client.with_options(max_retries=0)
+    max_retries = (
+      config.EMBEDDING_QUERY_MAX_RETRIES
+      if interactive
+      else config.EMBEDDING_MAX_RETRIES
+    )
+    attempt = 0
+    while True:
+      await rate_limiter.acquire(tokens, interactive)
+      try:
+        async with get_openai_semaphore():
+          return await client.embeddings.create(model=self.model, input=texts)
+      except Exception as e:
+        if not is_retryable_error(e) or attempt >= max_retries:
+          raise
+        delay = get_retry_after(e)
+        backoff = get_backoff_delay(attempt)
+        if delay is None or (interactive and delay > backoff):
+          delay = backoff
+        if getattr(e, "status_code", None) == 429:
+          rate_limiter.pause(delay)
+        rate_limiter.retries_total += 1
+        attempt += 1
+        await asyncio.sleep(delay)
+
+  async def embed(
+    self, texts: List[str], tokens: int, interactive: bool = False
+  ) -> List[List[float]]:
+    response = await self._create(texts, tokens, interactive)
+    # The api returns an index for every input, do not rely on the response order
+    embeddings: List[List[float] | None] = [None] * len(texts)
+    for item in response.data:
+      embeddings[item.index] = item.embedding
+    if any(embedding is None for embedding in embeddings):
+      raise ValueError(
+        f"Embedding response is missing items: got {len(response.data)}, expected {len(texts)}"
+      )
+    return embeddings  # type: ignore[return-value]
+
+
+class OpenAIGenerationProvider(GenerationProvider):
+  def __init__(self, client: AsyncOpenAI, model: str = rag.GENERATOR_MODEL):
+    self.client = client
+    self.model = model
+
+  async def generate(self, instructions: str, content: str) -> str:
+    async with get_openai_semaphore():
+      response = await self.client.responses.create(
+        model=self.model,
+        temperature=0.2,
+        instructions=instructions,
+        max_output_tokens=1500,
+        input=[
+          {
+            "role": "user",
+            "content": content,
+          }
+        ],
+      )
+    return response.output_text
+
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+  """
+  Deterministic offline embeddings: words and character trigrams hashed (crc32)
+  into signed buckets, L2 normalized. Texts sharing vocabulary end up close,
+  which is enough to exercise retrieval. No network, no key.
+  """
+
+  def __init__(
+    self,
+    dimensions: int = rag.EMBEDDING_DIMENSIONS,
+    latency_seconds: float = 0.0,
+  ):
+    self.dimensions = dimensions
+    self.latency_seconds = latency_seconds
+    self.model = f"local-hashed-ngrams-{dimensions}"
+
+  def embed_text(self, text: str) -> List[float]:
+    vector = [0.0] * self.dimensions
+    for word in _WORD_RE.findall(text.lower()):
+      features = [word] + [word[i : i + 3] for i in range(len(word) - 2)]
+      for feature in features:
+        feature_hash = zlib.crc32(feature.encode())
+        sign = 1.0 if feature_hash & 1 else -1.0
+        vector[(feature_hash >> 1) % self.dimensions] += sign
+
+    norm = math.sqrt(sum(value * value for value in vector))
+    if not norm:
+      return vector
+    return [value / norm for value in vector]
+
+  async def embed(
+    self, texts: List[str], tokens: int, interactive: bool = False
+  ) -> List[List[float]]:
+    if self.latency_seconds:
+      await asyncio.sleep(self.latency_seconds)
+    return [self.embed_text(text) for text in texts]
+
+
+class LocalGenerationProvider(GenerationProvider):
+  """Returns a canned answer after an artificial delay, for offline runs."""
+
+  def __init__(self, latency_seconds: float = 0.0):
+    self.latency_seconds = latency_seconds
+
+  async def generate(self, instructions: str, content: str) -> str:
+    if self.latency_seconds:
+      await asyncio.sleep(self.latency_seconds)
+    return (
+      "This is a canned answer from the local generation provider "
+      f"(prompt of {len(content)} characters)."
+    )
+
+
+@lru_cache(maxsize=1)
+def get_embedding_provider() -> Result[EmbeddingProvider, str]:
+  """The embedding provider selected with config.EMBEDDING_PROVIDER."""
+  match config.EMBEDDING_PROVIDER:
+    case "openai":
+      openai_client_result = get_async_openai_client()
+      if isinstance(openai_client_result, Err):
+        return openai_client_result
+      return Ok(OpenAIEmbeddingProvider(openai_client_result.ok()))
+    case "local":
+      return Ok(
+        LocalEmbeddingProvider(latency_seconds=config.LOCAL_EMBEDDING_LATENCY_SECONDS)
+      )
+    case provider:
+      return Err(f"Unknown embedding provider: {provider}")
+
+
+@lru_cache(maxsize=1)
+def get_generation_provider() -> Result[GenerationProvider, str]:
+  """The generation provider selected with config.GENERATION_PROVIDER."""
+  match config.GENERATION_PROVIDER:
+    case "openai":
+      openai_client_result = get_async_openai_client()
+      if isinstance(openai_client_result, Err):
+        return openai_client_result
+      return Ok(OpenAIGenerationProvider(openai_client_result.ok()))
+    case "local":
+      return Ok(
+        LocalGenerationProvider(latency_seconds=config.LOCAL_GENERATION_LATENCY_SECONDS)
+      )
+    case provider:
+      return Err(f"Unknown generation provider: {provider}")
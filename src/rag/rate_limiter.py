@@ -0,0 +1,149 @@
+from __future__ import annotations
+import asyncio
+from collections import deque
+from functools import lru_cache
+import random
+import time
+from typing import Callable, Deque, Dict, Tuple
+
+import openai
+
+from ..core.config import config
+
+
+class TokenBucket:
+  """Bucket refilled continuously at `per_minute` units per minute, capped at that."""
+
+  def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+    self.capacity = per_minute
+    self.rate = per_minute / 60
+    self.clock = clock
+    self.available = per_minute
+    self.updated_at = clock()
+
+  def _refill(self) -> None:
+    now = self.clock()
+    self.available = min(
+      self.capacity, self.available + (now - self.updated_at) * self.rate
+    )
+    self.updated_at = now
+
+  def wait_time(self, amount: float) -> float:
+    """Seconds until `amount` can be consumed (amount is capped at the capacity)."""
+    self._refill()
+    missing = min(amount, self.capacity) - self.available
+    return max(0.0, missing / self.rate)
+
+  def consume(self, amount: float) -> None:
+    self._refill()
+    self.available -= min(amount, self.capacity)
+
+
+class EmbeddingRateLimiter:
+  """
+  Client side scheduler for embedding requests: requests-per-minute and
+  tokens-per-minute budgets (token buckets fed with the known token counts of the
+  inputs) plus a shared pause when the api answers 429, so all in-flight callers
+  back off together. Interactive requests (query embeddings) are not scheduled,
+  they only take their share of the budgets. Keeps a one minute window of usage
+  for throughput reporting.
+  """
+
+  def __init__(
+    self,
+    requests_per_minute: int,
+    tokens_per_minute: int,
+    clock: Callable[[], float] = time.monotonic,
+  ):
+    self.clock = clock
+    self.requests = TokenBucket(requests_per_minute, clock)
+    self.tokens = TokenBucket(tokens_per_minute, clock)
+    self.paused_until = 0.0
+    self.rate_limited_total = 0
+    self.retries_total = 0
+    self._usage: Deque[Tuple[float, int]] = deque()
+
+  def wait_time(self, tokens: int) -> float:
+    return max(
+      self.paused_until - self.clock(),
+      self.requests.wait_time(1),
+      self.tokens.wait_time(tokens),
+    )
+
+  async def acquire(self, tokens: int, interactive: bool = False) -> None:
+    """
+    Take a request of `tokens` tokens from the budgets and wait until they cover
+    it. Reservations are first come, first served: the buckets go into debt and
+    later callers wait for it too, nobody holds a lock while waiting. Interactive
+    requests do not wait, a query must not queue behind ingest batches.
+    """
+    wait = 0.0 if interactive else self.wait_time(tokens)
+    self.requests.consume(1)
+    self.tokens.consume(tokens)
+    while wait > 0:
+      await asyncio.sleep(wait)
+      # A 429 during the wait pauses this request too
+      wait = self.paused_until - self.clock()
+    self._usage.append((self.clock(), tokens))
+
+  def pause(self, seconds: float) -> None:
+    self.rate_limited_total += 1
+    self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+  def throughput(self) -> Dict[str, float | int]:
+    now = self.clock()
+    while self._usage and self._usage[0][0] < now - 60:
+      self._usage.popleft()
+    return {
+      "requests_last_minute": len(self._usage),
+      "tokens_last_minute": sum(tokens for _, tokens in self._usage),
+      "requests_per_minute_limit": self.requests.capacity,
+      "tokens_per_minute_limit": self.tokens.capacity,
+      "paused_for_seconds": max(0.0, self.paused_until - now),
+      "rate_limited_total": self.rate_limited_total,
+      "retries_total": self.retries_total,
+    }
+
+
+@lru_cache(maxsize=1)
+def get_embedding_rate_limiter() -> EmbeddingRateLimiter:
+  return EmbeddingRateLimiter(config.EMBEDDING_RPM, config.EMBEDDING_TPM)
+
+
+def is_retryable_error(e: Exception) -> bool:
+  if isinstance(e, (openai.APIConnectionError, openai.RateLimitError)):
+    return True
+  return isinstance(e, openai.APIStatusError) and (
+    e.status_code == 429 or e.status_code >= 500
+  )
+
+
+def is_input_error(e: Exception) -> bool:
+  """The request was rejected for its input (400 / 413 / 422, e.g. a text over
+  the context length), another request with other inputs may succeed."""
+  return isinstance(e, openai.APIStatusError) and e.status_code in (400, 413, 422)
+
+
+def get_retry_after(e: Exception) -> float | None:
+  """Seconds to wait as requested by the api (retry-after-ms / retry-after headers)."""
+  response = getattr(e, "response", None)
+  if response is None:
+    return None
+  headers = response.headers
+  try:
+    if (retry_after_ms := headers.get("retry-after-ms")) is not None:
+      return float(retry_after_ms) / 1000
+    if (retry_after := headers.get("retry-after")) is not None:
+      return float(retry_after)
+  except ValueError:
+    return None
+  return None
+
+
+def get_backoff_delay(attempt: int) -> float:
+  """Exponential backoff with jitter (between half and the full delay)."""
+  delay = min(
+    config.EMBEDDING_BACKOFF_MAX_SECONDS,
+    config.EMBEDDING_BACKOFF_BASE_SECONDS * 2**attempt,
+  )
+  return delay * random.uniform(0.5, 1.0)
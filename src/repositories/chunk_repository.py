@@ -1,15 +1,25 @@
 from __future__ import annotations
+from array import array
 from dataclasses import dataclass
-from typing import List, TYPE_CHECKING, Tuple
+import struct
+import sys
+from typing import Dict, Iterable, List, Sequence, TYPE_CHECKING, Tuple
+import weakref
 
+from psycopg.adapt import Dumper
+from psycopg.pq import Format
+from psycopg.types import TypeInfo
 from result import Err, Ok, Result
 
-from ..models.models import ChunkData
-from ..rag.embedder import embed_data
+from ..core.config import config
+from ..models.models import ChunkData, IngestProgress, InsertStats
+from ..rag.embedder import embed_chunks, embed_chunks_cached
+from ..utils.utils import batched
 
 if TYPE_CHECKING:
   from psycopg import AsyncConnection
-  from openai import OpenAI
+
+  from ..rag.providers import EmbeddingProvider
 
 
 @dataclass
@@ -54,53 +64,216 @@ async def find_closest_chunks(
 
 async def _bare_insert_chunk(
   conn: AsyncConnection,
-  content: str,
+  chunk: ChunkData,
   embedding: List[float],
-  url: str,
   index_id: int,
 ) -> Result[None, str]:
   try:
     async with conn.cursor() as cur:
       await cur.execute(
-        "INSERT INTO chunks (content, embedding, url, index_id) VALUES (%s, %s, %s, %s)",
-        (content, embedding, url, index_id),
+        """
+        INSERT INTO chunks (content, embedding, url, index_id, section, content_hash)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        """,
+        (
+          chunk.content,
+          embedding,
+          chunk.url,
+          index_id,
+          chunk.section,
+          chunk.content_hash,
+        ),
       )
     return Ok(None)
   except Exception as e:
     return Err(f"Exception in insert_chunk: {e}")
 
 
+async def get_chunk_identities(
+  conn: AsyncConnection, index_id: int
+) -> Result[Dict[Tuple[str, str, bytes], List[int]], str]:
+  """Return {(url, section, content_hash): [chunk ids]} for all chunks of an index."""
+  try:
+    async with conn.cursor() as cur:
+      await cur.execute(
+        """
+        SELECT id, url, section,
+          COALESCE(content_hash, sha256(convert_to(content, 'UTF8')))
+        FROM chunks
+        WHERE index_id = %s
+        """,
+        (index_id,),
+      )
+      identities: Dict[Tuple[str, str, bytes], List[int]] = {}
+      for chunk_id, url, section, content_hash in await cur.fetchall():
+        identities.setdefault((url, section, bytes(content_hash)), []).append(chunk_id)
+      return Ok(identities)
+  except Exception as e:
+    return Err(f"Exception in get_chunk_identities: {e}")
+
+
+async def delete_chunks(
+  conn: AsyncConnection, chunk_ids: List[int]
+) -> Result[int, str]:
+  """Delete chunks by id. Does not commit. Returns the number of deleted rows."""
+  if not chunk_ids:
+    return Ok(0)
+  try:
+    async with conn.cursor() as cur:
+      await cur.execute("DELETE FROM chunks WHERE id = ANY(%s)", (chunk_ids,))
+      return Ok(cur.rowcount)
+  except Exception as e:
+    return Err(f"Exception in delete_chunks: {e}")
+
+
+class _VectorBinaryDumper(Dumper):
+  """pgvector binary format: uint16 dim, uint16 unused, dim * float32 (big endian)."""
+
+  format = Format.BINARY
+
+  def dump(self, obj: Sequence[float]) -> bytes:
+    values = array("f", obj)
+    if sys.byteorder == "little":
+      values.byteswap()
+    return struct.pack(">HH", len(values), 0) + values.tobytes()
+
+
+# Connections the dumper is registered on, pooled connections are reused
+_vector_dumper_connections: weakref.WeakSet[AsyncConnection] = weakref.WeakSet()
+
+
+async def _register_vector_binary_dumper(conn: AsyncConnection) -> None:
+  """
+  Make the "vector" type usable with COPY ... (FORMAT BINARY) on this connection.
+  Done once per connection.
+  """
+  if conn in _vector_dumper_connections:
+    return
+  info = await TypeInfo.fetch(conn, "vector")
+  if info is None:
+    raise RuntimeError("Type 'vector' not found, is the pgvector extension installed?")
+  info.register(conn)
+  dumper = type("VectorBinaryDumper", (_VectorBinaryDumper,), {"oid": info.oid})
+  conn.adapters.register_dumper(None, dumper)
+  _vector_dumper_connections.add(conn)
+
+
+async def bulk_insert_chunks(
+  conn: AsyncConnection,
+  rows: Iterable[Tuple[str, List[float], str, int, str, bytes]],
+  batch_size: int | None = None,
+) -> Result[int, str]:
+  """
+  Load (content, embedding, url, index_id, section, content_hash) rows with binary
+  COPY, one COPY statement per `batch_size` rows. Does not commit.
+  Returns the number of rows written.
+  """
+  batch_size = batch_size or config.DB_COPY_BATCH_SIZE
+  rows_written = 0
+  try:
+    await _register_vector_binary_dumper(conn)
+    async with conn.cursor() as cur:
+      for batch in batched(rows, batch_size):
+        async with cur.copy(
+          """
+          COPY chunks (content, embedding, url, index_id, section, content_hash)
+          FROM STDIN (FORMAT BINARY)
+          """
+        ) as copy:
+          copy.set_types(["text", "vector", "text", "int4", "text", "bytea"])
+          for row in batch:
+            await copy.write_row(row)
+        rows_written += len(batch)
+    return Ok(rows_written)
+  except Exception as e:
+    return Err(f"Exception in bulk_insert_chunks: {e}")
+
+
 async def insert_chunks(
   conn: AsyncConnection,
   chunks: List[ChunkData],
-  openai_client: OpenAI,
+  embedding_provider: EmbeddingProvider,
   index_id: int,
-) -> Result[Tuple[int, int], str]:
-  chunks_inserted = 0
-  chunks_failed = 0
+  bulk_load: bool = True,
+  commit: bool = True,
+  progress: IngestProgress | None = None,
+) -> Result[InsertStats, str]:
+  """
+  Embed and store chunks. By default rows are streamed with binary COPY,
+  `bulk_load=False` falls back to one INSERT per chunk.
+  With `commit=False` the caller owns the transaction (no commit and no rollback).
+  """
+  stats = InsertStats()
 
   try:
-    for chunk in chunks:
-      # TODO: batching
-      embedding_result: Result[List[float], str] = await embed_data(
-        openai_client, chunk.content
+    embedding_results: List[Result[List[float], str]]
+    if config.EMBEDDING_CACHE_ENABLED:
+      cached_embed_result = await embed_chunks_cached(
+        conn, embedding_provider, chunks, progress
       )
-      if isinstance(embedding_result, Err):
-        chunks_failed += 1
-        continue
-
-      insert_result: Result[None, str] = await _bare_insert_chunk(
-        conn, chunk.content, embedding_result.ok(), chunk.url, index_id
+      if isinstance(cached_embed_result, Err):
+        if commit:
+          await conn.rollback()
+        return cached_embed_result
+      embedding_results, stats.embedding_cache_hits, stats.embeddings_requested = (
+        cached_embed_result.ok()
+      )
+    else:
+      embedding_results = await embed_chunks(
+        embedding_provider, chunks, progress=progress
       )
-      if isinstance(insert_result, Err):
-        chunks_failed += 1
-        continue
+      stats.embeddings_requested = len(chunks)
+
+    if bulk_load:
+      rows: List[Tuple[str, List[float], str, int, str, bytes]] = []
+      for chunk, embedding_result in zip(chunks, embedding_results):
+        if isinstance(embedding_result, Err):
+          stats.chunks_failed += 1
+          stats.failed_urls.add(chunk.url)
+          continue
+        rows.append(
+          (
+            chunk.content,
+            embedding_result.ok(),
+            chunk.url,
+            index_id,
+            chunk.section,
+            chunk.content_hash,
+          )
+        )
+
+      bulk_insert_result: Result[int, str] = await bulk_insert_chunks(conn, rows)
+      if isinstance(bulk_insert_result, Err):
+        if commit:
+          await conn.rollback()
+        return bulk_insert_result
+
+      stats.chunks_inserted = bulk_insert_result.ok()
+    else:
+      for chunk, embedding_result in zip(chunks, embedding_results):
+        if isinstance(embedding_result, Err):
+          stats.chunks_failed += 1
+          stats.failed_urls.add(chunk.url)
+          continue
+
+        insert_result: Result[None, str] = await _bare_insert_chunk(
+          conn, chunk, embedding_result.ok(), index_id
+        )
+        if isinstance(insert_result, Err):
+          stats.chunks_failed += 1
+          stats.failed_urls.add(chunk.url)
+          continue
+
+        stats.chunks_inserted += 1
 
-      chunks_inserted += 1
+    if commit:
+      await conn.commit()
 
-    await conn.commit()
+    if progress:
+      progress.chunks_inserted += stats.chunks_inserted
 
-    return Ok((chunks_inserted, chunks_failed))
+    return Ok(stats)
   except Exception as e:
-    await conn.rollback()
+    if commit:
+      await conn.rollback()
     return Err(f"Err in insert_chunks: {e}")
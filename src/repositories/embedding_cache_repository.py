@@ -0,0 +1,53 @@
+from __future__ import annotations
+from typing import Dict, List, TYPE_CHECKING, Tuple
+
+from result import Err, Ok, Result
+
+from ..utils.utils import batched
+
+if TYPE_CHECKING:
+  from psycopg import AsyncConnection
+
+
+async def get_cached_embeddings(
+  conn: AsyncConnection, model: str, content_hashes: List[bytes], batch_size: int = 1000
+) -> Result[Dict[bytes, List[float]], str]:
+  """Return {content_hash: embedding} for the hashes present in the cache."""
+  cached: Dict[bytes, List[float]] = {}
+  try:
+    async with conn.cursor() as cur:
+      for hashes_batch in batched(content_hashes, batch_size):
+        await cur.execute(
+          """
+          SELECT content_hash, embedding::real[]
+          FROM embedding_cache
+          WHERE model = %s AND content_hash = ANY(%s)
+          """,
+          (model, hashes_batch),
+        )
+        for content_hash, embedding in await cur.fetchall():
+          cached[bytes(content_hash)] = embedding
+    return Ok(cached)
+  except Exception as e:
+    return Err(f"Exception in get_cached_embeddings: {e}")
+
+
+async def store_cached_embeddings(
+  conn: AsyncConnection, model: str, items: List[Tuple[bytes, List[float]]]
+) -> Result[None, str]:
+  """Insert (content_hash, embedding) pairs, ignoring ones that are already cached."""
+  if not items:
+    return Ok(None)
+  try:
+    async with conn.cursor() as cur:
+      await cur.executemany(
+        """
+        INSERT INTO embedding_cache (model, content_hash, embedding)
+        VALUES (%s, %s, %s)
+        ON CONFLICT DO NOTHING
+        """,
+        [(model, content_hash, embedding) for content_hash, embedding in items],
+      )
+    return Ok(None)
+  except Exception as e:
+    return Err(f"Exception in store_cached_embeddings: {e}")
@@ -1,4 +1,5 @@
 from __future__ import annotations
+from enum import Enum
 from typing import List, TYPE_CHECKING, Tuple
 
 from result import Err, Ok, Result
@@ -7,6 +8,11 @@ if TYPE_CHECKING:
   from psycopg import AsyncConnection
 
 
+class IndexStatus(str, Enum):
+  READY = "ready"
+  INGESTING = "ingesting"  # being filled, or an interrupted ingest to resume
+
+
 async def get_index_id_by_name(
   conn: AsyncConnection, index_name: str
 ) -> Result[int | None, str]:
@@ -38,14 +44,17 @@ async def get_indexes_state(
 
 
 async def create_index(
-  conn: AsyncConnection, index_name: str, source_url: str
+  conn: AsyncConnection,
+  index_name: str,
+  source_url: str,
+  status: IndexStatus = IndexStatus.READY,
 ) -> Result[int, str]:
   """Create new index in database and return its ID."""
   try:
     async with conn.cursor() as cur:
       await cur.execute(
-        "INSERT INTO indexes (name, source_url) VALUES (%s, %s) RETURNING id",
-        (index_name, source_url),
+        "INSERT INTO indexes (name, source_url, status) VALUES (%s, %s, %s) RETURNING id",
+        (index_name, source_url, status.value),
       )
       row = await cur.fetchone()
       if not row:
@@ -58,6 +67,33 @@ async def create_index(
     return Err(f"Failed in create_index: {e}")
 
 
+async def get_index_status(
+  conn: AsyncConnection, index_id: int
+) -> Result[IndexStatus, str]:
+  try:
+    async with conn.cursor() as cur:
+      await cur.execute("SELECT status FROM indexes WHERE id = %s", (index_id,))
+      if not (row := await cur.fetchone()):
+        return Err(f"Failed in get_index_status: index {index_id} not found")
+      return Ok(IndexStatus(row[0]))
+  except Exception as e:
+    return Err(f"Failed in get_index_status: {e}")
+
+
+async def set_index_status(
+  conn: AsyncConnection, index_id: int, status: IndexStatus
+) -> Result[None, str]:
+  """Update the status of an index (not committed)."""
+  try:
+    async with conn.cursor() as cur:
+      await cur.execute(
+        "UPDATE indexes SET status = %s WHERE id = %s", (status.value, index_id)
+      )
+    return Ok(None)
+  except Exception as e:
+    return Err(f"Failed in set_index_status: {e}")
+
+
 # Could just use get_index_id_by_name instead
 async def check_index_exists(
   conn: AsyncConnection, index_name: str
@@ -0,0 +1,77 @@
+from __future__ import annotations
+from typing import Dict, List, TYPE_CHECKING, Tuple
+
+from result import Err, Ok, Result
+
+if TYPE_CHECKING:
+  from psycopg import AsyncConnection
+
+
+async def get_checkpoints(
+  conn: AsyncConnection, index_id: int
+) -> Result[Dict[str, int], str]:
+  """{url: chunk count} of the pages whose chunks are all stored."""
+  try:
+    async with conn.cursor() as cur:
+      await cur.execute(
+        "SELECT url, chunk_count FROM ingest_checkpoints WHERE index_id = %s",
+        (index_id,),
+      )
+      return Ok({url: chunk_count for url, chunk_count in await cur.fetchall()})
+  except Exception as e:
+    return Err(f"Exception in get_checkpoints: {e}")
+
+
+async def store_checkpoints(
+  conn: AsyncConnection, index_id: int, items: List[Tuple[str, int]]
+) -> Result[None, str]:
+  """Record (url, chunk count) of completely stored pages (not committed)."""
+  if not items:
+    return Ok(None)
+  try:
+    async with conn.cursor() as cur:
+      await cur.executemany(
+        """
+        INSERT INTO ingest_checkpoints (index_id, url, chunk_count)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (index_id, url) DO UPDATE SET chunk_count = EXCLUDED.chunk_count
+        """,
+        [(index_id, url, chunk_count) for url, chunk_count in items],
+      )
+    return Ok(None)
+  except Exception as e:
+    return Err(f"Exception in store_checkpoints: {e}")
+
+
+async def delete_uncheckpointed_chunks(
+  conn: AsyncConnection, index_id: int
+) -> Result[int, str]:
+  """Delete chunks of pages without a checkpoint, left over from a partly stored page."""
+  try:
+    async with conn.cursor() as cur:
+      await cur.execute(
+        """
+        DELETE FROM chunks c
+        WHERE c.index_id = %s
+          AND NOT EXISTS (
+            SELECT 1 FROM ingest_checkpoints k
+            WHERE k.index_id = c.index_id AND k.url = c.url
+          )
+        """,
+        (index_id,),
+      )
+      return Ok(cur.rowcount)
+  except Exception as e:
+    return Err(f"Exception in delete_uncheckpointed_chunks: {e}")
+
+
+async def clear_checkpoints(conn: AsyncConnection, index_id: int) -> Result[None, str]:
+  """Drop the checkpoints of a finished ingest (not committed)."""
+  try:
+    async with conn.cursor() as cur:
+      await cur.execute(
+        "DELETE FROM ingest_checkpoints WHERE index_id = %s", (index_id,)
+      )
+    return Ok(None)
+  except Exception as e:
+    return Err(f"Exception in clear_checkpoints: {e}")
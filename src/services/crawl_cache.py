@@ -0,0 +1,105 @@
+from dataclasses import dataclass
+import json
+from pathlib import Path
+import sqlite3
+from typing import Dict, List, Optional
+
+
+@dataclass
+class CachedPage:
+  etag: Optional[str]
+  last_modified: Optional[str]
+  page_json: str  # ScrapedPage.model_dump_json()
+  links: List[str]
+  sitemap_lastmod: Optional[str] = None  # <lastmod> of the page in the sitemap
+
+  def conditional_headers(self) -> Dict[str, str]:
+    headers = {}
+    if self.etag:
+      headers["If-None-Match"] = self.etag
+    if self.last_modified:
+      headers["If-Modified-Since"] = self.last_modified
+    return headers
+
+
+class CrawlCache:
+  """
+  Persistent (sqlite) cache of crawled pages keyed by URL and `extraction_key`:
+  the HTTP validators (ETag / Last-Modified) plus the extracted page and its
+  links, so a page answered with 304 Not Modified is reused without being
+  downloaded or parsed again. The extraction key identifies the extraction
+  settings (see ScraperConfig.extraction_fingerprint): crawls with other
+  settings share the file, never the extractions. Writes are committed every
+  `commit_every` pages, an interrupted crawl keeps most of its cache.
+  """
+
+  def __init__(
+    self, path: str | Path, extraction_key: str = "", commit_every: int = 100
+  ):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    self.extraction_key = extraction_key
+    self.commit_every = commit_every
+    self._uncommitted = 0
+    self.conn = sqlite3.connect(path)
+    self.conn.execute("PRAGMA journal_mode=WAL")
+    columns = {row[1] for row in self.conn.execute("PRAGMA table_info(pages)")}
+    if columns and "extraction_key" not in columns:
+      # Cache files of earlier versions, their extractions can not be told apart
+      self.conn.execute("DROP TABLE pages")
+    self.conn.execute(
+      """
+      CREATE TABLE IF NOT EXISTS pages (
+        url TEXT NOT NULL,
+        extraction_key TEXT NOT NULL,
+        etag TEXT,
+        last_modified TEXT,
+        page_json TEXT NOT NULL,
+        links_json TEXT NOT NULL,
+        sitemap_lastmod TEXT,
+        PRIMARY KEY (url, extraction_key)
+      )
+      """
+    )
+    self.conn.commit()
+
+  def get(self, url: str) -> Optional[CachedPage]:
+    row = self.conn.execute(
+      """
+      SELECT etag, last_modified, page_json, links_json, sitemap_lastmod
+      FROM pages WHERE url = ? AND extraction_key = ?
+      """,
+      (url, self.extraction_key),
+    ).fetchone()
+    if not row:
+      return None
+    etag, last_modified, page_json, links_json, sitemap_lastmod = row
+    return CachedPage(
+      etag, last_modified, page_json, json.loads(links_json), sitemap_lastmod
+    )
+
+  def put(self, url: str, page: CachedPage) -> None:
+    self.conn.execute(
+      """
+      INSERT OR REPLACE INTO pages
+        (url, extraction_key, etag, last_modified, page_json, links_json,
+         sitemap_lastmod)
+      VALUES (?, ?, ?, ?, ?, ?, ?)
+      """,
+      (
+        url,
+        self.extraction_key,
+        page.etag,
+        page.last_modified,
+        page.page_json,
+        json.dumps(page.links),
+        page.sitemap_lastmod,
+      ),
+    )
+    self._uncommitted += 1
+    if self._uncommitted >= self.commit_every:
+      self.conn.commit()
+      self._uncommitted = 0
+
+  def close(self) -> None:
+    self.conn.commit()
+    self.conn.close()
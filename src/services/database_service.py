@@ -1,6 +1,6 @@
 from __future__ import annotations
 from functools import lru_cache
-from typing import AsyncGenerator, TYPE_CHECKING
+from typing import AsyncContextManager, AsyncGenerator, Callable, TYPE_CHECKING
 
 from fastapi import HTTPException, Request, status
 import psycopg
@@ -42,6 +42,17 @@ async def get_db_conn(request: Request) -> AsyncGenerator[AsyncConnection]:
     )
 
 
+ConnectionFactory = Callable[[], "AsyncContextManager[AsyncConnection]"]
+
+
+def get_db_connection_factory(request: Request) -> ConnectionFactory:
+  """
+  Pooled connections on demand, for handlers that need one only for part of their
+  work (e.g. ingest: not while crawling).
+  """
+  return request.app.state.db_pool.connection
+
+
 def get_database_connection() -> Result[psycopg.Connection, str]:
   try:
     conn = psycopg.connect(get_db_connection_string())
@@ -1,20 +1,45 @@
 import asyncio
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+import gzip
+import hashlib
+import itertools
 import json
+import multiprocessing
 from pathlib import Path
 import re
 import time
-from typing import Dict, List, Optional, Set
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
 from urllib.parse import urljoin, urlparse, urlunparse
+import xml.etree.ElementTree as ElementTree
 
 import aiohttp
-from bs4 import BeautifulSoup, Tag
-from bs4.element import NavigableString
+from bs4 import BeautifulSoup, FeatureNotFound, Tag
+from bs4.element import Comment, Declaration, Doctype, NavigableString
+from bs4.element import ProcessingInstruction
 import html2text
 from pydantic import BaseModel, HttpUrl
 from result import Err, Ok, Result
 
-from .s3_uploader import upload_to_s3
+from ..models.models import IngestProgress, UploadStats
+from ..utils.url_utils import (
+  VisitedUrls,
+  canonicalize_url,
+  clean_url,
+  compile_patterns,
+)
+from .crawl_cache import CachedPage, CrawlCache
+from .host_throttle import (
+  THROTTLE_STATUSES,
+  HostThrottle,
+  parse_crawl_delay,
+  parse_retry_after,
+)
+from .page_shards import MANIFEST_NAME, ShardWriter, iter_sharded_pages
+from .page_writer import PageWriter, write_page_file
+from .response_archive import ResponseArchive
+from .s3_uploader import S3Uploader, upload_stats_summary, upload_to_s3
 
 
 class ContentSection(BaseModel):
@@ -40,12 +65,44 @@ class ScrapedPage(BaseModel):
 class ScraperConfig(BaseModel):
   max_depth: int = 3
   max_pages: int = 100
+  # Floor of the per-host delay between request starts, the actual delay and the
+  # requests in flight per host adapt to latency and 429/503 (see HostThrottle)
   delay_between_requests: float = 1.0
   timeout: int = 30
+  max_concurrency: int = 10  # crawl workers, i.e. pages in flight
+  max_concurrency_per_host: int = 3
+  respect_crawl_delay: bool = True  # robots.txt Crawl-delay raises the delay floor
+  target_latency_seconds: float = 2.0  # slower responses reduce the host's rate
+  max_delay_seconds: float = 60.0  # cap of the adapted delay and of Retry-After
+  max_retries: int = 2  # retries of a page answered with 429 / 503
+  max_duration_seconds: float | None = None  # wall-clock budget of the crawl
+  # sqlite file of the revalidation cache (ETag / Last-Modified), None disables it
+  cache_path: str | None = None
+  # sqlite archive recording every response (status, headers, body) for replays,
+  # see replay_server. Record without cache_path, 304s are not archived
+  record_path: str | None = None
+  # Seed the crawl with the urls of the site's sitemaps (robots.txt and /sitemap.xml)
+  use_sitemap: bool = False
+  max_sitemaps: int = 50  # sitemap files fetched, sitemap indexes included
+  # Parse and extract pages in a process pool of this size, 0 keeps it in-process
+  extraction_workers: int = 0
+  parser: str = "html.parser"  # BeautifulSoup parser, e.g. "lxml" if installed
+  # "single_pass" walks the content once, "legacy" is the per-selector extraction
+  extractor: str = "single_pass"
   follow_external_links: bool = False
   enable_structured_extraction: bool = True
   clean_code_blocks: bool = False
   remove_line_numbers: bool = False
+  # Keep every ScrapedPage in memory (needed for _save_to_disk and get_scraped_data)
+  retain_pages: bool = True
+  # Write every page to disk as soon as it is extracted instead of keeping it in
+  # memory until the end of the crawl, get_scraped_data then reads the files back
+  stream_output: bool = False
+  # "json" writes one file per page, "shards" compressed JSONL shards and a
+  # manifest (see page_shards), far fewer files on large sites
+  output_format: str = "json"
+  pages_per_shard: int = 1000
+  shard_compression: str = "gzip"  # or "zstd" (needs the zstandard package)
   include_patterns: List[str] = []
   exclude_patterns: List[str] = [
     r".*\.(pdf|jpg|jpeg|png|gif|zip|tar|gz)$",
@@ -55,14 +112,99 @@ class ScraperConfig(BaseModel):
     r".*/register.*",
   ]
 
+  def extraction_fingerprint(self) -> str:
+    """
+    Identifies the extraction output of this config (the settings it depends on
+    and EXTRACTION_VERSION), cached extractions are only reused under the same.
+    """
+    settings = self.model_dump(include=_EXTRACTION_SETTINGS)
+    settings["version"] = EXTRACTION_VERSION
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+# Bump when a change to the extraction code changes its output
+EXTRACTION_VERSION = 1
+_EXTRACTION_SETTINGS = {
+  "parser",
+  "extractor",
+  "enable_structured_extraction",
+  "clean_code_blocks",
+  "remove_line_numbers",
+}
+
+
+_HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+_API_ITEM_CLASSES = {"doc-heading", "api-item", "method", "function"}
+_SKIPPED_TAGS = {"script", "style", "nav", "header", "footer", "aside"}
+_SKIPPED_STRINGS = (Comment, Declaration, Doctype, ProcessingInstruction)
+
+
+def _is_section_boundary(tag: Tag) -> bool:
+  return tag.name in _HEADING_TAGS or not _API_ITEM_CLASSES.isdisjoint(
+    tag.get("class") or ()
+  )
+
+
+def _is_item_title(tag: Tag) -> bool:
+  return tag.name == "dt" or tag.name in _HEADING_TAGS
+
+
+def _section_boundaries(main_content: Tag) -> List[Tag]:
+  """
+  Elements starting a section, in document order: headings, and for API items
+  (e.g. Sphinx's <dl class="py method">) their signature or heading (first dt
+  or h1-h6) so the item's body stays part of the walked content. The content of
+  an item without one belongs to the current section.
+  """
+  boundaries: Dict[int, Tag] = {}
+  for tag in main_content.find_all(_is_section_boundary):
+    if tag.name not in _HEADING_TAGS:
+      tag = tag.find(_is_item_title)
+      if tag is None:
+        continue
+    boundaries.setdefault(id(tag), tag)
+  return list(boundaries.values())
+
 
 class DocumentationScraper:
   def __init__(self, config: ScraperConfig | None = None):
     self.config = config or ScraperConfig()
-    self.visited_urls: Set[str] = set()
+    self.visited_urls = VisitedUrls()  # canonical urls, enqueued or fetched
     self.scraped_pages: List[ScrapedPage] = []
+    self.page_writer: PageWriter | None = None
     self.base_domain = ""
     self.session: aiohttp.ClientSession | None = None
+    self.on_page: Callable[[ScrapedPage], Awaitable[None]] | None = None
+    self.progress: IngestProgress | None = None
+    self.crawl_cache: CrawlCache | None = None
+    self.response_archive: ResponseArchive | None = None
+    self.sitemap_lastmods: Dict[str, str] = {}
+    self.host_throttles: Dict[str, HostThrottle] = {}
+    self._robots_txt: Dict[str, asyncio.Task] = {}
+
+    # Running totals, valid whether or not pages are retained
+    self.pages_scraped = 0
+    self.total_sections = 0
+    self.total_words = 0
+    self.total_estimated_tokens = 0
+    self.http_requests = 0
+    self.bytes_downloaded = 0  # bodies of 200 responses, decoded
+    self.cache_hits = 0  # pages answered with 304 and reused from the cache
+    self.cache_misses = 0  # pages downloaded and parsed while the cache is enabled
+    self.sitemap_urls = 0  # pages found in sitemaps
+    self.lastmod_skips = 0  # cache hits without a request, lastmod unchanged
+    self.parse_seconds = 0.0
+    self.extract_seconds = 0.0
+    self.pages_extracted = 0
+    self.extraction_executor: ProcessPoolExecutor | None = None
+    self.stop_reason = ""
+    self.crawl_seconds = 0.0
+
+    self.duplicate_pages = 0  # fetched, but rel=canonical points to a known page
+    self.failed_pages = 0  # _scrape_page raised (extraction, writer, cache...)
+    self._include_re = compile_patterns(self.config.include_patterns)
+    self._exclude_re = compile_patterns(self.config.exclude_patterns)
 
     self.html_converter = html2text.HTML2Text()
     self.html_converter.ignore_links = False
@@ -301,6 +443,128 @@ class DocumentationScraper:
       ]
     )
 
+  def _section_from_markdown(
+    self, kind: str, title: str, markdown: str, metadata: Dict
+  ) -> Optional[ContentSection]:
+    content_without_code, code_blocks = self._extract_code_blocks(markdown)
+    if not content_without_code.strip():
+      return None
+
+    if kind == "heading":
+      if any(keyword in title.lower() for keyword in ["example", "usage", "tutorial"]):
+        kind = "example"
+      elif any(
+        keyword in title.lower()
+        for keyword in ["api", "reference", "function", "method"]
+      ):
+        kind = "api"
+
+    return ContentSection(
+      type=kind,
+      title=title,
+      content=content_without_code,
+      code_blocks=code_blocks,
+      metadata=metadata,
+    )
+
+  def _extract_sections_single_pass(
+    self, main_content: Tag
+  ) -> Tuple[List[ContentSection], str]:
+    """
+    Split the main content into sections in one walk over the DOM and convert every
+    fragment to markdown once. Sections start at headings (h1-h6) and at the
+    signatures of API items (.doc-heading, .api-item, .method, .function), see
+    _section_boundaries. API items and headings that look like functions/classes
+    make "function" sections. Text before the first boundary becomes a
+    "Main Content" section. Returns (sections, raw_content),
+    raw_content being the converted pieces joined in document order.
+    """
+    if not self.config.enable_structured_extraction:
+      content = self._clean_text(self.html_converter.handle(str(main_content)))
+      content_without_code, code_blocks = self._extract_code_blocks(content)
+      section = ContentSection(
+        type="content",
+        title="Main Content",
+        content=content_without_code,
+        code_blocks=code_blocks,
+      )
+      return [section], content
+
+    for element in main_content(list(_SKIPPED_TAGS)):
+      element.decompose()
+
+    boundaries = _section_boundaries(main_content)
+    boundary_ids = {id(boundary) for boundary in boundaries}
+    # Elements that contain a boundary are walked into, everything else is a fragment
+    containers = set()
+    for boundary in boundaries:
+      for parent in boundary.parents:
+        if parent is main_content or id(parent) in containers:
+          break
+        containers.add(id(parent))
+
+    # [(boundary element or None, [html fragments])]
+    pieces: List[Tuple[Optional[Tag], List[str]]] = [(None, [])]
+
+    def walk(node: Tag) -> None:
+      for child in node.children:
+        if isinstance(child, Tag):
+          if id(child) in boundary_ids:
+            pieces.append((child, []))
+          elif id(child) in containers:
+            walk(child)
+          else:
+            pieces[-1][1].append(str(child))
+        elif not isinstance(child, _SKIPPED_STRINGS):
+          pieces[-1][1].append(str(child))
+
+    walk(main_content)
+
+    sections: List[ContentSection] = []
+    raw_parts: List[str] = []
+    for boundary, fragments in pieces:
+      if boundary is not None:
+        title = boundary.get_text().strip()[:100]
+        if boundary.name in _HEADING_TAGS:
+          raw_parts.append(f"{'#' * int(boundary.name[1])} {title}")
+        else:
+          raw_parts.append(self._clean_text(self.html_converter.handle(str(boundary))))
+
+      html = "".join(fragments)
+      if not html.strip():
+        continue
+      markdown = self._clean_text(self.html_converter.handle(html))
+      if not markdown:
+        continue
+      raw_parts.append(markdown)
+
+      if boundary is None:
+        section = self._section_from_markdown("content", "Main Content", markdown, {})
+      else:
+        text = title.lower()
+        looks_like_function = boundary.name not in _HEADING_TAGS or any(
+          pattern in text for pattern in ["def ", "()", "function", "method", "class "]
+        )
+        if looks_like_function:
+          section = self._section_from_markdown(
+            "function", title, markdown, {"selector": boundary.name}
+          )
+        else:
+          section = self._section_from_markdown(
+            "heading", title, markdown, {"heading_level": boundary.name}
+          )
+      if section:
+        sections.append(section)
+
+    raw_content = "\n\n".join(part for part in raw_parts if part)
+    if not sections:
+      sections = [
+        ContentSection(
+          type="content", title="Main Content", content=raw_content, code_blocks=[]
+        )
+      ]
+    return sections, raw_content
+
   def _estimate_tokens(self, text: str) -> int:
     return len(text) // 4
 
@@ -318,23 +582,16 @@ class DocumentationScraper:
     return clean_path
 
   def _should_follow_url(self, url: str, base_url: str) -> bool:
-    parsed_url = urlparse(url)
-    parsed_base = urlparse(base_url)
-
     if not self.config.follow_external_links:
-      if parsed_url.netloc != parsed_base.netloc:
-        return False
-
-    for pattern in self.config.exclude_patterns:
-      if re.search(pattern, url, re.IGNORECASE):
+      if urlparse(url).netloc.lower() != urlparse(base_url).netloc.lower():
         return False
 
-    if self.config.include_patterns:
-      for pattern in self.config.include_patterns:
-        if re.search(pattern, url, re.IGNORECASE):
-          return True
+    if self._exclude_re and self._exclude_re.search(url):
       return False
 
+    if self._include_re:
+      return self._include_re.search(url) is not None
+
     return True
 
   def _extract_content(self, soup: BeautifulSoup, url: str) -> Dict:
@@ -373,11 +630,14 @@ class DocumentationScraper:
     if not main_content:
       main_content = soup.find("body") or soup
 
-    structured_content = self._extract_structured_content(main_content)
+    if self.config.extractor == "legacy":
+      structured_content = self._extract_structured_content(main_content)
 
-    # Create raw content for fallback
-    raw_content = self.html_converter.handle(str(main_content))
-    raw_content = self._clean_text(raw_content)
+      # Create raw content for fallback
+      raw_content = self.html_converter.handle(str(main_content))
+      raw_content = self._clean_text(raw_content)
+    else:
+      structured_content, raw_content = self._extract_sections_single_pass(main_content)
 
     # Statistics
     total_text = raw_content + " ".join([s.content for s in structured_content])
@@ -393,147 +653,489 @@ class DocumentationScraper:
     }
 
   def _extract_links(self, soup: BeautifulSoup, base_url: str) -> List[str]:
-    """Extract valid links from the page"""
-    links = []
+    """
+    Extract valid links from the page, without fragments and tracking params.
+    Links to the same canonical url are kept once, in page order.
+    """
+    links: Dict[str, str] = {}
 
     for link in soup.find_all("a", href=True):
-      href = link["href"]
-      absolute_url = urljoin(base_url, href)
-      parsed = urlparse(absolute_url)
-      clean_url = urlunparse(parsed._replace(fragment=""))
-
-      if self._should_follow_url(clean_url, base_url):
-        links.append(clean_url)
-
-    return list(set(links))
-
-  async def _fetch_page(self, url: str) -> Optional[BeautifulSoup]:
-    try:
-      async with self.session.get(
-        url, timeout=aiohttp.ClientTimeout(total=self.config.timeout)
-      ) as response:
-        if response.status == 200:
-          content = await response.text()
-          return BeautifulSoup(content, "html.parser")
-        else:
-          print(f"Failed to fetch {url}: HTTP {response.status}")
-          return None
-    except Exception as e:
-      print(f"Error fetching {url}: {str(e)}")
+      url = clean_url(urljoin(base_url, link["href"]))
+      if urlparse(url).scheme not in ("http", "https"):
+        continue
+      if self._should_follow_url(url, base_url):
+        links.setdefault(canonicalize_url(url), url)
+
+    return list(links.values())
+
+  def _extract_canonical_url(self, soup: BeautifulSoup, url: str) -> Optional[str]:
+    """<link rel="canonical"> of the page, if it points to the same site."""
+    canonical_link = soup.find("link", rel="canonical", href=True)
+    if not canonical_link:
       return None
-
-  async def _scrape_page(
-    self, url: str, depth: int = 0, parent_url: Optional[str] = None
-  ) -> Optional[ScrapedPage]:
-    if url in self.visited_urls:
-      return None
-
-    if depth > self.config.max_depth:
+    canonical_url = urljoin(url, canonical_link["href"])
+    if urlparse(canonical_url).netloc.lower() != urlparse(url).netloc.lower():
       return None
+    return canonical_url
+
+  async def _fetch_page(
+    self, url: str, headers: Dict[str, str] | None = None
+  ) -> Optional[Tuple[int, str, Dict[str, str]]]:
+    """
+    GET the url. Returns (status, html, validators) for 200 and 304 (empty html),
+    validators being the ETag / Last-Modified response headers that were present.
+    Requests go through the host's throttle, 429 / 503 are retried after its delay.
+    """
+    throttle = await self._host_throttle(url)
+    for attempt in range(self.config.max_retries + 1):
+      await throttle.acquire()
+      self.http_requests += 1
+      status, retry_after = None, None
+      start = time.perf_counter()
+      try:
+        async with self.session.get(
+          url,
+          headers=headers,
+          timeout=aiohttp.ClientTimeout(total=self.config.timeout),
+        ) as response:
+          status = response.status
+          retry_after = parse_retry_after(response.headers.get("Retry-After"))
+          body = await response.read() if status != 304 else b""
+          self._record_response(url, response, body)
+          if status in THROTTLE_STATUSES:
+            print(f"Throttled by {url}: HTTP {status} (attempt {attempt + 1})")
+            continue
+          if status not in (200, 304):
+            print(f"Failed to fetch {url}: HTTP {status}")
+            return None
+          content = ""
+          if status == 200:
+            self.bytes_downloaded += len(body)
+            content = await response.text()  # decodes the body read above
+          validators = {
+            name: response.headers[name]
+            for name in ("ETag", "Last-Modified")
+            if name in response.headers
+          }
+          return status, content, validators
+      except Exception as e:
+        status = None
+        print(f"Error fetching {url}: {str(e)}")
+        return None
+      finally:
+        await throttle.release(status, time.perf_counter() - start, retry_after)
+    return None
+
+  def _record_response(
+    self, url: str, response: aiohttp.ClientResponse, body: bytes
+  ) -> None:
+    if self.response_archive is not None and response.status != 304:
+      self.response_archive.put(url, response.status, dict(response.headers), body)
+
+  async def _host_throttle(self, url: str) -> HostThrottle:
+    """The throttle of the url's host, created with the host's Crawl-delay."""
+    host = urlparse(url).netloc.lower()
+    throttle = self.host_throttles.get(host)
+    if throttle:
+      return throttle
+
+    min_delay = self.config.delay_between_requests
+    if self.config.respect_crawl_delay:
+      robots = await self._get_robots_txt(url)
+      crawl_delay = parse_crawl_delay(
+        robots.decode("utf-8", errors="replace") if robots else "",
+        self.session.headers.get("User-Agent", ""),
+      )
+      if crawl_delay is not None:
+        min_delay = max(min_delay, min(crawl_delay, self.config.max_delay_seconds))
+    # Another worker may have created it while robots.txt was fetched
+    return self.host_throttles.setdefault(
+      host,
+      HostThrottle(
+        self.config.max_concurrency_per_host,
+        min_delay=min_delay,
+        max_delay=self.config.max_delay_seconds,
+        target_latency=self.config.target_latency_seconds,
+      ),
+    )
 
-    if len(self.scraped_pages) >= self.config.max_pages:
-      return None
+  async def _get_robots_txt(self, url: str) -> Optional[bytes]:
+    """robots.txt of the url's site, fetched once per crawl."""
+    root = urlunparse(urlparse(url)._replace(path="/", query="", fragment=""))
+    if root not in self._robots_txt:
+      self._robots_txt[root] = asyncio.create_task(
+        self._fetch_bytes(urljoin(root, "/robots.txt"))
+      )
+    return await self._robots_txt[root]
 
-    self.visited_urls.add(url)
+  async def _scrape_page(
+    self, url: str, depth: int = 0, parent_url: Optional[str] = None
+  ) -> Optional[Tuple[ScrapedPage, List[str]]]:
+    """
+    Fetch and parse the page once and return it with the links to follow from it.
+    Links are extracted before content extraction, which decomposes nav, header etc.
+    """
     print(f"Scraping (depth {depth}): {url}")
 
-    soup = await self._fetch_page(url)
-    if not soup:
-      return None
+    cached = self.crawl_cache.get(url) if self.crawl_cache else None
+    lastmod = self.sitemap_lastmods.get(url)
+    if cached and lastmod and cached.sitemap_lastmod == lastmod:
+      # The sitemap says the page did not change since it was cached
+      status, html, validators = 304, "", {}
+      self.lastmod_skips += 1
+    else:
+      fetch_result = await self._fetch_page(
+        url, cached.conditional_headers() if cached else None
+      )
+      if not fetch_result:
+        return None
+      status, html, validators = fetch_result
+
+    if status == 304 and cached:
+      # Unchanged since the last crawl, reuse the extraction
+      self.cache_hits += 1
+      if lastmod and cached.sitemap_lastmod != lastmod:
+        cached.sitemap_lastmod = lastmod
+        self.crawl_cache.put(url, cached)
+      scraped_page = ScrapedPage.model_validate_json(cached.page_json).model_copy(
+        update={
+          "scraped_at": datetime.now().isoformat(),
+          "depth": depth,
+          "parent_url": parent_url,
+        }
+      )
+      links: List[str] = (
+        [link for link in cached.links if self._should_follow_url(link, url)]
+        if depth < self.config.max_depth
+        else []
+      )
+    elif status == 200:
+      # Cached pages keep their links, they may be revisited at a lower depth
+      want_links = depth < self.config.max_depth or self.crawl_cache is not None
+      if self.extraction_executor:
+        extracted = await asyncio.get_running_loop().run_in_executor(
+          self.extraction_executor,
+          _extract_page_in_worker,
+          self.config.model_dump_json(),
+          html,
+          url,
+          want_links,
+        )
+      else:
+        extracted = self._parse_and_extract(html, url, want_links)
+      links = extracted["links"]
+      self.pages_extracted += 1
+      self.parse_seconds += extracted["parse_seconds"]
+      self.extract_seconds += extracted["extract_seconds"]
+      print(
+        f"Parsed {url} in {extracted['parse_seconds'] * 1000:.1f} ms, "
+        f"extracted in {extracted['extract_seconds'] * 1000:.1f} ms"
+      )
 
-    extracted = self._extract_content(soup, url)
+      page_url = extracted["canonical_url"] or url
+      if canonicalize_url(page_url) != canonicalize_url(url):
+        if page_url in self.visited_urls:
+          # rel=canonical names a page that is crawled under another url
+          self.duplicate_pages += 1
+          return None
+        self.visited_urls.add(page_url)
+
+      scraped_page = ScrapedPage(
+        url=page_url,
+        title=extracted["title"],
+        raw_content=extracted["raw_content"],
+        structured_content=extracted["structured_content"],
+        scraped_at=datetime.now().isoformat(),
+        depth=depth,
+        parent_url=parent_url,
+        word_count=extracted["word_count"],
+        estimated_tokens=extracted["estimated_tokens"],
+      )
 
-    scraped_page = ScrapedPage(
-      url=url,
-      title=extracted["title"],
-      raw_content=extracted["raw_content"],
-      structured_content=extracted["structured_content"],
-      scraped_at=datetime.now().isoformat(),
-      depth=depth,
-      parent_url=parent_url,
-      word_count=extracted["word_count"],
-      estimated_tokens=extracted["estimated_tokens"],
-    )
+      if self.crawl_cache:
+        self.cache_misses += 1
+        if validators or lastmod:
+          self.crawl_cache.put(
+            url,
+            CachedPage(
+              etag=validators.get("ETag"),
+              last_modified=validators.get("Last-Modified"),
+              page_json=scraped_page.model_dump_json(),
+              links=links,
+              sitemap_lastmod=lastmod,
+            ),
+          )
+        if depth >= self.config.max_depth:
+          links = []
+    else:
+      print(f"Unexpected 304 for {url} without a cached copy")
+      return None
 
-    self.scraped_pages.append(scraped_page)
+    if self.page_writer:
+      await self.page_writer.write(
+        scraped_page, self._clean_url_for_filename(scraped_page.url)
+      )
+    elif self.config.retain_pages:
+      self.scraped_pages.append(scraped_page)
+    if self.on_page:
+      # Awaited, so a slow consumer slows the crawl down (backpressure)
+      await self.on_page(scraped_page)
+
+    # Counted once it was handed over, a page whose write or on_page failed is not
+    self.pages_scraped += 1
+    self.total_sections += len(scraped_page.structured_content)
+    self.total_words += scraped_page.word_count
+    self.total_estimated_tokens += scraped_page.estimated_tokens
+    if self.progress:
+      self.progress.pages_scraped += 1
 
     print(
-      f"Extracted {len(extracted['structured_content'])} sections"
-      f"{extracted['word_count']} words"
-      f"~{extracted['estimated_tokens']} tokens"
+      f"Extracted {len(scraped_page.structured_content)} sections"
+      f"{scraped_page.word_count} words"
+      f"~{scraped_page.estimated_tokens} tokens"
     )
 
-    await asyncio.sleep(self.config.delay_between_requests)
-    return scraped_page
-
-  async def _scrape_recursively(
-    self, url: str, depth: int = 0, parent_url: Optional[str] = None
-  ):
-    scraped_page = await self._scrape_page(url, depth, parent_url)
-    if not scraped_page:
-      return
-
-    if (
-      depth < self.config.max_depth and len(self.scraped_pages) < self.config.max_pages
-    ):
-      soup = await self._fetch_page(url)
-      if soup:
-        links = self._extract_links(soup, url)
-
-        semaphore = asyncio.Semaphore(3)
-
-        async def limited_scrape(link):
-          async with semaphore:
-            await self._scrape_recursively(link, depth + 1, url)
+    return scraped_page, links
+
+  def _parse_and_extract(self, html: str, url: str, want_links: bool) -> Dict:
+    """
+    Parse the html once, take the links (before extraction decomposes nav, header
+    etc.) and extract the content. Timings of both steps are returned with it.
+    """
+    start = time.perf_counter()
+    soup = self._parse_html(html)
+    parsed_at = time.perf_counter()
+    links = self._extract_links(soup, url) if want_links else []
+    canonical_url = self._extract_canonical_url(soup, url)
+    extracted = self._extract_content(soup, url)
+    extracted["links"] = links
+    extracted["canonical_url"] = canonical_url
+    extracted["parse_seconds"] = parsed_at - start
+    extracted["extract_seconds"] = time.perf_counter() - parsed_at
+    return extracted
 
-        tasks = [
-          limited_scrape(link) for link in links if link not in self.visited_urls
-        ]
+  def _parse_html(self, html: str) -> BeautifulSoup:
+    try:
+      return BeautifulSoup(html, self.config.parser)
+    except FeatureNotFound:
+      print(f"Parser '{self.config.parser}' is not installed, using html.parser")
+      self.config = self.config.model_copy(update={"parser": "html.parser"})
+      return BeautifulSoup(html, "html.parser")
+
+  async def _fetch_bytes(self, url: str) -> Optional[bytes]:
+    self.http_requests += 1
+    try:
+      async with self.session.get(
+        url, timeout=aiohttp.ClientTimeout(total=self.config.timeout)
+      ) as response:
+        body = await response.read()
+        self._record_response(url, response, body)
+        if response.status != 200:
+          return None
+        self.bytes_downloaded += len(body)
+        return body
+    except Exception as e:
+      print(f"Error fetching {url}: {str(e)}")
+      return None
 
-        await asyncio.gather(*tasks)
+  async def _discover_sitemap_urls(self, base_url: str) -> List[str]:
+    """
+    Page urls listed in the site's sitemaps: the ones referenced from robots.txt
+    plus the default /sitemap.xml. Sitemap indexes are followed (up to
+    config.max_sitemaps files) and gzipped sitemaps are decompressed. Urls go
+    through the same filters as links. <lastmod> values are kept in
+    self.sitemap_lastmods.
+    """
+    root = urlunparse(urlparse(base_url)._replace(path="/", query="", fragment=""))
+    sitemaps: List[str] = []
+    robots = await self._get_robots_txt(root)
+    if robots:
+      for line in robots.decode("utf-8", errors="replace").splitlines():
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "sitemap" and value.strip():
+          sitemaps.append(urljoin(root, value.strip()))
+    sitemaps.append(urljoin(root, "/sitemap.xml"))
+
+    seen_sitemaps: Set[str] = set()
+    page_urls: Dict[str, None] = {}  # ordered set
+    while sitemaps and len(seen_sitemaps) < self.config.max_sitemaps:
+      sitemap_url = sitemaps.pop(0)
+      if sitemap_url in seen_sitemaps:
+        continue
+      seen_sitemaps.add(sitemap_url)
+
+      content = await self._fetch_bytes(sitemap_url)
+      if not content:
+        continue
+      try:
+        if content[:2] == b"\x1f\x8b":
+          content = gzip.decompress(content)
+        tree = ElementTree.fromstring(content)
+      except Exception as e:
+        print(f"Failed to parse sitemap {sitemap_url}: {e}")
+        continue
+
+      # Tags are namespaced ({http://www.sitemaps.org/...}url), match the local name
+      for element in tree:
+        children = {child.tag.rsplit("}", 1)[-1]: child for child in element}
+        if "loc" not in children or not children["loc"].text:
+          continue
+        loc = urljoin(sitemap_url, children["loc"].text.strip())
+        kind = element.tag.rsplit("}", 1)[-1]
+        if kind == "sitemap":
+          sitemaps.append(loc)
+        elif kind == "url" and self._should_follow_url(loc, base_url):
+          page_urls[loc] = None
+          lastmod = children.get("lastmod")
+          if lastmod is not None and lastmod.text:
+            self.sitemap_lastmods[loc] = lastmod.text.strip()
+
+    self.sitemap_urls = len(page_urls)
+    print(f"Found {len(page_urls)} pages in {len(seen_sitemaps)} sitemaps")
+    return list(page_urls)
+
+  async def _crawl(self, base_url: str, seed_urls: List[str] | None = None) -> str:
+    """
+    Breadth-first crawl from `base_url` with a fixed pool of config.max_concurrency
+    workers. The frontier is a priority queue ordered by depth (then discovery
+    order), so the page budget is spent on the shallowest pages first. Every fetch
+    reserves one page of the budget up front (a failed page gives it back), so
+    concurrent workers never scrape more than config.max_pages pages.
+    `seed_urls` (e.g. from sitemaps) are enqueued at depth 0 along with `base_url`.
+    Returns why the crawl stopped: "frontier_exhausted", "max_pages" or
+    "max_duration".
+    """
+    frontier: asyncio.PriorityQueue[Tuple[int, int, str, Optional[str]]] = (
+      asyncio.PriorityQueue()
+    )
+    sequence = itertools.count()
+    budget = asyncio.Condition()
+    pages_reserved = 0
+    in_flight = 0
+
+    def enqueue(url: str, depth: int, parent_url: Optional[str]) -> None:
+      self.visited_urls.add(url)
+      frontier.put_nowait((depth, next(sequence), url, parent_url))
+
+    async def worker() -> None:
+      nonlocal pages_reserved, in_flight
+      while True:
+        depth, _, url, parent_url = await frontier.get()
+        try:
+          async with budget:
+            # Wait for a free page, or until no fetch in flight can give one back
+            await budget.wait_for(
+              lambda: pages_reserved < self.config.max_pages or not in_flight
+            )
+            if pages_reserved >= self.config.max_pages:
+              continue
+            pages_reserved += 1
+            in_flight += 1
+
+          scrape_result = None
+          try:
+            # Requests per host are limited by its throttle in _fetch_page
+            scrape_result = await self._scrape_page(url, depth, parent_url)
+          except Exception as e:
+            # One bad page must not take its worker down with it
+            self.failed_pages += 1
+            print(f"Error scraping {url}: {e}")
+          finally:
+            async with budget:
+              in_flight -= 1
+              if scrape_result is None:
+                pages_reserved -= 1
+              budget.notify_all()
+
+          if scrape_result is None:
+            continue
+          _, links = scrape_result
+          for link in links:
+            if link not in self.visited_urls:
+              enqueue(link, depth + 1, url)
+        finally:
+          frontier.task_done()
+
+    enqueue(base_url, 0, None)
+    for seed_url in seed_urls or []:
+      if seed_url not in self.visited_urls:
+        enqueue(seed_url, 0, None)
+    workers = [
+      asyncio.create_task(worker()) for _ in range(self.config.max_concurrency)
+    ]
+    try:
+      await asyncio.wait_for(frontier.join(), self.config.max_duration_seconds)
+    except asyncio.TimeoutError:
+      print(f"Crawl stopped after {self.config.max_duration_seconds} seconds")
+      return "max_duration"
+    finally:
+      for task in workers:
+        task.cancel()
+      await asyncio.gather(*workers, return_exceptions=True)
 
-  def _save_to_disk(self, output_path: Path, base_url: str) -> Dict:
-    output_path.mkdir(parents=True, exist_ok=True)
+    if self.pages_scraped >= self.config.max_pages:
+      return "max_pages"
+    return "frontier_exhausted"
 
-    summary = {
+  def _build_summary(self, base_url: str) -> Dict:
+    return {
       "base_url": base_url,
-      "total_pages": len(self.scraped_pages),
-      "total_sections": sum(
-        len(page.structured_content) for page in self.scraped_pages
-      ),
-      "total_words": sum(page.word_count for page in self.scraped_pages),
-      "estimated_tokens": sum(page.estimated_tokens for page in self.scraped_pages),
+      "total_pages": self.pages_scraped,
+      "total_sections": self.total_sections,
+      "total_words": self.total_words,
+      "estimated_tokens": self.total_estimated_tokens,
+      "http_requests": self.http_requests,
+      "bytes_downloaded": self.bytes_downloaded,
+      "stop_reason": self.stop_reason,
+      "crawl_seconds": round(self.crawl_seconds, 3),
+      "cache_hits": self.cache_hits,
+      "cache_misses": self.cache_misses,
+      "sitemap_urls": self.sitemap_urls,
+      "urls_seen": len(self.visited_urls),
+      "duplicate_pages": self.duplicate_pages,
+      "failed_pages": self.failed_pages,
+      "lastmod_skips": self.lastmod_skips,
+      "parse_ms_per_page": self._per_page_ms(self.parse_seconds),
+      "extract_ms_per_page": self._per_page_ms(self.extract_seconds),
+      "hosts": {
+        host: throttle.stats() for host, throttle in self.host_throttles.items()
+      },
+      "pages_written": self.page_writer.pages_written if self.page_writer else 0,
+      "write_errors": self.page_writer.write_errors if self.page_writer else 0,
       "scraped_at": datetime.now().isoformat(),
       "config": self.config.model_dump(),
     }
 
-    with open(output_path / "summary.json", "w", encoding="utf-8") as f:
-      json.dump(summary, f, indent=2, ensure_ascii=False)
+  def _per_page_ms(self, seconds: float) -> float:
+    if not self.pages_extracted:
+      return 0.0
+    return round(seconds * 1000 / self.pages_extracted, 3)
 
-    # Save pages
-    for page in self.scraped_pages:
-      relative_path = self._clean_url_for_filename(page.url)
+  def _save_to_disk(self, output_path: Path, base_url: str) -> Dict:
+    output_path.mkdir(parents=True, exist_ok=True)
 
-      if "/" in relative_path:
-        parts = relative_path.split("/")
-        file_name = parts[-1] if parts[-1] else "index"
-        dir_path = output_path / "/".join(parts[:-1]) if len(parts) > 1 else output_path
-      else:
-        file_name = relative_path if relative_path else "index"
-        dir_path = output_path
+    summary = self._build_summary(base_url)
 
-      dir_path.mkdir(parents=True, exist_ok=True)
+    with open(output_path / "summary.json", "w", encoding="utf-8") as f:
+      json.dump(summary, f, indent=2, ensure_ascii=False)
 
-      file_path = dir_path / f"{file_name}.json"
-      counter = 1
-      original_file_path = file_path
-      while file_path.exists():
-        name = original_file_path.stem
-        file_path = dir_path / f"{name}_{counter}.json"
-        counter += 1
+    # Pages were already written while crawling
+    if self.page_writer:
+      print(f"Wrote {self.page_writer.pages_written} pages to {output_path}")
+      print(f"Total sections: {summary['total_sections']}")
+      print(f"Total estimated tokens: {summary['estimated_tokens']}")
+      return summary
 
-      with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(page.model_dump(), f, indent=2, ensure_ascii=False)
+    # Save pages
+    if self.config.output_format == "shards":
+      shard_writer = self._create_shard_writer(output_path)
+      for page in self.scraped_pages:
+        shard_writer.write(page)
+      shard_writer.close()
+    else:
+      (output_path / MANIFEST_NAME).unlink(missing_ok=True)
+      for page in self.scraped_pages:
+        write_page_file(output_path, self._clean_url_for_filename(page.url), page)
 
     print(f"Saved {len(self.scraped_pages)} pages to {output_path}")
     print(f"Total sections: {summary['total_sections']}")
@@ -541,50 +1143,161 @@ class DocumentationScraper:
 
     return summary
 
+  def _create_shard_writer(self, output_path: Path) -> ShardWriter:
+    return ShardWriter(
+      output_path,
+      pages_per_shard=self.config.pages_per_shard,
+      compression=self.config.shard_compression,
+    )
+
   async def scrape_website(
     self,
     base_url: str | HttpUrl,
     index_name: str,
     send_to_bucket: bool = False,
     output_dir: str = "data",
+    on_page: Callable[[ScrapedPage], Awaitable[None]] | None = None,
+    save_to_disk: bool = True,
+    progress: IngestProgress | None = None,
   ) -> Result[Dict, str]:
+    """
+    Crawl `base_url` and save the pages to `output_dir`/`index_name`. `on_page` is
+    awaited with every scraped page as soon as it is extracted. With
+    `save_to_disk=False` nothing is written and only the summary is returned.
+    `progress`, if given, is updated as pages are scraped. Exceptions and
+    cancellation propagate once the session, writer and caches are closed.
+    """
     base_url = str(base_url)
-    output_path = Path(output_dir)
-    output_path.mkdir(exist_ok=True)
-    summary = {}
+    s3_uploader: S3Uploader | None = None
 
-    connector = aiohttp.TCPConnector(limit=10, limit_per_host=3)
+    self.on_page = on_page
+    self.progress = progress
+    if progress:
+      progress.pages_total = self.config.max_pages
+    if not index_name:
+      return Err("Index name cannot be empty")
+
+    connector = aiohttp.TCPConnector(
+      limit=self.config.max_concurrency,
+      limit_per_host=self.config.max_concurrency_per_host,
+    )
     self.session = aiohttp.ClientSession(
       connector=connector, headers={"User-Agent": "Documentation Scraper"}
     )
 
-    if not index_name:
-      return Err("Index name cannot be empty")
-
     try:
-      output_path = Path(index_name) / Path(output_dir)
+      output_path = Path(output_dir) / index_name
+      self.page_writer = None
+      if save_to_disk and self.config.stream_output:
+        if self.config.output_format == "shards":
+          self.page_writer = PageWriter(
+            output_path, shard_writer=self._create_shard_writer(output_path)
+          )
+        else:
+          # A manifest left by an earlier sharded scrape would hide the new files
+          (output_path / MANIFEST_NAME).unlink(missing_ok=True)
+          self.page_writer = PageWriter(output_path)
+        self.page_writer.start()
+        if send_to_bucket:
+          try:
+            # Pages are uploaded as they are written, overlapping with the crawl
+            s3_uploader = S3Uploader(output_path.parent)
+            self.page_writer.on_written = s3_uploader.submit
+          except Exception as e:
+            print(f"Error: failed to create S3 client: {e}")
 
       self.base_domain = urlparse(base_url).netloc
+      if self.config.cache_path:
+        self.crawl_cache = CrawlCache(
+          self.config.cache_path, self.config.extraction_fingerprint()
+        )
+      if self.config.record_path:
+        self.response_archive = ResponseArchive(self.config.record_path)
+      if self.config.extraction_workers > 0:
+        # Spawned, a forked child would inherit the running event loop and session
+        self.extraction_executor = ProcessPoolExecutor(
+          max_workers=self.config.extraction_workers,
+          mp_context=multiprocessing.get_context("spawn"),
+        )
 
       print(f"Scraping {base_url}. Base domain: {self.base_domain}")
       start_time = time.time()
 
-      await self._scrape_recursively(base_url)
+      seed_urls: List[str] = []
+      if self.config.use_sitemap:
+        seed_urls = await self._discover_sitemap_urls(base_url)
+      self.stop_reason = await self._crawl(base_url, seed_urls)
+      if self.page_writer:
+        await self.page_writer.close()
 
       end_time = time.time()
+      self.crawl_seconds = end_time - start_time
       print(
-        f"Scraped {len(self.scraped_pages)} pages in {end_time - start_time:.2f} seconds"
+        f"Scraped {self.pages_scraped} pages in {self.crawl_seconds:.2f} seconds"
+        f" ({self.stop_reason})"
       )
 
+      if not save_to_disk:
+        return Ok(self._build_summary(base_url))
+
       summary: Dict = self._save_to_disk(output_path, base_url)
       if send_to_bucket:
-        upload_result: Result[None, str] = await upload_to_s3(output_path)
+        if s3_uploader:
+          s3_uploader.submit(output_path / "summary.json")
+          upload_result: Result[UploadStats, str] = await s3_uploader.finish()
+          s3_uploader = None
+        else:
+          upload_result = await upload_to_s3(output_path)
         if isinstance(upload_result, Err):
           print(f"Error: S3 upload failed: {upload_result.err()}")  # TODO:
+        else:
+          summary["s3_upload"] = upload_stats_summary(upload_result.ok())
 
     finally:
       await self.session.close()
-      return Ok(summary)
+      if self.page_writer:
+        # Pages scraped before a failure are still written
+        await self.page_writer.close()
+      if s3_uploader:
+        await s3_uploader.finish()
+      if self.crawl_cache:
+        self.crawl_cache.close()
+        self.crawl_cache = None
+      if self.response_archive is not None:
+        self.response_archive.close()
+        self.response_archive = None
+      if self.extraction_executor:
+        self.extraction_executor.shutdown(wait=False, cancel_futures=True)
+        self.extraction_executor = None
+
+    return Ok(summary)
+
+  def get_scraped_data(self) -> Iterator[ScrapedPage]:
+    """
+    Pages of the last crawl. With `stream_output` they are read back from disk one
+    at a time, otherwise they come from memory (if `retain_pages`).
+    """
+    if self.page_writer and self.page_writer.shard_writer:
+      return (
+        ScrapedPage.model_validate(page)
+        for page in iter_sharded_pages(self.page_writer.output_path)
+      )
+    if self.page_writer:
+      return (
+        ScrapedPage.model_validate_json(path.read_bytes())
+        for path in self.page_writer.paths
+      )
+    return iter(self.scraped_pages)
+
+
+@lru_cache(maxsize=4)
+def _get_worker_scraper(config_json: str) -> DocumentationScraper:
+  """One scraper (html2text converter, compiled config) per worker process."""
+  return DocumentationScraper(ScraperConfig.model_validate_json(config_json))
+
 
-  def get_scraped_data(self) -> List[ScrapedPage]:
-    return self.scraped_pages
+def _extract_page_in_worker(
+  config_json: str, html: str, url: str, want_links: bool
+) -> Dict:
+  """Extraction pool entry point, see DocumentationScraper._parse_and_extract."""
+  return _get_worker_scraper(config_json)._parse_and_extract(html, url, want_links)
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import time
+from typing import Callable, Dict, Optional
+
+THROTTLE_STATUSES = (429, 503)
+
+
+class HostThrottle:
+  """
+  Politeness for one host, adjusted from the responses (AIMD): the number of
+  requests in flight and the delay between request starts.
+  - 429 / 503 halve the concurrency, double the delay and honour Retry-After.
+  - Errors and responses slower than `target_latency` cut the concurrency by a
+    quarter and raise the delay by half.
+  - Other responses add about one request in flight per round trip and bring the
+    delay back down towards `min_delay`, the floor (fixed delay or Crawl-delay).
+  """
+
+  def __init__(
+    self,
+    max_concurrency: int,
+    min_delay: float = 0.0,
+    max_delay: float = 60.0,
+    target_latency: float = 2.0,
+    clock: Callable[[], float] = time.monotonic,
+  ):
+    self.max_concurrency = max_concurrency
+    self.min_delay = min_delay
+    self.max_delay = max(max_delay, min_delay)
+    self.target_latency = target_latency
+    self.clock = clock
+
+    self.concurrency = float(max_concurrency)
+    self.delay = min_delay
+    self.latency: Optional[float] = None  # moving average, seconds
+    self.in_flight = 0
+    self.next_start = 0.0  # clock time before which no request may start
+    self._slots = asyncio.Condition()
+
+    self.requests = 0
+    self.throttled = 0  # 429 / 503 responses
+    self.errors = 0
+    self.first_start: Optional[float] = None
+    self.last_end: Optional[float] = None
+
+  async def acquire(self) -> None:
+    """Wait for a free slot and for this request's turn, see `release`."""
+    async with self._slots:
+      await self._slots.wait_for(lambda: self.in_flight < max(1, int(self.concurrency)))
+      self.in_flight += 1
+      now = self.clock()
+      start = max(now, self.next_start)
+      self.next_start = start + self.delay
+
+    try:
+      if start > now:
+        await asyncio.sleep(start - now)
+    except BaseException:
+      async with self._slots:
+        self.in_flight -= 1
+        self._slots.notify_all()
+      raise
+
+    self.requests += 1
+    if self.first_start is None:
+      self.first_start = self.clock()
+
+  async def release(
+    self, status: Optional[int], latency: float, retry_after: Optional[float] = None
+  ) -> None:
+    """Record the outcome of an acquired request, `status` None for errors."""
+    async with self._slots:
+      self.in_flight -= 1
+      self.last_end = self.clock()
+      self.latency = (
+        latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+      )
+
+      if status in THROTTLE_STATUSES:
+        self.throttled += 1
+        self.concurrency = max(1.0, self.concurrency / 2)
+        self.delay = min(self.max_delay, max(self.delay * 2, self.min_delay, 0.5))
+        if retry_after is not None:
+          pause = min(retry_after, self.max_delay)
+          self.next_start = max(self.next_start, self.clock() + pause)
+      elif status is None or self.latency > self.target_latency:
+        if status is None:
+          self.errors += 1
+        self.concurrency = max(1.0, self.concurrency * 0.75)
+        self.delay = min(self.max_delay, max(self.delay * 1.5, self.min_delay, 0.1))
+      else:
+        self.concurrency = min(
+          float(self.max_concurrency), self.concurrency + 1 / self.concurrency
+        )
+        self.delay = max(self.min_delay, self.delay * 0.8)
+        if self.delay < self.min_delay + 0.01:
+          self.delay = self.min_delay
+
+      self._slots.notify_all()
+
+  def requests_per_second(self) -> float:
+    if self.first_start is None or self.last_end is None:
+      return 0.0
+    elapsed = self.last_end - self.first_start
+    return self.requests / elapsed if elapsed > 0 else float(self.requests)
+
+  def stats(self) -> Dict:
+    return {
+      "requests": self.requests,
+      "requests_per_second": round(self.requests_per_second(), 3),
+      "throttled": self.throttled,
+      "errors": self.errors,
+      "concurrency": int(self.concurrency),
+      "delay_seconds": round(self.delay, 3),
+      "min_delay_seconds": self.min_delay,
+      "latency_ms": round((self.latency or 0.0) * 1000, 1),
+    }
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+  """Seconds from a Retry-After header, given either in seconds or as an http date."""
+  if not value:
+    return None
+  try:
+    return max(0.0, float(value))
+  except ValueError:
+    pass
+  try:
+    retry_at = parsedate_to_datetime(value)
+  except (TypeError, ValueError):
+    return None
+  if retry_at.tzinfo is None:
+    retry_at = retry_at.replace(tzinfo=timezone.utc)
+  return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def parse_crawl_delay(robots_txt: str, user_agent: str) -> Optional[float]:
+  """
+  Crawl-delay of the robots.txt group for `user_agent` (a group whose User-agent
+  is a word of it), falling back to the "*" group.
+  """
+  agent_words = user_agent.lower().split()
+  delays: Dict[str, float] = {}
+  group_agents: list = []
+  in_agents = False
+  for line in robots_txt.splitlines():
+    name, _, value = line.split("#", 1)[0].partition(":")
+    name, value = name.strip().lower(), value.strip()
+    if name == "user-agent":
+      if not in_agents:
+        group_agents = []
+      group_agents.append(value.lower())
+      in_agents = True
+      continue
+    in_agents = False
+    if name == "crawl-delay":
+      try:
+        delay = float(value)
+      except ValueError:
+        continue
+      for agent in group_agents:
+        delays.setdefault(agent, delay)
+
+  for agent, delay in delays.items():
+    if agent != "*" and agent in agent_words:
+      return delay
+  return delays.get("*")
@@ -0,0 +1,189 @@
+from __future__ import annotations
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from enum import Enum
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, TYPE_CHECKING
+import uuid
+
+from fastapi import HTTPException, Request, status
+from pydantic import BaseModel
+from result import Err, Ok, Result
+
+from ..core.config import config
+from ..models.models import IngestProgress
+
+if TYPE_CHECKING:
+  from psycopg_pool import AsyncConnectionPool
+
+  from .database_service import ConnectionFactory
+
+
+# Runners get a connection factory (the pool's), not a connection: a crawl can last
+# long and must not hold a pooled connection
+IngestJobRunner = Callable[
+  ["ConnectionFactory", IngestProgress], Awaitable[Result[Dict[str, Any], str]]
+]
+
+
+class IngestJobStatus(str, Enum):
+  QUEUED = "queued"
+  RUNNING = "running"
+  COMPLETED = "completed"
+  FAILED = "failed"
+  CANCELLED = "cancelled"
+
+
+_FINISHED_STATUSES = {
+  IngestJobStatus.COMPLETED,
+  IngestJobStatus.FAILED,
+  IngestJobStatus.CANCELLED,
+}
+
+
+class IngestJobProgressSchema(BaseModel):
+  pagesTotal: int
+  pagesScraped: int
+  chunksTotal: int
+  chunksEmbedded: int
+  chunksInserted: int
+  etaSeconds: float | None
+
+
+class IngestJobSchema(BaseModel):
+  jobId: str
+  indexName: str
+  status: IngestJobStatus
+  createdAt: str
+  progress: IngestJobProgressSchema
+  result: Dict[str, Any] | None = None
+  error: str | None = None
+
+
+class IngestJob:
+  def __init__(self, index_name: str):
+    self.id = uuid.uuid4().hex
+    self.index_name = index_name
+    self.status = IngestJobStatus.QUEUED
+    self.created_at = datetime.now().isoformat()
+    self.progress = IngestProgress()
+    self.result: Dict[str, Any] | None = None
+    self.error: str | None = None
+    self.task: asyncio.Task | None = None
+
+  @property
+  def finished(self) -> bool:
+    return self.status in _FINISHED_STATUSES
+
+  def to_schema(self) -> IngestJobSchema:
+    return IngestJobSchema(
+      jobId=self.id,
+      indexName=self.index_name,
+      status=self.status,
+      createdAt=self.created_at,
+      progress=IngestJobProgressSchema(
+        pagesTotal=self.progress.pages_total,
+        pagesScraped=self.progress.pages_scraped,
+        chunksTotal=self.progress.chunks_total,
+        chunksEmbedded=self.progress.chunks_embedded,
+        chunksInserted=self.progress.chunks_inserted,
+        etaSeconds=None if self.finished else self.progress.eta_seconds(),
+      ),
+      result=self.result,
+      error=self.error,
+    )
+
+
+class IngestJobManager:
+  """
+  Runs ingest jobs in the background. At most `max_concurrent_jobs` run at once,
+  the rest wait in submission order. Jobs take a database connection from the pool
+  only when they need one.
+  """
+
+  def __init__(
+    self,
+    db_pool: AsyncConnectionPool,
+    max_concurrent_jobs: int | None = None,
+    max_retained_jobs: int | None = None,
+  ):
+    self.db_pool = db_pool
+    self.max_retained_jobs = max_retained_jobs or config.INGEST_JOBS_RETAINED
+    self._slots = asyncio.Semaphore(
+      max_concurrent_jobs or config.INGEST_MAX_CONCURRENT_JOBS
+    )
+    self._jobs: OrderedDict[str, IngestJob] = OrderedDict()
+
+  def submit(self, index_name: str, runner: IngestJobRunner) -> IngestJob:
+    job = IngestJob(index_name)
+    self._jobs[job.id] = job
+    self._forget_finished_jobs()
+    job.task = asyncio.create_task(self._run(job, runner))
+    return job
+
+  def get(self, job_id: str) -> IngestJob | None:
+    return self._jobs.get(job_id)
+
+  def cancel(self, job_id: str) -> Result[IngestJob, str]:
+    job = self._jobs.get(job_id)
+    if job is None:
+      return Err(f"Job '{job_id}' not found")
+    if job.finished:
+      return Err(f"Job '{job_id}' already finished ({job.status.value})")
+    if job.task:
+      job.task.cancel()
+    return Ok(job)
+
+  async def events(
+    self, job_id: str, interval_seconds: float | None = None
+  ) -> AsyncIterator[IngestJobSchema]:
+    """Yield a snapshot of the job every interval until (and including) it finishes."""
+    interval_seconds = interval_seconds or config.INGEST_JOB_EVENT_INTERVAL_SECONDS
+    while (job := self._jobs.get(job_id)) is not None:
+      yield job.to_schema()
+      if job.finished:
+        return
+      await asyncio.sleep(interval_seconds)
+
+  async def shutdown(self) -> None:
+    tasks = [job.task for job in self._jobs.values() if job.task and not job.finished]
+    for task in tasks:
+      task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+  async def _run(self, job: IngestJob, runner: IngestJobRunner) -> None:
+    try:
+      async with self._slots:
+        job.status = IngestJobStatus.RUNNING
+        job.progress.started_at = time.monotonic()
+        run_result = await runner(self.db_pool.connection, job.progress)
+      match run_result:
+        case Ok(result):
+          job.result = result
+          job.status = IngestJobStatus.COMPLETED
+        case Err(e):
+          job.error = e
+          job.status = IngestJobStatus.FAILED
+    except asyncio.CancelledError:
+      job.status = IngestJobStatus.CANCELLED
+    except Exception as e:
+      job.error = f"Unexpected error in ingest job: {e}"
+      job.status = IngestJobStatus.FAILED
+
+  def _forget_finished_jobs(self) -> None:
+    for job_id in list(self._jobs):
+      if len(self._jobs) <= self.max_retained_jobs:
+        break
+      if self._jobs[job_id].finished:
+        del self._jobs[job_id]
+
+
+def get_ingest_job_manager(request: Request) -> IngestJobManager:
+  manager = getattr(request.app.state, "ingest_jobs", None)
+  if manager is None:
+    raise HTTPException(
+      status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+      detail="Ingest job manager is not running",
+    )
+  return manager
@@ -1,6 +1,9 @@
+import asyncio
 from functools import lru_cache
+import weakref
 
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, OpenAI
 from result import Err, Ok, Result
 
 from ..core.config import config
@@ -13,3 +16,36 @@ def get_openai_client() -> Result[OpenAI, str]:
     return Err("OpenAI api key is missing.")
   client = OpenAI(api_key=api_key)
   return Ok(client)
+
+
+@lru_cache(maxsize=1)
+def get_async_openai_client() -> Result[AsyncOpenAI, str]:
+  """Non-blocking client for use inside request handlers and ingest code."""
+  api_key = config.OPENAI_API_KEY
+  if not api_key:
+    return Err("OpenAI api key is missing.")
+  http_client = DefaultAsyncHttpxClient(
+    limits=httpx.Limits(
+      max_connections=config.OPENAI_MAX_CONNECTIONS,
+      max_keepalive_connections=config.OPENAI_MAX_CONNECTIONS,
+    )
+  )
+  client = AsyncOpenAI(api_key=api_key, http_client=http_client)
+  return Ok(client)
+
+
+_semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = (
+  weakref.WeakKeyDictionary()
+)
+
+
+def get_openai_semaphore() -> asyncio.Semaphore:
+  """
+  Caps the number of in-flight OpenAI requests of the running event loop (the
+  server's single loop). One semaphore per loop, a semaphore can not be shared
+  between the loops of successive asyncio.run calls (scripts, tests).
+  """
+  loop = asyncio.get_running_loop()
+  if (semaphore := _semaphores.get(loop)) is None:
+    semaphore = _semaphores[loop] = asyncio.Semaphore(config.OPENAI_MAX_CONCURRENCY)
+  return semaphore
@@ -0,0 +1,144 @@
+"""
+Sharded scrape artifacts: pages as newline delimited JSON, `pages_per_shard` per
+shard file compressed with gzip (or zstd if the `zstandard` package is installed),
+plus a manifest.json listing the shards:
+
+  {"format": "jsonl-shards", "version": 1, "compression": "gzip", "pages": 2500,
+   "shards": [{"file": "pages-00000.jsonl.gz", "first_page": 0, "pages": 1000,
+               "bytes": 123456}, ...]}
+
+`first_page` is the offset of the shard's first page in the whole scrape. A
+directory without a manifest uses the one JSON file per page layout.
+"""
+
+from __future__ import annotations
+
+import gzip
+import io
+import json
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+  from pydantic import BaseModel
+
+MANIFEST_NAME = "manifest.json"
+SHARD_FORMAT = "jsonl-shards"
+_SUFFIXES = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+
+
+def _zstandard():
+  try:
+    import zstandard
+  except ImportError as e:
+    raise RuntimeError("zstd shards need the 'zstandard' package") from e
+  return zstandard
+
+
+def is_shard_file(path: Path | str) -> bool:
+  return str(path).endswith(tuple(_SUFFIXES.values()))
+
+
+def open_shard_reader(raw: IO[bytes], compression: str) -> IO[bytes]:
+  """Decompressing reader over a shard stream (local file or S3 response body)."""
+  if compression == "gzip":
+    return gzip.GzipFile(fileobj=raw, mode="rb")
+  if compression == "zstd":
+    return _zstandard().ZstdDecompressor().stream_reader(raw)
+  raise ValueError(f"Unknown shard compression: {compression}")
+
+
+def iter_shard_records(raw: IO[bytes], compression: str) -> Iterator[Dict]:
+  """Pages (dicts) of a shard, one line at a time."""
+  with open_shard_reader(raw, compression) as reader:
+    for line in io.BufferedReader(reader):
+      if line.strip():
+        yield json.loads(line)
+
+
+def read_manifest(output_path: Path) -> Optional[Dict]:
+  """The manifest of a sharded scrape, None for the one file per page layout."""
+  manifest_path = output_path / MANIFEST_NAME
+  if not manifest_path.exists():
+    return None
+  with open(manifest_path, encoding="utf-8") as f:
+    manifest = json.load(f)
+  if manifest.get("format") != SHARD_FORMAT:
+    return None
+  return manifest
+
+
+def iter_sharded_pages(output_path: Path) -> Iterator[Dict]:
+  manifest = read_manifest(output_path) or {"shards": []}
+  for shard in manifest["shards"]:
+    with open(output_path / shard["file"], "rb") as f:
+      yield from iter_shard_records(f, manifest["compression"])
+
+
+class ShardWriter:
+  """
+  Appends pages to the current shard and starts a new one every
+  `pages_per_shard` pages. Not thread safe, use it from one thread at a time.
+  `close` writes the manifest.
+  """
+
+  def __init__(
+    self, output_path: Path, pages_per_shard: int = 1000, compression: str = "gzip"
+  ):
+    if compression not in _SUFFIXES:
+      raise ValueError(f"Unknown shard compression: {compression}")
+    if compression == "zstd":
+      _zstandard()
+    self.output_path = output_path
+    self.pages_per_shard = max(pages_per_shard, 1)
+    self.compression = compression
+    self.shards: List[Dict] = []
+    self.pages = 0
+    self._raw: IO[bytes] | None = None
+    self._stream: IO[bytes] | None = None
+    output_path.mkdir(parents=True, exist_ok=True)
+
+  def _open_shard(self) -> None:
+    name = f"pages-{len(self.shards):05d}{_SUFFIXES[self.compression]}"
+    self.shards.append({"file": name, "first_page": self.pages, "pages": 0, "bytes": 0})
+    self._raw = open(self.output_path / name, "wb")
+    if self.compression == "gzip":
+      self._stream = gzip.GzipFile(fileobj=self._raw, mode="wb", mtime=0)
+    else:
+      self._stream = _zstandard().ZstdCompressor().stream_writer(self._raw)
+
+  def _close_shard(self) -> Path:
+    self._stream.close()  # the zstd writer closes the file too
+    if not self._raw.closed:
+      self._raw.close()
+    shard = self.shards[-1]
+    path = self.output_path / shard["file"]
+    shard["bytes"] = path.stat().st_size
+    self._raw = self._stream = None
+    return path
+
+  def write(self, page: BaseModel) -> Optional[Path]:
+    """Append a page, returns the path of the shard it completed, if any."""
+    if self._stream is None:
+      self._open_shard()
+    self._stream.write(page.model_dump_json().encode() + b"\n")
+    self.shards[-1]["pages"] += 1
+    self.pages += 1
+    if self.shards[-1]["pages"] >= self.pages_per_shard:
+      return self._close_shard()
+    return None
+
+  def close(self) -> List[Path]:
+    """Finish the last shard and write the manifest, returns the files written."""
+    paths = [self._close_shard()] if self._stream is not None else []
+    manifest = {
+      "format": SHARD_FORMAT,
+      "version": 1,
+      "compression": self.compression,
+      "pages": self.pages,
+      "shards": self.shards,
+    }
+    manifest_path = self.output_path / MANIFEST_NAME
+    with open(manifest_path, "w", encoding="utf-8") as f:
+      json.dump(manifest, f, indent=2)
+    return paths + [manifest_path]
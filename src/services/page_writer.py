@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from pathlib import Path
+import time
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+  from pydantic import BaseModel
+
+  from .page_shards import ShardWriter
+
+
+def resolve_page_path(output_path: Path, relative_path: str) -> Path:
+  """
+  File of a page under `output_path`: "guide/install" -> guide/install.json, the
+  root page -> index.json. An existing file gets a _1, _2... suffix instead of
+  being overwritten. Creates the parent directories.
+  """
+  parts = relative_path.split("/")
+  file_name = parts[-1] or "index"
+  dir_path = output_path.joinpath(*parts[:-1]) if len(parts) > 1 else output_path
+  dir_path.mkdir(parents=True, exist_ok=True)
+
+  file_path = dir_path / f"{file_name}.json"
+  counter = 1
+  while file_path.exists():
+    file_path = dir_path / f"{file_name}_{counter}.json"
+    counter += 1
+  return file_path
+
+
+def write_page_file(output_path: Path, relative_path: str, page: BaseModel) -> Path:
+  file_path = resolve_page_path(output_path, relative_path)
+  with open(file_path, "w", encoding="utf-8") as f:
+    json.dump(page.model_dump(), f, indent=2, ensure_ascii=False)
+  return file_path
+
+
+class PageWriter:
+  """
+  Writes scraped pages to `output_path` in a background task as they are queued,
+  files are written in a thread so the event loop keeps crawling. The queue is
+  bounded: if the disk falls `queue_size` pages behind, `write` waits.
+  Only the paths of written files are kept in memory. `on_written`, if set, is
+  called with every written file (e.g. to upload it while the crawl goes on).
+  With a `shard_writer` pages are appended to shards instead of one file each,
+  a file is then written when a shard is complete and on close (last shard and
+  manifest).
+  """
+
+  def __init__(
+    self,
+    output_path: Path,
+    queue_size: int = 256,
+    shard_writer: ShardWriter | None = None,
+  ):
+    self.output_path = output_path
+    self.shard_writer = shard_writer
+    self.queue: asyncio.Queue[Optional[Tuple[BaseModel, str]]] = asyncio.Queue(
+      maxsize=queue_size
+    )
+    self.paths: List[Path] = []
+    self.pages_written = 0
+    self.write_errors = 0
+    self.write_seconds = 0.0
+    self.on_written: Callable[[Path], None] | None = None
+    self._task: asyncio.Task | None = None
+
+  def start(self) -> None:
+    self.output_path.mkdir(parents=True, exist_ok=True)
+    self._task = asyncio.create_task(self._run())
+
+  async def write(self, page: BaseModel, relative_path: str) -> None:
+    await self.queue.put((page, relative_path))
+
+  async def _run(self) -> None:
+    while True:
+      item = await self.queue.get()
+      if item is None:
+        return
+      page, relative_path = item
+      start = time.perf_counter()
+      try:
+        if self.shard_writer:
+          file_path = await asyncio.to_thread(self.shard_writer.write, page)
+        else:
+          file_path = await asyncio.to_thread(
+            write_page_file, self.output_path, relative_path, page
+          )
+        self.pages_written += 1
+        if file_path:
+          self._written(file_path)
+      except Exception as e:
+        self.write_errors += 1
+        print(f"Failed to write page {relative_path}: {e}")
+      self.write_seconds += time.perf_counter() - start
+
+  def _written(self, file_path: Path) -> None:
+    self.paths.append(file_path)
+    if self.on_written:
+      self.on_written(file_path)
+
+  async def close(self) -> None:
+    """Wait for the queued pages to be written and stop the writer."""
+    if self._task is None:
+      return
+    if not self._task.done():
+      await self.queue.put(None)
+    await self._task
+    self._task = None
+    if self.shard_writer:
+      for file_path in await asyncio.to_thread(self.shard_writer.close):
+        self._written(file_path)
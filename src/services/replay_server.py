@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from contextlib import asynccontextmanager
+import random
+from typing import AsyncIterator, Optional
+from urllib.parse import urlsplit
+
+from aiohttp import web
+
+from .response_archive import ResponseArchive
+
+# Bodies of these types get their origin urls rewritten to the replay server
+_TEXT_TYPES = ("text/", "application/xml", "application/xhtml", "application/json")
+
+
+class ReplayServer:
+  """
+  Local HTTP server answering from a ResponseArchive, for reproducible crawls and
+  benchmarks. Requests are looked up as `origin` + path and query (`origin`
+  defaults to the most archived one) and absolute links to the origin in text
+  bodies and Location headers are rewritten to the server, so a crawl started at
+  the server stays on it. Every response can be delayed by `latency` (plus up to
+  `jitter`) seconds, and a fraction `error_rate` of them is replaced by
+  `error_status` (with Retry-After `retry_after` if set). `seed` makes the
+  injected errors and jitter repeatable.
+  """
+
+  def __init__(
+    self,
+    archive_path: str,
+    origin: Optional[str] = None,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    error_status: int = 503,
+    retry_after: Optional[float] = None,
+    seed: int = 0,
+  ):
+    self.archive = ResponseArchive(archive_path)
+    self.origin = (origin or self._most_archived_origin()).rstrip("/")
+    self.latency = latency
+    self.jitter = jitter
+    self.error_rate = error_rate
+    self.error_status = error_status
+    self.retry_after = retry_after
+    self.random = random.Random(seed)
+    self.base_url = ""
+
+    self.requests = 0
+    self.errors_injected = 0
+    self.bytes_served = 0
+
+  def _most_archived_origin(self) -> str:
+    origins = Counter(
+      f"{parts.scheme}://{parts.netloc}"
+      for parts in (urlsplit(response.url) for response in self.archive)
+    )
+    if not origins:
+      raise ValueError("The archive is empty")
+    return origins.most_common(1)[0][0]
+
+  def _rewrite(self, data: bytes) -> bytes:
+    netloc = urlsplit(self.origin).netloc
+    for origin in (f"https://{netloc}", f"http://{netloc}"):
+      data = data.replace(origin.encode(), self.base_url.encode())
+    return data.replace(
+      f"//{netloc}".encode(), f"//{urlsplit(self.base_url).netloc}".encode()
+    )
+
+  async def handler(self, request: web.Request) -> web.Response:
+    self.requests += 1
+    delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+    if delay:
+      await asyncio.sleep(delay)
+
+    if self.error_rate and self.random.random() < self.error_rate:
+      self.errors_injected += 1
+      headers = {"Retry-After": str(self.retry_after)} if self.retry_after else {}
+      return web.Response(status=self.error_status, headers=headers)
+
+    archived = self.archive.get(self.origin + request.path_qs)
+    if not archived:
+      return web.Response(status=404)
+
+    headers = dict(archived.headers)
+    body = archived.body
+    content_type = next(
+      (value for name, value in headers.items() if name.lower() == "content-type"), ""
+    )
+    if content_type.startswith(_TEXT_TYPES):
+      body = self._rewrite(body)
+    for name, value in headers.items():
+      if name.lower() == "location":
+        headers[name] = self._rewrite(value.encode()).decode()
+    self.bytes_served += len(body)
+    return web.Response(status=archived.status, headers=headers, body=body)
+
+  @asynccontextmanager
+  async def serve(self, host: str = "127.0.0.1", port: int = 0) -> AsyncIterator[str]:
+    """Run the server, yields its base url."""
+    app = web.Application()
+    app.router.add_get("/{tail:.*}", self.handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    self.base_url = f"http://{host}:{bound_port}"
+    try:
+      yield self.base_url + "/"
+    finally:
+      await runner.cleanup()
+
+  def close(self) -> None:
+    self.archive.close()
@@ -0,0 +1,90 @@
+from dataclasses import dataclass
+import json
+from pathlib import Path
+import sqlite3
+from typing import Dict, Iterator, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+# Not replayed: they describe the original transfer, not the (decoded) body
+_TRANSFER_HEADERS = {
+  "connection",
+  "content-encoding",
+  "content-length",
+  "keep-alive",
+  "transfer-encoding",
+}
+
+
+def _archive_key(url: str) -> str:
+  """Same key for "https://host" and "https://host/", fragments dropped."""
+  parts = urlsplit(url)
+  return urlunsplit(parts._replace(path=parts.path or "/", fragment=""))
+
+
+@dataclass
+class ArchivedResponse:
+  url: str
+  status: int
+  headers: Dict[str, str]
+  body: bytes
+
+
+class ResponseArchive:
+  """
+  Recording of the responses fetched during a crawl (sqlite, keyed by URL: the
+  status, headers and decoded body). The last response of a URL wins, so a page
+  throttled and then fetched is archived with its 200. See replay_server for
+  serving an archive.
+  """
+
+  def __init__(self, path: str | Path):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    self.conn = sqlite3.connect(path)
+    self.conn.execute("PRAGMA journal_mode=WAL")
+    self.conn.execute(
+      """
+      CREATE TABLE IF NOT EXISTS responses (
+        url TEXT PRIMARY KEY,
+        status INTEGER NOT NULL,
+        headers_json TEXT NOT NULL,
+        body BLOB NOT NULL
+      )
+      """
+    )
+
+  def put(self, url: str, status: int, headers: Dict[str, str], body: bytes) -> None:
+    headers = {
+      name: value
+      for name, value in headers.items()
+      if name.lower() not in _TRANSFER_HEADERS
+    }
+    self.conn.execute(
+      """
+      INSERT OR REPLACE INTO responses (url, status, headers_json, body)
+      VALUES (?, ?, ?, ?)
+      """,
+      (_archive_key(url), status, json.dumps(headers), body),
+    )
+
+  def get(self, url: str) -> Optional[ArchivedResponse]:
+    row = self.conn.execute(
+      "SELECT status, headers_json, body FROM responses WHERE url = ?",
+      (_archive_key(url),),
+    ).fetchone()
+    if not row:
+      return None
+    status, headers_json, body = row
+    return ArchivedResponse(url, status, json.loads(headers_json), body)
+
+  def __iter__(self) -> Iterator[ArchivedResponse]:
+    for url, status, headers_json, body in self.conn.execute(
+      "SELECT url, status, headers_json, body FROM responses ORDER BY url"
+    ):
+      yield ArchivedResponse(url, status, json.loads(headers_json), body)
+
+  def __len__(self) -> int:
+    return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+  def close(self) -> None:
+    self.conn.commit()
+    self.conn.close()
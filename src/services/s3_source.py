@@ -0,0 +1,33 @@
+import json
+from typing import Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+
+def list_json_objects(s3, bucket: str, prefix: str) -> List[str]:
+  """Keys of the .json objects under `prefix` (all pages of the listing)."""
+  keys = []
+  paginator = s3.get_paginator("list_objects_v2")
+  for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+    for obj in page.get("Contents", []):
+      if obj["Key"].endswith(".json"):
+        keys.append(obj["Key"])
+  return keys
+
+
+def read_json_object(s3, bucket: str, key: str) -> Dict:
+  """Parse the object straight from the response stream, no local copy."""
+  body = s3.get_object(Bucket=bucket, Key=key)["Body"]
+  try:
+    return json.load(body)
+  finally:
+    body.close()
+
+
+def read_optional_json_object(s3, bucket: str, key: str) -> Optional[Dict]:
+  try:
+    return read_json_object(s3, bucket, key)
+  except ClientError as e:
+    if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+      return None
+    raise
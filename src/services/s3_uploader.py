@@ -1,17 +1,135 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+import hashlib
 from pathlib import Path
+import time
+from typing import List, Tuple
 
 import boto3
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError, NoCredentialsError
 from result import Err, Ok, Result
 
 from ..core.config import config
+from ..models.models import UploadStats
+from .page_shards import is_shard_file
 
 
-async def upload_to_s3(target_dir: Path) -> Result[None, str]:
+def get_s3_client(max_pool_connections: int = 10):
+  """boto3 S3 client from the config (clients are thread safe)."""
+  return boto3.client(
+    "s3",
+    aws_access_key_id=config.AWS_ACCESS_KEY_ID or None,
+    aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY or None,
+    region_name=config.AWS_REGION or None,
+    endpoint_url=config.AWS_ENDPOINT_URL or None,
+    config=BotoConfig(max_pool_connections=max_pool_connections),
+  )
+
+
+def _file_md5(file_path: Path) -> str:
+  md5 = hashlib.md5()
+  with open(file_path, "rb") as f:
+    for block in iter(lambda: f.read(1 << 20), b""):
+      md5.update(block)
+  return md5.hexdigest()
+
+
+def _is_uploaded(s3, bucket: str, key: str, md5: str) -> bool:
   """
-  Recursively uploads all .json files in target_dir to S3.
+  Whether the object exists with the same content: its ETag is the MD5 for single
+  part uploads, multipart uploads are recognized by the md5 metadata we set.
+  """
+  try:
+    head = s3.head_object(Bucket=bucket, Key=key)
+  except ClientError as e:
+    if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+      return False
+    raise
+  return head["ETag"].strip('"') == md5 or head.get("Metadata", {}).get("md5") == md5
+
+
+def _upload_file(s3, bucket: str, file_path: Path, key: str) -> Tuple[bool, int]:
+  """Upload unless unchanged, returns (uploaded, size). Runs in a worker thread."""
+  md5 = _file_md5(file_path)
+  if _is_uploaded(s3, bucket, key, md5):
+    return False, 0
+  s3.upload_file(str(file_path), bucket, key, ExtraArgs={"Metadata": {"md5": md5}})
+  return True, file_path.stat().st_size
+
+
+class S3Uploader:
+  """
+  Uploads files to the bucket from a bounded thread pool while the caller goes on,
+  e.g. pages as the scraper writes them. Keys are the paths relative to `root_dir`.
+  Files whose content is already in the bucket are skipped. Call `finish` to wait
+  for the uploads and get the statistics.
+  """
+
+  def __init__(self, root_dir: Path, workers: int | None = None):
+    self.root_dir = Path(root_dir)
+    self.bucket = config.AWS_S3_BUCKET_NAME
+    self.workers = workers or config.S3_UPLOAD_WORKERS
+    self.s3 = get_s3_client(max_pool_connections=self.workers)
+    self.executor = ThreadPoolExecutor(
+      max_workers=self.workers, thread_name_prefix="s3-upload"
+    )
+    self.futures: List[asyncio.Future] = []
+    self.started_at = time.perf_counter()
+
+  def submit(self, file_path: Path) -> None:
+    key = file_path.relative_to(self.root_dir).as_posix()
+    self.futures.append(
+      asyncio.get_running_loop().run_in_executor(
+        self.executor, _upload_file, self.s3, self.bucket, file_path, key
+      )
+    )
+
+  async def finish(self) -> Result[UploadStats, str]:
+    try:
+      results = await asyncio.gather(*self.futures, return_exceptions=True)
+    finally:
+      self.executor.shutdown(wait=False)
+
+    stats = UploadStats(seconds=time.perf_counter() - self.started_at)
+    for result in results:
+      match result:
+        case NoCredentialsError():
+          return Err("Err in upload_to_s3: credentials not available for aws")
+        case ClientError():
+          return Err(f"Err in upload_to_s3: client error occurred: {result}")
+        case Exception():
+          return Err(f"Err in upload_to_s3: {result}")
+        case (True, size):
+          stats.files_uploaded += 1
+          stats.bytes_uploaded += size
+        case _:
+          stats.files_skipped += 1
+
+    print(
+      f"S3 upload: {stats.files_uploaded} uploaded, {stats.files_skipped} unchanged, "
+      f"{stats.bytes_per_second / 1e6:.2f} MB/s"
+    )
+    return Ok(stats)
+
+
+def upload_stats_summary(stats: UploadStats) -> dict:
+  return {
+    **asdict(stats),
+    "seconds": round(stats.seconds, 3),
+    "bytes_per_second": round(stats.bytes_per_second),
+    "files_per_second": round(stats.files_per_second, 2),
+  }
+
+
+async def upload_to_s3(target_dir: Path) -> Result[UploadStats, str]:
+  """
+  Recursively uploads all .json files and page shards in target_dir to S3,
+  concurrently.
   The name (key) of the stored object its relative path to target_dir without its last directory
   "data/index/file.json" -> "index/file.json"
+  Files already in the bucket with the same content are skipped.
   """
   target_dir = Path(target_dir)
   if not target_dir.is_dir():
@@ -20,30 +138,18 @@ async def upload_to_s3(target_dir: Path) -> Result[None, str]:
     )
 
   try:
-    s3 = boto3.client(
-      "s3",
-      aws_access_key_id=config.AWS_ACCESS_KEY_ID,
-      aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY,
-      region_name=config.AWS_REGION,
-    )
+    uploader = S3Uploader(target_dir.parent)
   except Exception as e:
     return Err(f"Failed to create S3 client: {e}")
 
-  bucket = config.AWS_S3_BUCKET_NAME
-  target_dir_no_last_dir: Path = target_dir.parent
-
   try:
-    for file_path in target_dir.rglob("*.json"):
-      if file_path.is_file():
-        try:
-          s3.upload_file(
-            str(file_path), bucket, str(file_path.relative_to(target_dir_no_last_dir))
-          )
-        except NoCredentialsError:
-          return Err("Err in upload_to_s3: credentials not available for aws")
-        except ClientError as e:
-          return Err(f"Err in upload_to_s3: client error occurred: {e}")
+    for file_path in target_dir.rglob("*"):
+      if file_path.is_file() and (
+        file_path.suffix == ".json" or is_shard_file(file_path)
+      ):
+        uploader.submit(file_path)
   except Exception as e:
+    await uploader.finish()
     return Err(f"Error walking directory: {e}")
 
-  return Ok(None)
+  return await uploader.finish()
@@ -1,21 +1,53 @@
 from __future__ import annotations
+import asyncio
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 import json
+import multiprocessing
 from pathlib import Path
-from typing import List, TYPE_CHECKING, Tuple
+from typing import IO, Callable, Dict, List, TYPE_CHECKING, Tuple
 
 from pydantic import BaseModel
 from result import Err, Ok, Result
 
-from ..models.models import ChunkData
-from ..repositories.chunk_repository import insert_chunks
-from ..repositories.index_repository import check_index_exists, create_index
-from ..services.openai_service import get_openai_client
+from ..core.config import config
+from ..models.models import ChunkData, IngestProgress, InsertStats
+from ..rag.chunker import TextWindow, split_into_token_windows, truncate_to_tokens
+from ..repositories.chunk_repository import (
+  delete_chunks,
+  get_chunk_identities,
+  insert_chunks,
+)
+from ..repositories.index_repository import (
+  IndexStatus,
+  create_index,
+  get_index_id_by_name,
+  get_index_status,
+  set_index_status,
+)
+from ..repositories.ingest_checkpoint_repository import (
+  clear_checkpoints,
+  delete_uncheckpointed_chunks,
+  get_checkpoints,
+  store_checkpoints,
+)
+from ..rag.providers import get_embedding_provider
 from ..utils.utils import get_embed_token_count
+from .page_shards import MANIFEST_NAME, SHARD_FORMAT, iter_shard_records, read_manifest
+from .s3_source import list_json_objects, read_json_object, read_optional_json_object
+from .s3_uploader import get_s3_client
 
 if TYPE_CHECKING:
-  from openai import OpenAI
   from psycopg import AsyncConnection
 
+  from ..rag.providers import EmbeddingProvider
+
+
+_NUMBERING_RESERVE = 8
+# The title header repeated in every chunk takes at most this share of the window
+_HEADER_SHARE = 0.25
+
 
 class StorageStatistics(BaseModel):
   chunks_inserted: int
@@ -27,31 +59,66 @@ class StorageStatistics(BaseModel):
   total_files_processed: int
   index_name: str
   source_url: str
-
-
-def _chunk_content(content: str, max_chars: int = 2000) -> List[str]:
-  """Split content into smaller chunks if needed."""
-  # TODO: make this better
-  if len(content) <= max_chars:
-    return [content]
-
+  embedding_cache_hits: int = 0
+  embedding_cache_hit_rate: float = 0.0
+  embeddings_requested: int = 0
+  incremental: bool = False
+  chunks_added: int = 0
+  chunks_removed: int = 0
+  chunks_unchanged: int = 0
+  chunks_not_refetched: int = 0  # kept, their page is missing from the new scrape
+  resumed: bool = False
+  chunks_already_stored: int = 0  # stored by the interrupted ingest that was resumed
+
+
+def chunk_page_data(data: Dict, default_url: str = "") -> List[ChunkData]:
+  """
+  Turn a scraped page (ScrapedPage.model_dump() / saved JSON) into chunks of at most
+  config.CHUNK_MAX_TOKENS tokens. Every piece of a split section repeats the page
+  and section title header, truncated to a quarter of the window so long titles
+  do not leave no room for the content.
+  """
   chunks = []
-  words = content.split()
-  current_chunk = []
-  current_length = 0
-
-  for word in words:
-    word_length = len(word) + 1  # +1 for space
-    if current_length + word_length > max_chars and current_chunk:
-      chunks.append(" ".join(current_chunk))
-      current_chunk = [word]
-      current_length = word_length
-    else:
-      current_chunk.append(word)
-      current_length += word_length
+  header_budget = int(config.CHUNK_MAX_TOKENS * _HEADER_SHARE)
+  page_title = truncate_to_tokens(data.get("title", ""), header_budget // 2)
+  title_budget = header_budget - get_embed_token_count(f"{page_title}\n\n")
+  structured_content = data.get("structured_content", [])
+  url = data.get("url", default_url)
+
+  for item in structured_content:
+    # Disable this for now
+    # if item.get("type") != "heading":
+    #   continue
+
+    title = truncate_to_tokens(item.get("title", "").strip(), title_budget)
+    content = item.get("content", "").strip()
+
+    if not content:
+      continue
+
+    # Base chunk schema
+    header = f"{page_title}\n{title}\n"
+    # Leave room for the " (i/n)" numbering added to split sections
+    body_budget = (
+      config.CHUNK_MAX_TOKENS - get_embed_token_count(header) - _NUMBERING_RESERVE
+    )
+    windows: List[TextWindow] = split_into_token_windows(
+      content, max(body_budget, 1), config.CHUNK_OVERLAP_TOKENS
+    )
 
-  if current_chunk:
-    chunks.append(" ".join(current_chunk))
+    for i, window in enumerate(windows, 1):
+      section = title if len(windows) == 1 else f"{title} ({i}/{len(windows)})"
+      piece_header = f"{page_title}\n{section}\n"
+      final_content = piece_header + window.text
+      chunks.append(
+        ChunkData(
+          content=final_content,
+          url=url,
+          char_length=len(final_content),
+          tokens=get_embed_token_count(piece_header) + window.tokens,
+          section=section,
+        )
+      )
 
   return chunks
 
@@ -62,63 +129,52 @@ def _process_json_file(file_path: Path) -> Result[List[ChunkData], str]:
     with open(file_path, "r", encoding="utf-8") as f:
       data = json.load(f)
 
-    chunks = []
-    page_title = data.get("title", "")
-    structured_content = data.get("structured_content", [])
-    url = data.get("url", str(file_path))
+    return Ok(chunk_page_data(data, str(file_path)))
 
-    for item in structured_content:
-      # Disable this for now
-      # if item.get("type") != "heading":
-      #   continue
+  except Exception as e:
+    return Err(f"Failed to process file {file_path}: {e}")
 
-      title = item.get("title", "").strip()
-      content = item.get("content", "").strip()
 
-      if not content:
-        continue
+def _process_s3_object(s3, bucket: str, key: str) -> Result[List[ChunkData], str]:
+  """Read a scraped page from the bucket and return chunk data."""
+  try:
+    return Ok(
+      chunk_page_data(read_json_object(s3, bucket, key), f"s3://{bucket}/{key}")
+    )
+  except Exception as e:
+    return Err(f"Failed to process object {key}: {e}")
 
-      # Base chunk schema
-      base_content = f"{page_title}\n{title}\n{content}"
 
-      # Check if content needs further chunking
-      content_chunks = _chunk_content(base_content)
+def _chunk_shard(raw: IO[bytes], compression: str, name: str) -> List[ChunkData]:
+  chunks = []
+  for i, data in enumerate(iter_shard_records(raw, compression)):
+    chunks.extend(chunk_page_data(data, f"{name}#{i}"))
+  return chunks
 
-      if len(content_chunks) == 1:
-        chunk_data = ChunkData(
-          content=base_content,
-          url=url,
-          char_length=len(base_content),
-          tokens=get_embed_token_count(base_content),
-        )
-        chunks.append(chunk_data)
-      else:
-        # Multiple chunks needed
-        for i, chunk_content in enumerate(content_chunks, 1):
-          # Replace title with numbered title
-          # TODO: this does not account for page_title and tile being present
-          # only in the first splitted chunk
-          lines = chunk_content.split("\n", 2)
-          if len(lines) >= 2:
-            numbered_title = f"{title} ({i}/{len(content_chunks)})"
-            final_content = (
-              f"{lines[0]}\n{numbered_title}\n{lines[2] if len(lines) > 2 else ''}"
-            )
-          else:
-            final_content = chunk_content
-
-          chunk_data = ChunkData(
-            content=final_content,
-            url=url,
-            char_length=len(final_content),
-            tokens=get_embed_token_count(final_content),
-          )
-          chunks.append(chunk_data)
 
-    return Ok(chunks)
+def _process_shard_file(
+  file_path: Path, compression: str
+) -> Result[List[ChunkData], str]:
+  """Chunk data of all pages of a local shard (see page_shards)."""
+  try:
+    with open(file_path, "rb") as f:
+      return Ok(_chunk_shard(f, compression, str(file_path)))
+  except Exception as e:
+    return Err(f"Failed to process shard {file_path}: {e}")
 
+
+def _process_s3_shard(
+  s3, bucket: str, key: str, compression: str
+) -> Result[List[ChunkData], str]:
+  """Chunk data of all pages of a shard, decompressed from the response stream."""
+  try:
+    body = s3.get_object(Bucket=bucket, Key=key)["Body"]
+    try:
+      return Ok(_chunk_shard(body, compression, f"s3://{bucket}/{key}"))
+    finally:
+      body.close()
   except Exception as e:
-    return Err(f"Failed to process file {file_path}: {e}")
+    return Err(f"Failed to process shard {key}: {e}")
 
 
 def _find_json_files(data_dir: Path) -> List[Path]:
@@ -130,6 +186,138 @@ def _find_json_files(data_dir: Path) -> List[Path]:
   return json_files
 
 
+async def _collect_chunks(
+  json_files: List,
+  debug_mode: bool,
+  max_debug_chunks: int,
+  workers: int,
+  process: Callable[..., Result[List[ChunkData], str]] | None = None,
+  executor_kind: str | None = None,
+) -> Tuple[List[ChunkData], int]:
+  """
+  Run `process` (default _process_json_file) over all files and return (chunks,
+  files processed).
+  With workers > 1 files are processed in a process (or thread) pool, a bounded
+  window of files ahead of the consumer. Results are consumed in submission order,
+  so chunk order is the same as in the serial path, and the debug limit still
+  stops the work early. `executor_kind` ("process" / "thread") defaults to
+  config.INGEST_PREPROCESS_EXECUTOR.
+  """
+  all_chunks: List[ChunkData] = []
+  files_processed = 0
+  process = process or _process_json_file
+  executor_kind = executor_kind or config.INGEST_PREPROCESS_EXECUTOR
+
+  if workers <= 1:
+    for json_file in json_files:
+      process_result: Result[List[ChunkData], str] = process(json_file)
+      if isinstance(process_result, Err):
+        # logger.warning(f"Skipping file {json_file}: {process_result.err()}")
+        continue
+
+      all_chunks.extend(process_result.ok())
+      files_processed += 1
+
+      if debug_mode and len(all_chunks) >= max_debug_chunks:
+        break
+
+    return all_chunks, files_processed
+
+  executor: Executor = (
+    ThreadPoolExecutor(max_workers=workers)
+    if executor_kind == "thread"
+    # Spawned, a forked child would inherit the event loop and the db connections
+    else ProcessPoolExecutor(
+      max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+  )
+  loop = asyncio.get_running_loop()
+  files = iter(json_files)
+  pending: deque[asyncio.Future] = deque(
+    loop.run_in_executor(executor, process, json_file)
+    for _, json_file in zip(range(workers * 2), files)
+  )
+
+  try:
+    while pending:
+      process_result = await pending.popleft()
+      if (next_file := next(files, None)) is not None:
+        pending.append(loop.run_in_executor(executor, process, next_file))
+
+      if isinstance(process_result, Err):
+        continue
+
+      all_chunks.extend(process_result.ok())
+      files_processed += 1
+
+      if debug_mode and len(all_chunks) >= max_debug_chunks:
+        break
+  finally:
+    for future in pending:
+      future.cancel()
+    # Do not block the event loop waiting for in-flight files
+    executor.shutdown(wait=False, cancel_futures=True)
+
+  return all_chunks, files_processed
+
+
+async def _collect_s3_chunks(
+  index_name: str, debug_mode: bool, max_debug_chunks: int
+) -> Result[Tuple[List[ChunkData], int, Dict | None], str]:
+  """
+  Chunks of the pages stored under "<index_name>/" in the bucket (as uploaded by
+  upload_to_s3), returns (chunks, objects processed, scraper summary). With a
+  manifest the shards it lists are read, otherwise every page object.
+  Objects are downloaded and parsed by config.S3_INGEST_WORKERS threads, at most
+  twice that many ahead of the consumer, nothing is written to disk.
+  """
+  bucket = config.AWS_S3_BUCKET_NAME
+  workers = max(config.S3_INGEST_WORKERS, 1)
+  try:
+    s3 = get_s3_client(max_pool_connections=workers)
+    keys = await asyncio.to_thread(list_json_objects, s3, bucket, f"{index_name}/")
+    summary_key = f"{index_name}/summary.json"
+    scraper_summary = (
+      await asyncio.to_thread(read_optional_json_object, s3, bucket, summary_key)
+      if summary_key in keys
+      else None
+    )
+    manifest_key = f"{index_name}/{MANIFEST_NAME}"
+    manifest = (
+      await asyncio.to_thread(read_optional_json_object, s3, bucket, manifest_key)
+      if manifest_key in keys
+      else None
+    )
+  except Exception as e:
+    return Err(f"Failed to list s3://{bucket}/{index_name}/: {e}")
+
+  if manifest and manifest.get("format") == SHARD_FORMAT:
+    object_keys = [f"{index_name}/{shard['file']}" for shard in manifest["shards"]]
+    process = partial(
+      _process_s3_shard, s3, bucket, compression=manifest["compression"]
+    )
+  else:
+    object_keys = [
+      key
+      for key in keys
+      if key not in (summary_key, manifest_key) and not key.endswith("/settings.json")
+    ]
+    process = partial(_process_s3_object, s3, bucket)
+  if not object_keys:
+    return Err(f"No JSON objects found in s3://{bucket}/{index_name}/")
+
+  all_chunks, objects_processed = await _collect_chunks(
+    object_keys,
+    debug_mode,
+    max_debug_chunks,
+    # At least 2 so objects are always fetched in the thread pool
+    max(workers, 2),
+    process=process,
+    executor_kind="thread",
+  )
+  return Ok((all_chunks, objects_processed, scraper_summary))
+
+
 def _calculate_mode(values: List[int]) -> int:
   if not values:
     return 0
@@ -156,67 +344,345 @@ def _write_debug_chunks(chunks: List[ChunkData], index_name: str) -> None:
       f.write("=" * 50 + "\n\n")
 
 
-async def store_data(
+async def _update_index_incrementally(
   conn: AsyncConnection,
-  index_name: str,
-  debug_mode: bool = False,
-  max_debug_chunks: int = 20,
-) -> Result[StorageStatistics, str]:
-  # Fail if index_name folder doesn't exist
-  data_dir = Path("data") / index_name
-  if not data_dir.exists():
-    return Err(f"Data directory not found: {data_dir}")
+  index_id: int,
+  chunks: List[ChunkData],
+  embedding_provider: EmbeddingProvider,
+  bulk_load: bool,
+  progress: IngestProgress | None = None,
+  prune: bool = False,
+) -> Result[Tuple[InsertStats, int, int, int], str]:
+  """
+  Diff `chunks` against the stored chunks of the index by (url, section, content hash):
+  insert new ones, delete vanished ones, keep the rest. A changed chunk shows up as
+  one removal plus one addition. Everything is committed in a single transaction.
+  Only chunks of pages in the new scrape are deleted: a page missing from it may
+  just have failed this time (timeout, 503, page budget). With `prune=True` the
+  chunks of missing pages are deleted too.
+  Returns (insert stats, chunks removed, chunks unchanged, chunks not refetched).
+  """
+  stored_result: Result[
+    Dict[Tuple[str, str, bytes], List[int]], str
+  ] = await get_chunk_identities(conn, index_id)
+  if isinstance(stored_result, Err):
+    return stored_result
+  stored = stored_result.ok()
+
+  new_chunks: Dict[Tuple[str, str, bytes], ChunkData] = {}
+  for chunk in chunks:
+    new_chunks.setdefault(chunk.identity, chunk)
+  scraped_urls = {chunk.url for chunk in chunks}
+
+  chunks_to_insert = [
+    chunk for identity, chunk in new_chunks.items() if identity not in stored
+  ]
+  ids_to_delete: List[int] = []
+  chunks_unchanged = 0
+  chunks_not_refetched = 0
+  for identity, chunk_ids in stored.items():
+    if identity in new_chunks:
+      chunks_unchanged += 1
+      ids_to_delete.extend(chunk_ids[1:])  # duplicates of a kept chunk
+    elif identity[0] in scraped_urls or prune:
+      ids_to_delete.extend(chunk_ids)
+    else:
+      chunks_not_refetched += len(chunk_ids)
+
+  if progress:
+    progress.chunks_total = len(chunks_to_insert)
+
+  try:
+    delete_result: Result[int, str] = await delete_chunks(conn, ids_to_delete)
+    if isinstance(delete_result, Err):
+      await conn.rollback()
+      return delete_result
+
+    insert_stats = InsertStats()
+    if chunks_to_insert:
+      insert_result: Result[InsertStats, str] = await insert_chunks(
+        conn,
+        chunks_to_insert,
+        embedding_provider,
+        index_id,
+        bulk_load,
+        commit=False,
+        progress=progress,
+      )
+      if isinstance(insert_result, Err):
+        await conn.rollback()
+        return insert_result
+      insert_stats = insert_result.ok()
+
+    await conn.commit()
+    return Ok(
+      (insert_stats, delete_result.ok(), chunks_unchanged, chunks_not_refetched)
+    )
+  except Exception as e:
+    await conn.rollback()
+    return Err(f"Failed in _update_index_incrementally: {e}")
+
+
+async def begin_checkpointed_ingest(
+  conn: AsyncConnection, index_name: str, source_url: str, resume: bool
+) -> Result[Tuple[int, Dict[str, int]], str]:
+  """
+  Return (index id, {url: chunk count} of pages already stored) for a checkpointed
+  ingest. A new index is
+  created with the 'ingesting' status. With `resume=True` an interrupted ingest is
+  continued: chunks of partly stored pages are deleted and the checkpointed pages
+  are returned, so they can be skipped.
+  """
+  index_id_result: Result[int | None, str] = await get_index_id_by_name(
+    conn, index_name
+  )
+  if isinstance(index_id_result, Err):
+    return index_id_result
+
+  index_id: int | None = index_id_result.ok()
+  if index_id is None:
+    create_index_result: Result[int, str] = await create_index(
+      conn, index_name, source_url, IndexStatus.INGESTING
+    )
+    if isinstance(create_index_result, Err):
+      return create_index_result
+    return Ok((create_index_result.ok(), {}))
+
+  index_status_result: Result[IndexStatus, str] = await get_index_status(conn, index_id)
+  if isinstance(index_status_result, Err):
+    return index_status_result
+  if index_status_result.ok() is IndexStatus.READY:
+    return Err(f"Index '{index_name}' already exists in database")
+  if not resume:
+    return Err(f"Index '{index_name}' has an interrupted ingest, resume it to continue")
 
   try:
-    # Fail if index already exists in database
-    index_exists_result: Result[bool, str] = await check_index_exists(conn, index_name)
-    if isinstance(index_exists_result, Err):
-      return index_exists_result
+    delete_result: Result[int, str] = await delete_uncheckpointed_chunks(conn, index_id)
+    if isinstance(delete_result, Err):
+      await conn.rollback()
+      return delete_result
+    checkpoints_result: Result[Dict[str, int], str] = await get_checkpoints(
+      conn, index_id
+    )
+    if isinstance(checkpoints_result, Err):
+      await conn.rollback()
+      return checkpoints_result
+    await conn.commit()
+    return Ok((index_id, checkpoints_result.ok()))
+  except Exception as e:
+    await conn.rollback()
+    return Err(f"Failed in begin_checkpointed_ingest: {e}")
 
-    if index_exists_result.ok():
-      return Err(f"Index '{index_name}' already exists in database")
 
-    json_files = _find_json_files(data_dir)
-    if not json_files:
-      return Err(f"No JSON files found in {data_dir}")
+async def finish_checkpointed_ingest(
+  conn: AsyncConnection, index_id: int
+) -> Result[None, str]:
+  """Mark the index ready and drop its checkpoints."""
+  try:
+    for step_result in (
+      await set_index_status(conn, index_id, IndexStatus.READY),
+      await clear_checkpoints(conn, index_id),
+    ):
+      if isinstance(step_result, Err):
+        await conn.rollback()
+        return step_result
+    await conn.commit()
+    return Ok(None)
+  except Exception as e:
+    await conn.rollback()
+    return Err(f"Failed in finish_checkpointed_ingest: {e}")
 
-    # Process all files and collect chunks
-    all_chunks: List[ChunkData] = []
-    files_processed = 0
 
-    for json_file in json_files:
-      process_result: Result[List[ChunkData], str] = _process_json_file(json_file)
-      if isinstance(process_result, Err):
-        # logger.warning(f"Skipping file {json_file}: {process_result.err()}")
+async def _insert_with_checkpoints(
+  conn: AsyncConnection,
+  index_id: int,
+  chunks: List[ChunkData],
+  embedding_provider: EmbeddingProvider,
+  bulk_load: bool,
+  progress: IngestProgress | None = None,
+) -> Result[InsertStats, str]:
+  """
+  insert_chunks in commits of about config.INGEST_CHECKPOINT_CHUNKS chunks. Pages are
+  never split between commits and every commit records its pages in
+  ingest_checkpoints, so a failure only loses the current batch. Pages with a chunk
+  that failed are not recorded, a resume retries them.
+  """
+  chunks_by_url: Dict[str, List[ChunkData]] = {}
+  for chunk in chunks:
+    chunks_by_url.setdefault(chunk.url, []).append(chunk)
+
+  stats = InsertStats()
+
+  async def store_batch(batch: List[ChunkData], urls: List[str]) -> Result[None, str]:
+    insert_result: Result[InsertStats, str] = await insert_chunks(
+      conn,
+      batch,
+      embedding_provider,
+      index_id,
+      bulk_load,
+      commit=False,
+      progress=progress,
+    )
+    if isinstance(insert_result, Err):
+      return insert_result
+    batch_stats = insert_result.ok()
+    checkpoint_result: Result[None, str] = await store_checkpoints(
+      conn,
+      index_id,
+      [
+        (url, len(chunks_by_url[url]))
+        for url in urls
+        if url not in batch_stats.failed_urls
+      ],
+    )
+    if isinstance(checkpoint_result, Err):
+      return checkpoint_result
+    await conn.commit()
+
+    stats.chunks_inserted += batch_stats.chunks_inserted
+    stats.chunks_failed += batch_stats.chunks_failed
+    stats.embedding_cache_hits += batch_stats.embedding_cache_hits
+    stats.embeddings_requested += batch_stats.embeddings_requested
+    stats.failed_urls |= batch_stats.failed_urls
+    return Ok(None)
+
+  batch: List[ChunkData] = []
+  batch_urls: List[str] = []
+  try:
+    for url, url_chunks in chunks_by_url.items():
+      batch.extend(url_chunks)
+      batch_urls.append(url)
+      if len(batch) < config.INGEST_CHECKPOINT_CHUNKS:
         continue
+      store_result = await store_batch(batch, batch_urls)
+      if isinstance(store_result, Err):
+        await conn.rollback()
+        return store_result
+      batch, batch_urls = [], []
+
+    if batch:
+      store_result = await store_batch(batch, batch_urls)
+      if isinstance(store_result, Err):
+        await conn.rollback()
+        return store_result
 
-      all_chunks.extend(process_result.ok())
-      files_processed += 1
+    return Ok(stats)
+  except Exception as e:
+    await conn.rollback()
+    return Err(f"Failed in _insert_with_checkpoints: {e}")
 
-      if debug_mode and len(all_chunks) >= max_debug_chunks:
-        break
 
-    if not all_chunks:
-      return Err("No chunks generated from the processed files")
+async def store_data(
+  conn: AsyncConnection,
+  index_name: str,
+  debug_mode: bool = False,
+  max_debug_chunks: int = 20,
+  bulk_load: bool = True,
+  incremental: bool = False,
+  preprocess_workers: int | None = None,
+  progress: IngestProgress | None = None,
+  resume: bool = False,
+  source: str = "local",
+  prune: bool = False,
+) -> Result[StorageStatistics, str]:
+  """
+  Chunk, embed and store scraped data of an index, read from data/<index_name>
+  (`source="local"`) or streamed from the bucket's <index_name>/ prefix
+  (`source="s3"`, see _collect_s3_chunks).
+  Chunks are committed in checkpointed batches. If that is interrupted the index is
+  left in the 'ingesting' status and `resume=True` continues where it stopped.
+  With `incremental=True` an existing index is updated in place (see
+  _update_index_incrementally) instead of failing, `prune=True` then also removes
+  the pages missing from the scrape.
+  `preprocess_workers` (default config.INGEST_PREPROCESS_WORKERS) > 1 parses and
+  tokenizes files in parallel.
+  `progress`, if given, is updated while chunks are embedded and inserted.
+  """
+  if source not in ("local", "s3"):
+    return Err(f"Unknown data source: {source}")
 
-    # Retrieve source_url from summary.json
-    source_url = ""
-    scraper_summary = None
-    summary_file_path = data_dir / "summary.json"
-    if not summary_file_path.exists():
-      ...
-      # TODO: todo
-      # logger.info(
-      #   f"Summary.json file does not exist for index {index_name} ({summary_file_path})"
-      # )
+  # Fail if index_name folder doesn't exist
+  data_dir = Path("data") / index_name
+  if source == "local" and not data_dir.exists():
+    return Err(f"Data directory not found: {data_dir}")
 
-    try:
-      with open(summary_file_path) as f:
-        scraper_summary = json.load(f)
-    except Exception as _:
-      ...
-      # TODO: todo
-      # logger.error(f"Failed to access summary file {summary_file_path}: {e}")
+  try:
+    # Fail if index already exists in database, unless updating incrementally
+    index_id_result: Result[int | None, str] = await get_index_id_by_name(
+      conn, index_name
+    )
+    if isinstance(index_id_result, Err):
+      return index_id_result
+
+    existing_index_id: int | None = index_id_result.ok()
+    resuming = False
+    if existing_index_id is not None:
+      index_status_result: Result[IndexStatus, str] = await get_index_status(
+        conn, existing_index_id
+      )
+      if isinstance(index_status_result, Err):
+        return index_status_result
+      if index_status_result.ok() is IndexStatus.INGESTING:
+        if not resume:
+          return Err(
+            f"Index '{index_name}' has an interrupted ingest, resume it to continue"
+          )
+        existing_index_id = None  # resumed below, like a new index
+        resuming = True
+      elif not incremental:
+        return Err(f"Index '{index_name}' already exists in database")
+
+    if source == "s3":
+      s3_result: Result[
+        Tuple[List[ChunkData], int, Dict | None], str
+      ] = await _collect_s3_chunks(index_name, debug_mode, max_debug_chunks)
+      if isinstance(s3_result, Err):
+        return s3_result
+      all_chunks, files_processed, scraper_summary = s3_result.ok()
+      if not all_chunks:
+        return Err("No chunks generated from the processed files")
+    else:
+      # Sharded scrapes have a manifest, older ones one JSON file per page
+      manifest = read_manifest(data_dir)
+      if manifest:
+        json_files = [data_dir / shard["file"] for shard in manifest["shards"]]
+        process = partial(_process_shard_file, compression=manifest["compression"])
+      else:
+        json_files = _find_json_files(data_dir)
+        process = None
+      if not json_files:
+        return Err(f"No JSON files found in {data_dir}")
+
+      # Process all files and collect chunks
+      all_chunks, files_processed = await _collect_chunks(
+        json_files,
+        debug_mode,
+        max_debug_chunks,
+        preprocess_workers or config.INGEST_PREPROCESS_WORKERS,
+        process=process,
+      )
+
+      if not all_chunks:
+        return Err("No chunks generated from the processed files")
+
+      # Retrieve source_url from summary.json
+      source_url = ""
+      scraper_summary = None
+      summary_file_path = data_dir / "summary.json"
+      if not summary_file_path.exists():
+        ...
+        # TODO: todo
+        # logger.info(
+        #   f"Summary.json file does not exist for index {index_name} ({summary_file_path})"
+        # )
+
+      try:
+        with open(summary_file_path) as f:
+          scraper_summary = json.load(f)
+      except Exception as _:
+        ...
+        # TODO: todo
+        # logger.error(f"Failed to access summary file {summary_file_path}: {e}")
 
     source_url: str = scraper_summary.get("base_url", "") if scraper_summary else ""
 
@@ -244,33 +710,82 @@ async def store_data(
       )
       return Ok(stats)
 
-    openai_client_result: Result = get_openai_client()
-    if isinstance(openai_client_result, Err):
-      return openai_client_result
-    openai_client: OpenAI = openai_client_result.ok()
+    embedding_provider_result: Result = get_embedding_provider()
+    if isinstance(embedding_provider_result, Err):
+      return embedding_provider_result
+    embedding_provider: EmbeddingProvider = embedding_provider_result.ok()
+
+    if existing_index_id is not None:
+      update_result: Result[
+        Tuple[InsertStats, int, int, int], str
+      ] = await _update_index_incrementally(
+        conn,
+        existing_index_id,
+        all_chunks,
+        embedding_provider,
+        bulk_load,
+        progress,
+        prune,
+      )
+      if isinstance(update_result, Err):
+        return update_result
 
-    create_index_result: Result[int, str] = await create_index(
-      conn, index_name, source_url
-    )
-    if isinstance(create_index_result, Err):
-      return create_index_result
+      insert_stats, chunks_removed, chunks_unchanged, chunks_not_refetched = (
+        update_result.ok()
+      )
+      return Ok(
+        StorageStatistics(
+          chunks_inserted=insert_stats.chunks_inserted,
+          chunks_failed=insert_stats.chunks_failed,
+          average_chunk_length_chars=average_chunk_length_chars,
+          mode_chunk_length_chars=mode_chunk_length_chars,
+          average_chunk_length_tokens=average_chunk_length_tokens,
+          mode_chunk_length_tokens=mode_chunk_length_tokens,
+          total_files_processed=files_processed,
+          index_name=index_name,
+          source_url=source_url,
+          embedding_cache_hits=insert_stats.embedding_cache_hits,
+          embedding_cache_hit_rate=insert_stats.embedding_cache_hit_rate,
+          embeddings_requested=insert_stats.embeddings_requested,
+          incremental=True,
+          chunks_added=insert_stats.chunks_inserted,
+          chunks_removed=chunks_removed,
+          chunks_unchanged=chunks_unchanged,
+          chunks_not_refetched=chunks_not_refetched,
+        )
+      )
+
+    begin_result: Result[
+      Tuple[int, Dict[str, int]], str
+    ] = await begin_checkpointed_ingest(conn, index_name, source_url, resume)
+    if isinstance(begin_result, Err):
+      return begin_result
 
-    index_id: int = create_index_result.ok()
+    index_id, stored_urls = begin_result.ok()
+    chunks_to_insert = [chunk for chunk in all_chunks if chunk.url not in stored_urls]
+    chunks_already_stored = len(all_chunks) - len(chunks_to_insert)
 
-    insert_chunks_res: Result[Tuple[int, int], str] = await insert_chunks(
-      conn, all_chunks, openai_client, index_id
+    if progress:
+      progress.chunks_total = len(chunks_to_insert)
+
+    insert_chunks_res: Result[InsertStats, str] = await _insert_with_checkpoints(
+      conn, index_id, chunks_to_insert, embedding_provider, bulk_load, progress
     )
     if isinstance(insert_chunks_res, Err):
       return insert_chunks_res
 
-    chunks_inserted, chunks_failed = insert_chunks_res.ok()
+    insert_stats: InsertStats = insert_chunks_res.ok()
 
-    if not chunks_inserted:
+    if not insert_stats.chunks_inserted and not chunks_already_stored:
       return Err("No chunks were successfully inserted")
 
+    finish_result: Result[None, str] = await finish_checkpointed_ingest(conn, index_id)
+    if isinstance(finish_result, Err):
+      return finish_result
+
     stats = StorageStatistics(
-      chunks_inserted=chunks_inserted,
-      chunks_failed=chunks_failed,
+      chunks_inserted=insert_stats.chunks_inserted,
+      chunks_failed=insert_stats.chunks_failed,
       average_chunk_length_chars=average_chunk_length_chars,
       mode_chunk_length_chars=mode_chunk_length_chars,
       average_chunk_length_tokens=average_chunk_length_tokens,
@@ -278,6 +793,12 @@ async def store_data(
       total_files_processed=files_processed,
       index_name=index_name,
       source_url=source_url,
+      embedding_cache_hits=insert_stats.embedding_cache_hits,
+      embedding_cache_hit_rate=insert_stats.embedding_cache_hit_rate,
+      embeddings_requested=insert_stats.embeddings_requested,
+      chunks_added=insert_stats.chunks_inserted,
+      resumed=resuming,
+      chunks_already_stored=chunks_already_stored,
     )
 
     return Ok(stats)
@@ -0,0 +1,427 @@
+from __future__ import annotations
+import asyncio
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, TYPE_CHECKING, Tuple
+
+import psycopg
+from pydantic import BaseModel, HttpUrl
+from result import Err, Ok, Result
+
+from ..core.config import config
+from ..models.models import ChunkData, IngestProgress
+from ..rag.embedder import embed_chunks, embed_chunks_cached
+from ..rag.providers import get_embedding_provider
+from ..repositories.chunk_repository import bulk_insert_chunks
+from ..repositories.ingest_checkpoint_repository import store_checkpoints
+from .database_service import get_db_connection_string
+from .documentation_scraper import DocumentationScraper, ScrapedPage, ScraperConfig
+from .store_data import (
+  StorageStatistics,
+  begin_checkpointed_ingest,
+  chunk_page_data,
+  finish_checkpointed_ingest,
+)
+
+if TYPE_CHECKING:
+  from psycopg import AsyncConnection
+
+  from ..rag.providers import EmbeddingProvider
+
+
+class StreamIngestConfig(BaseModel):
+  page_queue_size: int = 16  # scraped pages waiting to be chunked
+  chunk_queue_size: int = 2048  # chunks waiting to be batched
+  batch_queue_size: int = 4  # full batches waiting for an embed worker
+  embedded_queue_size: int = 4  # embedded batches waiting to be inserted
+  embed_workers: int = 4
+  # Send a partial batch if no new chunk arrived for this long
+  batch_linger_seconds: float = 0.5
+
+
+@dataclass
+class _StreamStats:
+  pages: int = 0
+  chunks: int = 0
+  chunks_inserted: int = 0
+  chunks_failed: int = 0
+  embedding_cache_hits: int = 0
+  embeddings_requested: int = 0
+  chunks_already_stored: int = 0
+  char_lengths: Counter = field(default_factory=Counter)
+  token_lengths: Counter = field(default_factory=Counter)
+
+  def add_chunk(self, chunk: ChunkData) -> None:
+    self.chunks += 1
+    self.char_lengths[chunk.char_length] += 1
+    self.token_lengths[chunk.tokens] += 1
+
+
+@dataclass
+class _PageCheckpoints:
+  """
+  Pages stored by an earlier, interrupted ingest, chunks of each page still waiting
+  to be inserted, and pages completely inserted since the last commit. A page with
+  a chunk that was not inserted is never completed, a resume retries it.
+  """
+
+  stored: Dict[str, int] = field(default_factory=dict)
+  remaining: Dict[str, int] = field(default_factory=dict)
+  completed: List[Tuple[str, int]] = field(default_factory=list)
+  chunk_counts: Dict[str, int] = field(default_factory=dict)
+  failed: Set[str] = field(default_factory=set)
+
+  def add_page(self, url: str, n_chunks: int) -> None:
+    self.chunk_counts[url] = n_chunks
+    if n_chunks:
+      self.remaining[url] = n_chunks
+    else:
+      self.completed.append((url, 0))
+
+  def chunk_done(self, url: str, inserted: bool) -> None:
+    if not inserted:
+      self.failed.add(url)
+    self.remaining[url] -= 1
+    if not self.remaining[url]:
+      del self.remaining[url]
+      if url not in self.failed:
+        self.completed.append((url, self.chunk_counts[url]))
+
+  async def commit(self, conn: AsyncConnection, index_id: int) -> None:
+    """Record completed pages and commit everything inserted so far."""
+    checkpoint_result: Result[None, str] = await store_checkpoints(
+      conn, index_id, self.completed
+    )
+    if isinstance(checkpoint_result, Err):
+      raise RuntimeError(checkpoint_result.err())
+    await conn.commit()
+    self.completed = []
+
+
+def _counter_average(counter: Counter) -> float:
+  total = sum(counter.values())
+  return sum(value * count for value, count in counter.items()) / total if total else 0
+
+
+def _counter_mode(counter: Counter) -> int:
+  return counter.most_common(1)[0][0] if counter else 0
+
+
+_DONE = None  # end-of-stream marker passed through every queue
+
+
+async def _chunk_stage(
+  pages: asyncio.Queue,
+  chunks: asyncio.Queue,
+  stats: _StreamStats,
+  checkpoints: _PageCheckpoints,
+  progress: IngestProgress | None,
+) -> None:
+  while (page := await pages.get()) is not _DONE:
+    if page.url in checkpoints.stored:
+      # Already stored by the ingest being resumed
+      stats.pages += 1
+      stats.chunks_already_stored += checkpoints.stored[page.url]
+      continue
+    if page.url in checkpoints.chunk_counts:
+      # Same url twice, its chunks are already on their way
+      continue
+    # Tokenization is CPU bound, keep it off the event loop
+    page_chunks: List[ChunkData] = await asyncio.to_thread(
+      chunk_page_data, page.model_dump(), page.url
+    )
+    stats.pages += 1
+    checkpoints.add_page(page.url, len(page_chunks))
+    if progress:
+      progress.chunks_total += len(page_chunks)
+    for chunk in page_chunks:
+      stats.add_chunk(chunk)
+      await chunks.put(chunk)
+  await chunks.put(_DONE)
+
+
+async def _batch_stage(
+  chunks: asyncio.Queue, batches: asyncio.Queue, linger_seconds: float, n_workers: int
+) -> None:
+  batch: List[ChunkData] = []
+  batch_tokens = 0
+
+  while True:
+    try:
+      chunk = await asyncio.wait_for(chunks.get(), timeout=linger_seconds)
+    except asyncio.TimeoutError:
+      if batch:
+        await batches.put(batch)
+        batch, batch_tokens = [], 0
+      continue
+
+    if chunk is _DONE:
+      break
+
+    if batch and (
+      batch_tokens + chunk.tokens > config.EMBEDDING_BATCH_MAX_TOKENS
+      or len(batch) >= config.EMBEDDING_BATCH_MAX_ITEMS
+    ):
+      await batches.put(batch)
+      batch, batch_tokens = [], 0
+    batch.append(chunk)
+    batch_tokens += chunk.tokens
+
+  if batch:
+    await batches.put(batch)
+  for _ in range(n_workers):
+    await batches.put(_DONE)
+
+
+async def _embed_stage(
+  cache_conn: AsyncConnection | None,
+  embedding_provider: EmbeddingProvider,
+  batches: asyncio.Queue,
+  embedded: asyncio.Queue,
+  stats: _StreamStats,
+  progress: IngestProgress | None,
+) -> None:
+  while (batch := await batches.get()) is not _DONE:
+    if cache_conn is not None:
+      cached_embed_result = await embed_chunks_cached(
+        cache_conn, embedding_provider, batch, progress
+      )
+      if isinstance(cached_embed_result, Err):
+        raise RuntimeError(cached_embed_result.err())
+      results, cache_hits, requested = cached_embed_result.ok()
+      stats.embedding_cache_hits += cache_hits
+      stats.embeddings_requested += requested
+    else:
+      results = await embed_chunks(embedding_provider, batch, progress=progress)
+      stats.embeddings_requested += len(batch)
+    await embedded.put((batch, results))
+  await embedded.put(_DONE)
+
+
+async def _insert_stage(
+  conn: AsyncConnection,
+  embedded: asyncio.Queue,
+  index_id: int,
+  n_workers: int,
+  stats: _StreamStats,
+  checkpoints: _PageCheckpoints,
+  progress: IngestProgress | None,
+) -> None:
+  workers_done = 0
+  chunks_since_commit = 0
+  while workers_done < n_workers:
+    item = await embedded.get()
+    if item is _DONE:
+      workers_done += 1
+      continue
+
+    batch, results = item
+    rows: List[Tuple[str, List[float], str, int, str, bytes]] = []
+    for chunk, embedding_result in zip(batch, results):
+      if isinstance(embedding_result, Err):
+        stats.chunks_failed += 1
+        continue
+      rows.append(
+        (
+          chunk.content,
+          embedding_result.ok(),
+          chunk.url,
+          index_id,
+          chunk.section,
+          chunk.content_hash,
+        )
+      )
+
+    bulk_insert_result: Result[int, str] = await bulk_insert_chunks(conn, rows)
+    if isinstance(bulk_insert_result, Err):
+      raise RuntimeError(bulk_insert_result.err())
+    stats.chunks_inserted += bulk_insert_result.ok()
+    if progress:
+      progress.chunks_inserted += bulk_insert_result.ok()
+
+    for chunk, embedding_result in zip(batch, results):
+      checkpoints.chunk_done(chunk.url, isinstance(embedding_result, Ok))
+    chunks_since_commit += len(batch)
+    if chunks_since_commit >= config.INGEST_CHECKPOINT_CHUNKS:
+      await checkpoints.commit(conn, index_id)
+      chunks_since_commit = 0
+
+
+async def stream_ingest(
+  conn: AsyncConnection,
+  base_url: str | HttpUrl,
+  index_name: str,
+  scraper_config: ScraperConfig | None = None,
+  stream_config: StreamIngestConfig | None = None,
+  progress: IngestProgress | None = None,
+  resume: bool = False,
+  cache_conn: AsyncConnection | None = None,
+) -> Result[Tuple[dict, StorageStatistics], str]:
+  """
+  Scrape, chunk, embed and insert concurrently. Stages are connected by bounded
+  queues, so memory is bounded by the queue sizes and a slow stage slows the ones
+  before it down instead of piling up data. Pages are not written to disk.
+  Inserted chunks are committed every config.INGEST_CHECKPOINT_CHUNKS chunks along
+  with checkpoints of the completed pages. `resume=True` continues an interrupted
+  ingest of the index, pages stored before are scraped but not embedded again.
+  `conn` is used by the insert stage only: a psycopg connection runs one command
+  at a time, the embedding cache lookups of the embed stage go through
+  `cache_conn` (an autocommit connection opened here if not given) so they do not
+  wait for the inserts.
+  Returns (scraping summary, storage statistics).
+  """
+  own_cache_conn = cache_conn is None and config.EMBEDDING_CACHE_ENABLED
+  if own_cache_conn:
+    try:
+      cache_conn = await psycopg.AsyncConnection.connect(
+        get_db_connection_string(), autocommit=True
+      )
+    except Exception as e:
+      return Err(f"Failed to connect to database for the embedding cache: {e}")
+  if not config.EMBEDDING_CACHE_ENABLED:
+    cache_conn = None
+
+  try:
+    return await _stream_ingest(
+      conn,
+      cache_conn,
+      base_url,
+      index_name,
+      scraper_config,
+      stream_config,
+      progress,
+      resume,
+    )
+  finally:
+    if own_cache_conn:
+      await cache_conn.close()
+
+
+async def _stream_ingest(
+  conn: AsyncConnection,
+  cache_conn: AsyncConnection | None,
+  base_url: str | HttpUrl,
+  index_name: str,
+  scraper_config: ScraperConfig | None,
+  stream_config: StreamIngestConfig | None,
+  progress: IngestProgress | None,
+  resume: bool,
+) -> Result[Tuple[dict, StorageStatistics], str]:
+  stream_config = stream_config or StreamIngestConfig()
+  scraper_config = (scraper_config or ScraperConfig()).model_copy(
+    update={"retain_pages": False}
+  )
+
+  embedding_provider_result: Result = get_embedding_provider()
+  if isinstance(embedding_provider_result, Err):
+    return embedding_provider_result
+  embedding_provider: EmbeddingProvider = embedding_provider_result.ok()
+
+  begin_result: Result[
+    Tuple[int, Dict[str, int]], str
+  ] = await begin_checkpointed_ingest(conn, index_name, str(base_url), resume)
+  if isinstance(begin_result, Err):
+    return begin_result
+  index_id, stored_pages = begin_result.ok()
+  checkpoints = _PageCheckpoints(stored=stored_pages)
+
+  pages: asyncio.Queue[ScrapedPage | None] = asyncio.Queue(
+    stream_config.page_queue_size
+  )
+  chunks: asyncio.Queue[ChunkData | None] = asyncio.Queue(
+    stream_config.chunk_queue_size
+  )
+  batches: asyncio.Queue = asyncio.Queue(stream_config.batch_queue_size)
+  embedded: asyncio.Queue = asyncio.Queue(stream_config.embedded_queue_size)
+  stats = _StreamStats()
+  scraper = DocumentationScraper(scraper_config)
+
+  async def scrape_stage() -> Result[dict, str]:
+    try:
+      return await scraper.scrape_website(
+        base_url,
+        index_name,
+        on_page=pages.put,
+        save_to_disk=False,
+        progress=progress,
+      )
+    finally:
+      await pages.put(_DONE)
+
+  try:
+    async with asyncio.TaskGroup() as task_group:
+      scrape_task = task_group.create_task(scrape_stage())
+      task_group.create_task(_chunk_stage(pages, chunks, stats, checkpoints, progress))
+      task_group.create_task(
+        _batch_stage(
+          chunks,
+          batches,
+          stream_config.batch_linger_seconds,
+          stream_config.embed_workers,
+        )
+      )
+      for _ in range(stream_config.embed_workers):
+        task_group.create_task(
+          _embed_stage(
+            cache_conn, embedding_provider, batches, embedded, stats, progress
+          )
+        )
+      task_group.create_task(
+        _insert_stage(
+          conn,
+          embedded,
+          index_id,
+          stream_config.embed_workers,
+          stats,
+          checkpoints,
+          progress,
+        )
+      )
+  except BaseExceptionGroup as e:
+    await conn.rollback()
+    return Err(
+      f"Streaming ingest failed (resume the ingest to continue): {[str(exc) for exc in e.exceptions]}"
+    )
+
+  try:
+    await checkpoints.commit(conn, index_id)
+  except Exception as e:
+    await conn.rollback()
+    return Err(f"Streaming ingest failed (resume the ingest to continue): {e}")
+
+  scrape_result: Result[dict, str] = scrape_task.result()
+  if isinstance(scrape_result, Err):
+    return scrape_result
+
+  if not stats.chunks_inserted and not stats.chunks_already_stored:
+    return Err("No chunks were successfully inserted")
+
+  finish_result: Result[None, str] = await finish_checkpointed_ingest(conn, index_id)
+  if isinstance(finish_result, Err):
+    return finish_result
+
+  embedded_total = stats.embedding_cache_hits + stats.embeddings_requested
+  return Ok(
+    (
+      scrape_result.ok(),
+      StorageStatistics(
+        chunks_inserted=stats.chunks_inserted,
+        chunks_failed=stats.chunks_failed,
+        average_chunk_length_chars=_counter_average(stats.char_lengths),
+        mode_chunk_length_chars=_counter_mode(stats.char_lengths),
+        average_chunk_length_tokens=_counter_average(stats.token_lengths),
+        mode_chunk_length_tokens=_counter_mode(stats.token_lengths),
+        total_files_processed=stats.pages,
+        index_name=index_name,
+        source_url=str(base_url),
+        embedding_cache_hits=stats.embedding_cache_hits,
+        embedding_cache_hit_rate=(
+          stats.embedding_cache_hits / embedded_total if embedded_total else 0.0
+        ),
+        embeddings_requested=stats.embeddings_requested,
+        chunks_added=stats.chunks_inserted,
+        resumed=resume and bool(stored_pages),
+        chunks_already_stored=stats.chunks_already_stored,
+      ),
+    )
+  )
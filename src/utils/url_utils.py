@@ -0,0 +1,76 @@
+import hashlib
+import re
+from typing import Iterable, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_INDEX_FILE_RE = re.compile(r"/(index|default)\.(html?|php|aspx?)$", re.IGNORECASE)
+_TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "mc_cid", "mc_eid", "_ga"}
+
+
+def _is_tracking_param(name: str) -> bool:
+  name = name.lower()
+  return name.startswith("utm_") or name in _TRACKING_PARAMS
+
+
+def clean_url(url: str) -> str:
+  """Drop the fragment and tracking query params, keep everything else as is."""
+  parts = urlsplit(url)
+  query = parts.query
+  params = parse_qsl(query, keep_blank_values=True)
+  if any(_is_tracking_param(name) for name, _ in params):
+    query = urlencode([(name, v) for name, v in params if not _is_tracking_param(name)])
+  return urlunsplit(parts._replace(query=query, fragment=""))
+
+
+def canonicalize_url(url: str) -> str:
+  """
+  Canonical form used to tell whether two urls are the same page: lowercase scheme
+  and host, no default port, no fragment or tracking params, sorted query, no
+  index file and no trailing slash (except for the root).
+  """
+  parts = urlsplit(clean_url(url))
+  scheme = parts.scheme.lower()
+  host = (parts.hostname or "").lower()
+  if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+    host = f"{host}:{parts.port}"
+
+  path = _INDEX_FILE_RE.sub("/", parts.path) or "/"
+  if len(path) > 1:
+    path = path.rstrip("/") or "/"
+
+  query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+  return urlunsplit((scheme, host, path, query, ""))
+
+
+def compile_patterns(patterns: Iterable[str]) -> re.Pattern | None:
+  """Combine regexes into one case-insensitive alternation (None if there are none)."""
+  patterns = list(patterns)
+  if not patterns:
+    return None
+  return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE)
+
+
+class VisitedUrls:
+  """
+  Set of canonical urls stored as 64 bit blake2b digests instead of strings, a few
+  times smaller per url on large crawls. A collision (about 1 in 10^8 at a million
+  urls) only means a page is skipped.
+  """
+
+  def __init__(self):
+    self._digests: Set[int] = set()
+
+  @staticmethod
+  def _digest(url: str) -> int:
+    digest = hashlib.blake2b(canonicalize_url(url).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+  def add(self, url: str) -> None:
+    self._digests.add(self._digest(url))
+
+  def __contains__(self, url: str) -> bool:
+    return self._digest(url) in self._digests
+
+  def __len__(self) -> int:
+    return len(self._digests)
@@ -1,19 +1,27 @@
 from functools import lru_cache, wraps
+import hashlib
+from itertools import islice
 from time import perf_counter
-from typing import Any, Callable
+from typing import Any, Callable, Iterable, Iterator, List, TypeVar
 
 import tiktoken
 
 from ..core.constants import rag
 
+T = TypeVar("T")
+
 
 @lru_cache(maxsize=1)
-def _get_embed_model_encoding():
+def get_embed_model_encoding():
   return tiktoken.encoding_for_model(rag.EMBEDDING_MODEL)
 
 
 def get_embed_token_count(text: str) -> int:
-  return len(_get_embed_model_encoding().encode(text))
+  return len(get_embed_model_encoding().encode(text))
+
+
+def get_content_hash(text: str) -> bytes:
+  return hashlib.sha256(text.encode("utf-8")).digest()
 
 
 def get_time(func: Callable) -> Callable:
@@ -39,3 +47,10 @@ def get_time_async(func: Callable) -> Callable:
     return result
 
   return wrapper
+
+
+def batched(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+  """itertools.batched replacement (python 3.11)."""
+  iterator = iter(iterable)
+  while batch := list(islice(iterator, size)):
+    yield batch
@@ -0,0 +1,47 @@
+from src.main import app
+from src.models.models import IngestProgress
+from src.services.ingest_jobs import IngestJob, IngestJobStatus, get_ingest_job_manager
+
+
+class FakeJobManager:
+  def __init__(self):
+    job = IngestJob("fastapi")
+    job.status = IngestJobStatus.COMPLETED
+    job.progress = IngestProgress(pages_total=10, pages_scraped=7, chunks_total=20)
+    job.progress.chunks_embedded = job.progress.chunks_inserted = 20
+    job.result = {"status": "complete"}
+    self.job = job
+
+  def get(self, job_id):
+    return self.job if job_id == self.job.id else None
+
+  async def events(self, job_id, interval_seconds=None):
+    yield self.job.to_schema()
+
+
+def test_get_ingest_job_endpoint(get_client):
+  manager = FakeJobManager()
+  app.dependency_overrides[get_ingest_job_manager] = lambda: manager
+
+  response = get_client.get(f"/api/v1/ingest/jobs/{manager.job.id}")
+
+  assert response.status_code == 200
+  data = response.json()
+  assert data["status"] == "completed"
+  assert data["progress"]["pagesScraped"] == 7
+  assert data["progress"]["chunksInserted"] == 20
+  assert data["result"] == {"status": "complete"}
+
+  assert get_client.get("/api/v1/ingest/jobs/missing").status_code == 404
+
+
+def test_ingest_job_events_endpoint(get_client):
+  manager = FakeJobManager()
+  app.dependency_overrides[get_ingest_job_manager] = lambda: manager
+
+  response = get_client.get(f"/api/v1/ingest/jobs/{manager.job.id}/events")
+
+  assert response.status_code == 200
+  assert response.headers["content-type"].startswith("text/event-stream")
+  assert '"status":"completed"' in response.text
+  assert response.text.endswith("event: end\ndata: {}\n\n")
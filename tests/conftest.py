@@ -12,6 +12,21 @@ def get_client():
   return client
 
 
+class CharEncoding:
+  """One token per character, enough to test window placement offline."""
+
+  def encode(self, text, disallowed_special=()):
+    return [ord(c) for c in text]
+
+  def decode_with_offsets(self, tokens):
+    return "".join(chr(t) for t in tokens), list(range(len(tokens)))
+
+
+@pytest.fixture()
+def char_encoding():
+  return CharEncoding()
+
+
 @pytest.fixture(autouse=True)
 def clear_overrides():
   app.dependency_overrides.clear()
@@ -0,0 +1,47 @@
+from src.rag.chunker import split_into_token_windows, truncate_to_tokens
+
+
+def test_short_text_is_a_single_window(char_encoding):
+  windows = split_into_token_windows("hello", 10, encoding=char_encoding)
+
+  assert [(w.text, w.tokens) for w in windows] == [("hello", 5)]
+
+
+def test_windows_prefer_paragraph_boundaries_and_report_token_counts(char_encoding):
+  text = "First para here.\n\nSecond para. More words\n\nThird paragraph."
+  windows = split_into_token_windows(text, 30, encoding=char_encoding)
+
+  assert [w.text for w in windows] == [
+    "First para here.\n\n",
+    "Second para. More words\n\n",
+    "Third paragraph.",
+  ]
+  assert all(w.tokens == len(w.text) <= 30 for w in windows)
+  assert "".join(w.text for w in windows) == text
+
+
+def test_code_fences_are_not_split_on_inner_sentences(char_encoding):
+  text = "Intro text.\n```\nx = 1. y = 2. z = 3.\n```\nAfter the code."
+  windows = split_into_token_windows(text, 40, encoding=char_encoding)
+
+  assert windows[0].text == "Intro text.\n```\nx = 1. y = 2. z = 3.\n```"
+
+
+def test_overlap_repeats_the_end_of_the_previous_window(char_encoding):
+  text = " ".join(f"w{i}." for i in range(40))
+  windows = split_into_token_windows(
+    text, 40, overlap_tokens=10, encoding=char_encoding
+  )
+
+  assert len(windows) > 1
+  for previous, current in zip(windows, windows[1:]):
+    assert current.tokens <= 40
+    # The overlap starts on the first sentence boundary inside the last 10 tokens
+    first_word = current.text.split()[0]
+    assert first_word in previous.text.split()[-2:]
+
+
+def test_truncate_to_tokens_keeps_a_prefix(char_encoding):
+  assert truncate_to_tokens("short", 10, encoding=char_encoding) == "short"
+  assert truncate_to_tokens("a long title", 6, encoding=char_encoding) == "a long"
+  assert truncate_to_tokens("title", 0, encoding=char_encoding) == ""
@@ -0,0 +1,196 @@
+import asyncio
+from types import SimpleNamespace
+
+from result import Err, Ok
+
+from src.models.models import ChunkData
+from src.rag.embedder import embed_chunks, pack_batches
+from src.rag.providers import OpenAIEmbeddingProvider
+
+
+def _api_error(status: int, message: str) -> Exception:
+  import httpx
+  import openai
+
+  request = httpx.Request("POST", "http://localhost/v1/embeddings")
+  response = httpx.Response(status, request=request)
+  if status == 400:
+    return openai.BadRequestError(message, response=response, body=None)
+  return openai.InternalServerError(message, response=response, body=None)
+
+
+class FakeEmbeddings:
+  def __init__(self, failing_text: str | None = None):
+    self.failing_text = failing_text
+    self.calls: list[list[str]] = []
+
+  async def create(self, model, input):
+    self.calls.append(list(input))
+    if self.failing_text in input:
+      raise _api_error(400, "bad input")
+    # Return items in reverse to make sure the index is used for mapping
+    data = [
+      SimpleNamespace(index=i, embedding=[float(len(text))])
+      for i, text in enumerate(input)
+    ]
+    return SimpleNamespace(data=list(reversed(data)))
+
+
+class FakeClient:
+  def __init__(self, embeddings):
+    self.embeddings = embeddings
+
+  def with_options(self, **kwargs):
+    return self
+
+
+def _chunk(content: str, tokens: int) -> ChunkData:
+  return ChunkData(content=content, url="u", char_length=len(content), tokens=tokens)
+
+
+def test_pack_batches_respects_token_and_item_limits():
+  chunks = [_chunk("a", 40), _chunk("b", 40), _chunk("c", 40), _chunk("d", 10)]
+
+  assert pack_batches(chunks, max_batch_tokens=100, max_batch_items=10) == [
+    [0, 1],
+    [2, 3],
+  ]
+  assert pack_batches(chunks, max_batch_tokens=1000, max_batch_items=3) == [
+    [0, 1, 2],
+    [3],
+  ]
+
+
+def test_embed_chunks_maps_results_and_splits_failed_batches():
+  chunks = [_chunk("a" * n, 1) for n in range(1, 6)]
+  embeddings = FakeEmbeddings(failing_text="aaa")
+  provider = OpenAIEmbeddingProvider(FakeClient(embeddings))
+
+  results = asyncio.run(embed_chunks(provider, chunks, max_batch_items=5))
+
+  assert [r.ok() for r in results if isinstance(r, Ok)] == [[1.0], [2.0], [4.0], [5.0]]
+  assert isinstance(results[2], Err)
+  assert embeddings.calls[0] == [chunk.content for chunk in chunks]
+
+
+def test_embed_chunks_does_not_split_batches_on_api_failures(monkeypatch):
+  from src.core.config import config
+
+  monkeypatch.setattr(config, "EMBEDDING_MAX_RETRIES", 0)
+
+  class Unavailable(FakeEmbeddings):
+    async def create(self, model, input):
+      self.calls.append(list(input))
+      raise _api_error(503, "unavailable")
+
+  embeddings = Unavailable()
+  chunks = [_chunk("a" * n, 1) for n in range(1, 6)]
+  provider = OpenAIEmbeddingProvider(FakeClient(embeddings))
+
+  results = asyncio.run(embed_chunks(provider, chunks, max_batch_items=5))
+
+  assert all(isinstance(r, Err) for r in results)
+  assert len(embeddings.calls) == 1
+
+
+def test_embed_chunks_cached_skips_cached_and_duplicate_texts(monkeypatch):
+  from src.rag import embedder
+  from src.utils.utils import get_content_hash
+
+  stored: list = []
+
+  async def fake_get_cached_embeddings(conn, model, content_hashes):
+    return Ok({get_content_hash("cached"): [9.0]})
+
+  async def fake_store_cached_embeddings(conn, model, items):
+    stored.extend(items)
+    return Ok(None)
+
+  monkeypatch.setattr(embedder, "get_cached_embeddings", fake_get_cached_embeddings)
+  monkeypatch.setattr(embedder, "store_cached_embeddings", fake_store_cached_embeddings)
+
+  chunks = [
+    _chunk("cached", 1),
+    _chunk("boiler", 1),
+    _chunk("x", 1),
+    _chunk("boiler", 1),
+  ]
+  embeddings = FakeEmbeddings()
+  provider = OpenAIEmbeddingProvider(FakeClient(embeddings))
+
+  result = asyncio.run(embedder.embed_chunks_cached(None, provider, chunks))
+
+  results, cache_hits, requested = result.ok()
+  assert [r.ok() for r in results] == [[9.0], [6.0], [1.0], [6.0]]
+  assert (cache_hits, requested) == (2, 2)
+  assert embeddings.calls == [["boiler", "x"]]
+  assert [content_hash for content_hash, _ in stored] == [
+    get_content_hash("boiler"),
+    get_content_hash("x"),
+  ]
+
+
+def test_embed_chunks_retries_rate_limited_requests(monkeypatch):
+  import httpx
+  import openai
+
+  from src.rag import providers
+  from src.rag.rate_limiter import EmbeddingRateLimiter
+
+  limiter = EmbeddingRateLimiter(requests_per_minute=1000, tokens_per_minute=10**6)
+  monkeypatch.setattr(providers, "get_embedding_rate_limiter", lambda: limiter)
+
+  class RateLimitedOnce(FakeEmbeddings):
+    async def create(self, model, input):
+      if not self.calls:
+        self.calls.append(list(input))
+        response = httpx.Response(
+          429,
+          headers={"retry-after": "0"},
+          request=httpx.Request("POST", "http://localhost"),
+        )
+        raise openai.RateLimitError("rate limited", response=response, body=None)
+      return await super().create(model, input)
+
+  embeddings = RateLimitedOnce()
+  results = asyncio.run(
+    embed_chunks(OpenAIEmbeddingProvider(FakeClient(embeddings)), [_chunk("ab", 1)])
+  )
+
+  assert [r.ok() for r in results] == [[2.0]]
+  assert len(embeddings.calls) == 2
+  assert limiter.retries_total == 1
+  assert limiter.rate_limited_total == 1
+
+
+def test_query_embeddings_fail_fast_when_rate_limited(monkeypatch):
+  import httpx
+  import openai
+
+  from src.core.config import config
+  from src.rag import embedder, providers
+  from src.rag.rate_limiter import EmbeddingRateLimiter
+
+  monkeypatch.setattr(embedder, "get_embed_token_count", lambda text: 1)
+  limiter = EmbeddingRateLimiter(requests_per_minute=1000, tokens_per_minute=10**6)
+  monkeypatch.setattr(providers, "get_embedding_rate_limiter", lambda: limiter)
+  monkeypatch.setattr(config, "EMBEDDING_BACKOFF_BASE_SECONDS", 0.01)
+
+  class AlwaysRateLimited(FakeEmbeddings):
+    async def create(self, model, input):
+      self.calls.append(list(input))
+      response = httpx.Response(
+        429,
+        headers={"retry-after": "60"},
+        request=httpx.Request("POST", "http://localhost"),
+      )
+      raise openai.RateLimitError("rate limited", response=response, body=None)
+
+  embeddings = AlwaysRateLimited()
+  provider = OpenAIEmbeddingProvider(FakeClient(embeddings))
+
+  # retry-after is not honored beyond the backoff, the query gives up quickly
+  result = asyncio.run(asyncio.wait_for(embedder.embed_data(provider, "query"), 5))
+
+  assert isinstance(result, Err)
+  assert len(embeddings.calls) == config.EMBEDDING_QUERY_MAX_RETRIES + 1
@@ -0,0 +1,57 @@
+import asyncio
+import math
+
+from src.core.constants import rag
+from src.rag.providers import LocalEmbeddingProvider, LocalGenerationProvider
+
+
+def _cosine(a: list[float], b: list[float]) -> float:
+  return sum(x * y for x, y in zip(a, b))
+
+
+def test_local_embeddings_are_deterministic_and_normalized():
+  provider = LocalEmbeddingProvider()
+  texts = ["Install the package with pip", "Configure the database connection"]
+
+  first = asyncio.run(provider.embed(texts, tokens=10))
+  second = asyncio.run(LocalEmbeddingProvider().embed(texts, tokens=10))
+
+  assert first == second
+  assert all(len(vector) == rag.EMBEDDING_DIMENSIONS for vector in first)
+  assert all(math.isclose(_cosine(v, v), 1.0) for v in first)
+  assert provider.embed_text("") == [0.0] * rag.EMBEDDING_DIMENSIONS
+
+
+def test_local_embeddings_rank_similar_texts_closer():
+  provider = LocalEmbeddingProvider()
+  query = provider.embed_text("how to install the package")
+  related = provider.embed_text("Installing the package: run pip install package")
+  unrelated = provider.embed_text("Tensor shapes are broadcast along axes")
+
+  assert _cosine(query, related) > _cosine(query, unrelated)
+
+
+def test_local_generator_returns_canned_answer():
+  provider = LocalGenerationProvider(latency_seconds=0.01)
+
+  answer = asyncio.run(provider.generate("instructions", "question"))
+
+  assert "local generation provider" in answer
+
+
+def test_openai_semaphore_works_across_event_loops():
+  from src.core.config import config
+  from src.services.openai_service import get_openai_semaphore
+
+  async def contend():
+    semaphore = get_openai_semaphore()
+
+    async def hold():
+      async with semaphore:
+        await asyncio.sleep(0)
+
+    await asyncio.gather(*(hold() for _ in range(config.OPENAI_MAX_CONCURRENCY + 1)))
+    return semaphore
+
+  # Contended waits bind a semaphore to its loop, each asyncio.run gets its own
+  assert asyncio.run(contend()) is not asyncio.run(contend())
@@ -0,0 +1,85 @@
+import asyncio
+
+import httpx
+import openai
+
+from src.rag.rate_limiter import (
+  EmbeddingRateLimiter,
+  TokenBucket,
+  get_retry_after,
+  is_retryable_error,
+)
+
+
+class FakeClock:
+  def __init__(self):
+    self.now = 0.0
+
+  def __call__(self) -> float:
+    return self.now
+
+
+def _rate_limit_error(headers: dict) -> openai.RateLimitError:
+  request = httpx.Request("POST", "http://localhost/v1/embeddings")
+  response = httpx.Response(429, headers=headers, request=request)
+  return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def test_token_bucket_refills_over_time():
+  clock = FakeClock()
+  bucket = TokenBucket(per_minute=60, clock=clock)
+
+  assert bucket.wait_time(60) == 0
+  bucket.consume(60)
+  assert bucket.wait_time(30) == 30
+
+  clock.now = 30
+  assert bucket.wait_time(30) == 0
+  # Requests bigger than the bucket only wait for a full bucket
+  assert bucket.wait_time(1000) == 30
+
+
+def test_rate_limiter_pause_and_throughput():
+  clock = FakeClock()
+  limiter = EmbeddingRateLimiter(
+    requests_per_minute=10, tokens_per_minute=1000, clock=clock
+  )
+
+  asyncio.run(limiter.acquire(400))
+  assert limiter.wait_time(700) == 6
+
+  limiter.pause(20)
+  assert limiter.wait_time(1) == 20
+  throughput = limiter.throughput()
+  assert throughput["requests_last_minute"] == 1
+  assert throughput["tokens_last_minute"] == 400
+  assert throughput["rate_limited_total"] == 1
+
+  clock.now = 61
+  assert limiter.throughput()["requests_last_minute"] == 0
+
+
+def test_retry_classification_and_retry_after():
+  assert is_retryable_error(_rate_limit_error({}))
+  assert not is_retryable_error(ValueError("bad input"))
+  assert get_retry_after(_rate_limit_error({"retry-after": "2"})) == 2
+  assert get_retry_after(_rate_limit_error({"retry-after-ms": "250"})) == 0.25
+  assert get_retry_after(_rate_limit_error({})) is None
+
+
+def test_interactive_requests_do_not_queue_behind_batches():
+  async def scenario():
+    limiter = EmbeddingRateLimiter(requests_per_minute=1000, tokens_per_minute=1000)
+    await limiter.acquire(1000)
+    # Waits about a minute for the budget, without blocking anybody else
+    batch = asyncio.create_task(limiter.acquire(1000))
+    await asyncio.sleep(0)
+
+    await asyncio.wait_for(limiter.acquire(10, interactive=True), 1)
+
+    # The waiting batch holds its reservation, the next one waits behind it
+    assert limiter.wait_time(10) > 60
+    assert not batch.done()
+    batch.cancel()
+
+  asyncio.run(scenario())
@@ -0,0 +1,44 @@
+import struct
+
+from src.repositories.chunk_repository import _VectorBinaryDumper
+
+
+def test_vector_binary_dumper_matches_pgvector_wire_format():
+  data = _VectorBinaryDumper(list).dump([1.0, -2.5, 0.125])
+
+  assert data[:4] == struct.pack(">HH", 3, 0)
+  assert struct.unpack(">3f", data[4:]) == (1.0, -2.5, 0.125)
+
+
+def test_vector_dumper_is_registered_once_per_connection(monkeypatch):
+  import asyncio
+  from types import SimpleNamespace
+
+  from src.repositories import chunk_repository
+
+  fetches = []
+
+  class FakeTypeInfo:
+    oid = 1234
+
+    @staticmethod
+    async def fetch(conn, name):
+      fetches.append(conn)
+      return FakeTypeInfo()
+
+    def register(self, conn):
+      pass
+
+  class FakeConn:
+    adapters = SimpleNamespace(register_dumper=lambda cls, dumper: None)
+
+  monkeypatch.setattr(chunk_repository, "TypeInfo", FakeTypeInfo)
+  first, second = FakeConn(), FakeConn()
+
+  async def register_all():
+    for conn in [first, first, second, first]:
+      await chunk_repository._register_vector_binary_dumper(conn)
+
+  asyncio.run(register_all())
+
+  assert fetches == [first, second]
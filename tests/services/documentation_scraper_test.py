@@ -0,0 +1,550 @@
+import asyncio
+from contextlib import asynccontextmanager
+import gzip
+from typing import AsyncIterator
+
+from aiohttp import web
+import pytest
+
+from src.models.models import IngestProgress
+from src.services.documentation_scraper import DocumentationScraper, ScraperConfig
+
+PAGES = {
+  "/": '<nav><a href="/a">A</a><a href="/b">B</a></nav><main><h1>Home</h1><p>x</p></main>',
+  "/a": '<main><h1>A</h1><p>about a</p><a href="/">home</a></main>',
+  "/b": '<header><a href="/a">A</a></header><main><h1>B</h1><p>about b</p></main>',
+}
+
+
+class FakeSite:
+  def __init__(self, pages: dict, latency: float = 0.0):
+    self.pages = pages
+    self.latency = latency
+    self.requests: dict = {}
+    self.statuses: dict = {}  # path -> statuses answered before the page
+    self.in_flight = 0
+    self.max_in_flight = 0
+
+  async def handler(self, request: web.Request) -> web.Response:
+    self.requests[request.path] = self.requests.get(request.path, 0) + 1
+    self.in_flight += 1
+    self.max_in_flight = max(self.max_in_flight, self.in_flight)
+    try:
+      await asyncio.sleep(self.latency)
+    finally:
+      self.in_flight -= 1
+    if self.statuses.get(request.path):
+      status, headers = self.statuses[request.path].pop(0)
+      return web.Response(status=status, headers=headers)
+    if request.path not in self.pages:
+      return web.Response(status=404)
+    content = self.pages[request.path]
+    if isinstance(content, bytes):
+      return web.Response(body=content)
+    etag = f'"{hash(content)}"'
+    if request.headers.get("If-None-Match") == etag:
+      return web.Response(status=304, headers={"ETag": etag})
+    return web.Response(text=content, content_type="text/html", headers={"ETag": etag})
+
+
+@asynccontextmanager
+async def _serve(site: FakeSite) -> AsyncIterator[str]:
+  app = web.Application()
+  app.router.add_get("/{tail:.*}", site.handler)
+  runner = web.AppRunner(app)
+  await runner.setup()
+  server = web.TCPSite(runner, "127.0.0.1", 0)
+  await server.start()
+  port = server._server.sockets[0].getsockname()[1]
+  try:
+    yield f"http://127.0.0.1:{port}/"
+  finally:
+    await runner.cleanup()
+
+
+async def _scrape(base_url: str, config: ScraperConfig) -> dict:
+  result = await DocumentationScraper(config).scrape_website(
+    base_url, "test", save_to_disk=False
+  )
+  return result.ok()
+
+
+async def _crawl(site: FakeSite, config: ScraperConfig) -> dict:
+  async with _serve(site) as base_url:
+    return await _scrape(base_url, config)
+
+
+def test_every_page_is_fetched_once():
+  site = FakeSite(PAGES)
+  summary = asyncio.run(
+    _crawl(site, ScraperConfig(max_depth=3, delay_between_requests=0))
+  )
+
+  # Links inside nav/header are found even though extraction removes them
+  assert summary["total_pages"] == 3
+  # robots.txt is read once for the Crawl-delay
+  assert site.requests == {"/robots.txt": 1, "/": 1, "/a": 1, "/b": 1}
+  assert summary["http_requests"] == 4
+  assert summary["stop_reason"] == "frontier_exhausted"
+
+
+def test_crawl_respects_page_budget_and_host_concurrency():
+  links = "".join(f'<a href="/p{i}">{i}</a>' for i in range(20))
+  pages = {"/": f"<main><h1>Index</h1>{links}</main>"}
+  pages.update(
+    {f"/p{i}": f'<main><h1>P{i}</h1><a href="/p{i}/x">x</a></main>' for i in range(20)}
+  )
+  site = FakeSite(pages, latency=0.02)
+
+  summary = asyncio.run(
+    _crawl(
+      site,
+      ScraperConfig(
+        max_pages=6,
+        delay_between_requests=0,
+        max_concurrency=8,
+        max_concurrency_per_host=2,
+      ),
+    )
+  )
+
+  assert summary["total_pages"] == 6
+  assert summary["http_requests"] == 7  # robots.txt included
+  assert summary["stop_reason"] == "max_pages"
+  assert site.max_in_flight <= 2
+  # Breadth first: the budget goes to depth 1 pages, not to their children
+  assert not any(path.endswith("/x") for path in site.requests)
+
+
+def test_crawl_stops_at_wall_clock_budget():
+  site = FakeSite(PAGES, latency=0.3)
+
+  summary = asyncio.run(
+    _crawl(site, ScraperConfig(delay_between_requests=0, max_duration_seconds=0.1))
+  )
+
+  assert summary["stop_reason"] == "max_duration"
+  assert summary["total_pages"] == 0
+
+
+def test_page_errors_do_not_stop_the_workers(monkeypatch):
+  pages = {
+    "/": "<main>" + "".join(f'<a href="/{n}">{n}</a>' for n in range(20)) + "</main>",
+    **{f"/{n}": f"<main><p>page {n}</p></main>" for n in range(20)},
+  }
+  extract = DocumentationScraper._extract_content
+
+  def failing_extract(self, soup, url):
+    if not url.endswith("/"):
+      raise ValueError("broken page")
+    return extract(self, soup, url)
+
+  monkeypatch.setattr(DocumentationScraper, "_extract_content", failing_extract)
+  config = ScraperConfig(delay_between_requests=0, max_concurrency=3, max_pages=10)
+
+  summary = asyncio.run(asyncio.wait_for(_crawl(FakeSite(pages), config), 10))
+
+  assert summary["total_pages"] == 1
+  # Failed pages give their reservation back, so every link is tried
+  assert summary["failed_pages"] == 20
+  assert summary["stop_reason"] == "frontier_exhausted"
+
+
+def test_recrawl_revalidates_with_etags(tmp_path, monkeypatch):
+  site = FakeSite(dict(PAGES))
+  config = ScraperConfig(
+    delay_between_requests=0, cache_path=str(tmp_path / "crawl_cache.sqlite")
+  )
+
+  async def crawl_twice() -> tuple[dict, dict]:
+    async with _serve(site) as base_url:
+      first = await _scrape(base_url, config)
+      site.pages["/b"] = site.pages["/b"].replace("about b", "changed b")
+      monkeypatch.setattr(
+        DocumentationScraper, "_extract_content", tracking_extract_content
+      )
+      return first, await _scrape(base_url, config)
+
+  extracted_urls = []
+  extract_content = DocumentationScraper._extract_content
+
+  def tracking_extract_content(self, soup, url):
+    extracted_urls.append(url)
+    return extract_content(self, soup, url)
+
+  first, second = asyncio.run(crawl_twice())
+
+  assert (first["cache_hits"], first["cache_misses"]) == (0, 3)
+  # Only the changed page is downloaded and parsed again
+  assert second["total_pages"] == 3
+  assert (second["cache_hits"], second["cache_misses"]) == (2, 1)
+  assert [url.rsplit("/", 1)[1] for url in extracted_urls] == ["b"]
+
+
+def test_crawl_cache_is_keyed_by_extraction_settings(tmp_path):
+  from src.services.crawl_cache import CachedPage, CrawlCache
+
+  default_key = ScraperConfig().extraction_fingerprint()
+  legacy_key = ScraperConfig(extractor="legacy").extraction_fingerprint()
+  assert legacy_key != default_key
+  assert ScraperConfig(max_pages=5).extraction_fingerprint() == default_key
+
+  path = tmp_path / "crawl_cache.sqlite"
+  page = CachedPage(etag='"1"', last_modified=None, page_json="{}", links=["/b"])
+  writer = CrawlCache(path, legacy_key, commit_every=2)
+  writer.put("http://docs/a", page)
+  writer.put("http://docs/b", page)
+
+  # Committed while the crawl goes on, other settings do not see the extraction
+  legacy, default = CrawlCache(path, legacy_key), CrawlCache(path, default_key)
+  assert legacy.get("http://docs/b") == page
+  assert default.get("http://docs/b") is None
+  for cache in [writer, legacy, default]:
+    cache.close()
+
+
+def test_sitemaps_seed_the_crawl_and_lastmod_skips_requests(tmp_path):
+  ns = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+  urls = "".join(
+    f"<url><loc>{path}</loc><lastmod>2024-01-0{i}</lastmod></url>"
+    for i, path in enumerate(["/deep/a", "/deep/b", "/api/excluded"], 1)
+  )
+  site = FakeSite(
+    {
+      "/": "<main><h1>Home</h1><p>no links here</p></main>",
+      "/robots.txt": b"User-agent: *\nSitemap: /sitemap_index.xml\n",
+      "/sitemap_index.xml": (
+        f"<sitemapindex {ns}><sitemap><loc>/pages.xml.gz</loc></sitemap></sitemapindex>"
+      ).encode(),
+      "/pages.xml.gz": gzip.compress(f"<urlset {ns}>{urls}</urlset>".encode()),
+      "/deep/a": "<main><h1>A</h1><p>a</p></main>",
+      "/deep/b": "<main><h1>B</h1><p>b</p></main>",
+    }
+  )
+  config = ScraperConfig(
+    delay_between_requests=0,
+    use_sitemap=True,
+    cache_path=str(tmp_path / "crawl_cache.sqlite"),
+  )
+
+  async def crawl_twice() -> tuple[dict, dict]:
+    async with _serve(site) as base_url:
+      first = await _scrape(base_url, config)
+      site.requests.clear()
+      return first, await _scrape(base_url, config)
+
+  first, second = asyncio.run(crawl_twice())
+
+  assert first["sitemap_urls"] == 2
+  assert first["total_pages"] == 3
+  assert second["total_pages"] == 3
+  assert second["lastmod_skips"] == 2
+  # Only the root (no lastmod) and the sitemaps are requested again
+  assert "/deep/a" not in site.requests and "/deep/b" not in site.requests
+  assert site.requests["/"] == 1
+
+
+def test_extraction_pool_matches_in_process_extraction():
+  async def crawl(config: ScraperConfig) -> list:
+    pages: list = []
+
+    async def on_page(page) -> None:
+      pages.append(page.model_dump(exclude={"url", "parent_url", "scraped_at"}))
+
+    async with _serve(FakeSite(PAGES)) as base_url:
+      await DocumentationScraper(config).scrape_website(
+        base_url, "test", on_page=on_page, save_to_disk=False
+      )
+    return sorted(pages, key=lambda page: page["title"])
+
+  in_process = asyncio.run(crawl(ScraperConfig(delay_between_requests=0)))
+  pooled = asyncio.run(
+    crawl(ScraperConfig(delay_between_requests=0, extraction_workers=2, parser="lxml"))
+  )
+
+  assert len(pooled) == 3
+  assert pooled == in_process
+
+
+def test_pages_are_counted_only_after_on_page_succeeds():
+  progress = IngestProgress()
+
+  async def on_page(page) -> None:
+    if page.title == "B":
+      raise RuntimeError("consumer failed")
+
+  async def crawl() -> dict:
+    async with _serve(FakeSite(PAGES)) as base_url:
+      result = await DocumentationScraper(
+        ScraperConfig(delay_between_requests=0)
+      ).scrape_website(
+        base_url, "test", on_page=on_page, save_to_disk=False, progress=progress
+      )
+    return result.ok()
+
+  summary = asyncio.run(crawl())
+
+  assert (summary["total_pages"], summary["failed_pages"]) == (2, 1)
+  assert progress.pages_scraped == 2
+
+
+def test_url_variants_and_rel_canonical_are_fetched_once():
+  site = FakeSite(
+    {
+      "/": (
+        '<main><h1>Home</h1><a href="/a">a</a><a href="/a/">a</a>'
+        '<a href="/a/index.html?utm_source=nav">a</a><a href="/print/a">print</a>'
+        "</main>"
+      ),
+      "/a": "<main><h1>A</h1><p>a</p></main>",
+      "/print/a": (
+        '<head><link rel="canonical" href="/a"></head><main><h1>A</h1></main>'
+      ),
+    }
+  )
+
+  summary = asyncio.run(_crawl(site, ScraperConfig(delay_between_requests=0)))
+
+  assert site.requests == {"/robots.txt": 1, "/": 1, "/a": 1, "/print/a": 1}
+  assert summary["total_pages"] == 2
+  assert summary["duplicate_pages"] == 1
+
+
+API_PAGE = """
+<main>
+  <p>Intro text.</p>
+  <script>ignored()</script>
+  <div class="section">
+    <h2>Usage</h2>
+    <p>Install it first.</p>
+    <pre><code>pip install thing</code></pre>
+    <dl class="api-item"><dt>connect() function</dt></dl>
+    <p>Opens a connection.</p>
+  </div>
+  <h2>Notes</h2>
+  <p>Last words.</p>
+</main>
+"""
+
+
+def test_single_pass_extractor_splits_sections_and_converts_once():
+  from bs4 import BeautifulSoup
+
+  scraper = DocumentationScraper(ScraperConfig())
+  converted: list = []
+  handle = scraper.html_converter.handle
+
+  def counting_handle(html: str) -> str:
+    converted.append(html)
+    return handle(html)
+
+  scraper.html_converter.handle = counting_handle
+  soup = BeautifulSoup(API_PAGE, "html.parser")
+  extracted = scraper._extract_content(soup, "http://docs/api")
+
+  sections = [(s.type, s.title) for s in extracted["structured_content"]]
+  assert sections == [
+    ("content", "Main Content"),
+    ("example", "Usage"),
+    ("function", "connect() function"),
+    ("heading", "Notes"),
+  ]
+  # Every fragment is converted once, the api item title once, the page never whole
+  assert len(converted) == 5
+  raw = extracted["raw_content"]
+  assert "ignored()" not in raw
+  assert raw.index("Intro text.") < raw.index("## Usage") < raw.index("Last words.")
+
+  legacy = DocumentationScraper(ScraperConfig(extractor="legacy"))
+  soup = BeautifulSoup(API_PAGE, "html.parser")
+  legacy_extracted = legacy._extract_content(soup, "http://docs/api")
+  assert [s.type for s in legacy_extracted["structured_content"]] == ["function"]
+
+
+SPHINX_PAGE = """
+<main>
+  <h1>Module</h1>
+  <p>Intro.</p>
+  <dl class="py method">
+    <dt class="sig">Foo.run(x)</dt>
+    <dd><p>Run the thing fast.</p></dd>
+  </dl>
+  <div class="api-item"><p>Untitled item.</p></div>
+</main>
+"""
+
+
+def test_single_pass_extractor_keeps_the_body_of_api_items():
+  from bs4 import BeautifulSoup
+
+  legacy = DocumentationScraper(ScraperConfig(extractor="legacy"))
+  extracted = legacy._extract_content(
+    BeautifulSoup(SPHINX_PAGE, "html.parser"), "http://docs/api"
+  )
+  assert "Run the thing fast." in extracted["structured_content"][-1].content
+
+  scraper = DocumentationScraper(ScraperConfig())
+  extracted = scraper._extract_content(
+    BeautifulSoup(SPHINX_PAGE, "html.parser"), "http://docs/api"
+  )
+  sections = [
+    (s.type, s.title, s.content.strip()) for s in extracted["structured_content"]
+  ]
+  # The signature (dt) starts the section, the body (dd) is its content
+  assert sections == [
+    ("heading", "Module", "Intro."),
+    ("function", "Foo.run(x)", "Run the thing fast.\n\nUntitled item."),
+  ]
+
+
+def test_stream_output_writes_pages_while_crawling(tmp_path):
+  site = FakeSite(PAGES)
+  scraper = DocumentationScraper(
+    ScraperConfig(delay_between_requests=0, stream_output=True)
+  )
+
+  async def run() -> dict:
+    async with _serve(site) as base_url:
+      result = await scraper.scrape_website(base_url, "docs", output_dir=str(tmp_path))
+      return result.ok()
+
+  summary = asyncio.run(run())
+
+  assert summary["total_pages"] == summary["pages_written"] == 3
+  assert scraper.scraped_pages == []
+  output = tmp_path / "docs"
+  assert sorted(p.name for p in output.rglob("*.json")) == [
+    "a.json",
+    "b.json",
+    "index.json",
+    "summary.json",
+  ]
+  assert sorted(page.title for page in scraper.get_scraped_data()) == ["A", "B", "Home"]
+
+
+def test_throttled_pages_are_retried_and_crawl_delay_is_the_floor():
+  site = FakeSite(
+    {**PAGES, "/robots.txt": b"User-agent: *\nCrawl-delay: 0.05\n"},
+  )
+  site.statuses["/a"] = [(429, {"Retry-After": "0.2"})]
+  site.statuses["/b"] = [(503, {})]
+
+  summary = asyncio.run(_crawl(site, ScraperConfig(delay_between_requests=0)))
+
+  assert summary["total_pages"] == 3
+  assert site.requests["/a"] == site.requests["/b"] == 2
+  (host,) = summary["hosts"].values()
+  assert host["requests"] == 5
+  assert host["throttled"] == 2
+  assert host["min_delay_seconds"] == 0.05
+  assert host["delay_seconds"] >= 0.05
+  # 5 requests spaced by at least the Crawl-delay, one waited for Retry-After
+  assert 0 < host["requests_per_second"] < 20
+
+
+def test_recorded_crawl_replays_with_injected_errors(tmp_path):
+  from src.services.replay_server import ReplayServer
+
+  archive_path = str(tmp_path / "site.sqlite")
+  site = FakeSite(dict(PAGES))
+
+  async def record() -> dict:
+    async with _serve(site) as base_url:
+      # An absolute link to the origin, replays must rewrite it
+      site.pages["/b"] += f'<a href="{base_url}c">c</a>'
+      site.pages["/c"] = "<main><h1>C</h1><p>see</p></main>"
+      return await _scrape(
+        base_url, ScraperConfig(delay_between_requests=0, record_path=archive_path)
+      )
+
+  recorded = asyncio.run(record())
+
+  server = ReplayServer(archive_path, latency=0.01, error_rate=0.3, seed=1)
+
+  async def replay() -> dict:
+    async with server.serve() as base_url:
+      return await _scrape(
+        base_url,
+        ScraperConfig(delay_between_requests=0, max_retries=8, max_delay_seconds=0.05),
+      )
+
+  replayed = asyncio.run(replay())
+  server.close()
+
+  assert recorded["total_pages"] == replayed["total_pages"] == 4
+  assert replayed["bytes_downloaded"] == recorded["bytes_downloaded"]
+  # Injected 503s were retried, every page made it
+  assert server.errors_injected > 0
+
+
+def test_stream_output_uploads_pages_during_the_crawl(tmp_path, monkeypatch):
+  moto = pytest.importorskip("moto")
+  from src.core.config import config
+  from src.services import s3_uploader
+
+  for name, value in [
+    ("AWS_ACCESS_KEY_ID", "testing"),
+    ("AWS_SECRET_ACCESS_KEY", "testing"),
+    ("AWS_REGION", "us-east-1"),
+    ("AWS_ENDPOINT_URL", ""),
+    ("AWS_S3_BUCKET_NAME", "docs"),
+  ]:
+    monkeypatch.setattr(config, name, value)
+  submitted: list = []
+  submit = s3_uploader.S3Uploader.submit
+
+  def tracking_submit(self, file_path):
+    submitted.append(file_path.name)
+    submit(self, file_path)
+
+  monkeypatch.setattr(s3_uploader.S3Uploader, "submit", tracking_submit)
+  scraper = DocumentationScraper(
+    ScraperConfig(delay_between_requests=0, stream_output=True)
+  )
+
+  async def run() -> dict:
+    async with _serve(FakeSite(PAGES)) as base_url:
+      result = await scraper.scrape_website(
+        base_url, "docs", send_to_bucket=True, output_dir=str(tmp_path)
+      )
+      return result.ok()
+
+  with moto.mock_aws():
+    s3 = s3_uploader.get_s3_client()
+    s3.create_bucket(Bucket="docs")
+    summary = asyncio.run(run())
+    keys = sorted(obj["Key"] for obj in s3.list_objects_v2(Bucket="docs")["Contents"])
+
+  assert keys == ["docs/a.json", "docs/b.json", "docs/index.json", "docs/summary.json"]
+  assert summary["s3_upload"]["files_uploaded"] == 4
+  # Pages were handed to the uploader as they were written, the summary at the end
+  assert sorted(submitted[:3]) == ["a.json", "b.json", "index.json"]
+  assert submitted[3:] == ["summary.json"]
+
+
+def test_sharded_output_replaces_one_file_per_page(tmp_path):
+  scraper = DocumentationScraper(
+    ScraperConfig(
+      delay_between_requests=0,
+      stream_output=True,
+      output_format="shards",
+      pages_per_shard=2,
+    )
+  )
+
+  async def run() -> dict:
+    async with _serve(FakeSite(PAGES)) as base_url:
+      result = await scraper.scrape_website(base_url, "docs", output_dir=str(tmp_path))
+      return result.ok()
+
+  summary = asyncio.run(run())
+
+  output = tmp_path / "docs"
+  assert sorted(p.name for p in output.iterdir()) == [
+    "manifest.json",
+    "pages-00000.jsonl.gz",
+    "pages-00001.jsonl.gz",
+    "summary.json",
+  ]
+  assert summary["pages_written"] == 3
+  assert sorted(page.title for page in scraper.get_scraped_data()) == ["A", "B", "Home"]
@@ -0,0 +1,66 @@
+import asyncio
+
+from src.services.host_throttle import (
+  HostThrottle,
+  parse_crawl_delay,
+  parse_retry_after,
+)
+
+
+class FakeClock:
+  def __init__(self):
+    self.now = 100.0
+
+  def __call__(self) -> float:
+    return self.now
+
+
+def test_throttle_backs_off_on_429_and_recovers():
+  clock = FakeClock()
+  throttle = HostThrottle(4, min_delay=0.2, target_latency=1.0, clock=clock)
+
+  async def request(status, latency=0.1, retry_after=None):
+    clock.now = max(clock.now, throttle.next_start)  # its turn, no real sleep
+    await throttle.acquire()
+    await throttle.release(status, latency, retry_after)
+
+  asyncio.run(request(429, retry_after=30))
+  assert throttle.concurrency == 2
+  assert throttle.delay == 0.5
+  assert throttle.next_start == clock.now + 30
+
+  asyncio.run(request(None))  # connection error
+  assert (throttle.concurrency, throttle.delay) == (1.5, 0.75)
+
+  for _ in range(20):
+    asyncio.run(request(200))
+  # Back to the floor, never below it
+  assert throttle.concurrency == 4
+  assert throttle.delay == 0.2
+  assert (throttle.requests, throttle.throttled, throttle.errors) == (22, 1, 1)
+
+  asyncio.run(request(200, latency=5.0))  # slow responses also slow down
+  assert throttle.concurrency == 3
+
+
+def test_parse_crawl_delay_and_retry_after():
+  robots = """
+User-agent: Googlebot
+Crawl-delay: 1
+
+User-agent: scraper
+User-agent: other
+Crawl-delay: 3 # seconds
+
+User-agent: *
+Disallow: /private
+Crawl-delay: 7
+"""
+  assert parse_crawl_delay(robots, "Documentation Scraper") == 3
+  assert parse_crawl_delay(robots, "SomeBot") == 7
+  assert parse_crawl_delay("User-agent: *\nDisallow: /", "SomeBot") is None
+
+  assert parse_retry_after("12") == 12
+  assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+  assert parse_retry_after("soon") is None
+  assert parse_retry_after(None) is None
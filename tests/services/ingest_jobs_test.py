@@ -0,0 +1,115 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from result import Err, Ok
+
+from src.services.documentation_scraper import DocumentationScraper, ScraperConfig
+from src.services.ingest_jobs import IngestJobManager, IngestJobStatus
+
+
+class FakePool:
+  def __init__(self):
+    self.in_use = 0
+    self.max_in_use = 0
+
+  @asynccontextmanager
+  async def connection(self):
+    self.in_use += 1
+    self.max_in_use = max(self.max_in_use, self.in_use)
+    try:
+      yield object()
+    finally:
+      self.in_use -= 1
+
+
+def test_jobs_run_in_background_with_bounded_concurrency():
+  async def scenario():
+    pool = FakePool()
+    manager = IngestJobManager(pool, max_concurrent_jobs=2)
+    running = max_running = 0
+
+    async def runner(connection, progress):
+      nonlocal running, max_running
+      running += 1
+      max_running = max(max_running, running)
+      progress.pages_scraped += 1
+      await asyncio.sleep(0.01)  # scraping, no connection held
+      async with connection():
+        await asyncio.sleep(0.01)
+      running -= 1
+      return Ok({"done": True})
+
+    async def failing_runner(connection, progress):
+      return Err("scrape failed")
+
+    jobs = [manager.submit(f"index_{i}", runner) for i in range(4)]
+    failed = manager.submit("broken", failing_runner)
+    assert all(job.status == IngestJobStatus.QUEUED for job in jobs)
+
+    await asyncio.gather(*(job.task for job in [*jobs, failed]))
+
+    assert max_running == 2
+    assert pool.max_in_use == 2
+    assert [job.status for job in jobs] == [IngestJobStatus.COMPLETED] * 4
+    assert jobs[0].to_schema().result == {"done": True}
+    assert jobs[0].to_schema().progress.pagesScraped == 1
+    assert failed.status == IngestJobStatus.FAILED
+    assert failed.error == "scrape failed"
+
+  asyncio.run(scenario())
+
+
+def test_cancel_and_events():
+  async def scenario():
+    manager = IngestJobManager(FakePool(), max_concurrent_jobs=1)
+
+    async def slow_runner(connection, progress):
+      await asyncio.sleep(10)
+      return Ok({})
+
+    job = manager.submit("slow", slow_runner)
+    await asyncio.sleep(0)
+    assert manager.cancel(job.id).is_ok()
+    await asyncio.gather(job.task)
+
+    assert job.status == IngestJobStatus.CANCELLED
+    assert manager.cancel(job.id).is_err()
+    events = [event async for event in manager.events(job.id, interval_seconds=0.01)]
+    assert [event.status for event in events] == [IngestJobStatus.CANCELLED]
+
+  asyncio.run(scenario())
+
+
+def test_cancel_during_a_crawl_cancels_the_job(monkeypatch, tmp_path):
+  crawling = asyncio.Event()
+  pool = FakePool()
+  stored = []
+
+  async def slow_crawl(self, base_url, seed_urls=None):
+    assert pool.in_use == 0  # no connection is held while crawling
+    crawling.set()
+    await asyncio.sleep(10)
+    return "frontier_exhausted"
+
+  monkeypatch.setattr(DocumentationScraper, "_crawl", slow_crawl)
+
+  async def scenario():
+    manager = IngestJobManager(pool, max_concurrent_jobs=1)
+
+    async def runner(connection, progress):
+      scraper = DocumentationScraper(ScraperConfig())
+      scrape_result = await scraper.scrape_website(
+        "http://docs/", "docs", output_dir=str(tmp_path), progress=progress
+      )
+      stored.append(scrape_result)
+      return Ok({})
+
+    job = manager.submit("docs", runner)
+    await crawling.wait()
+    assert manager.cancel(job.id).is_ok()
+    await asyncio.gather(job.task)
+
+    assert job.status == IngestJobStatus.CANCELLED
+    assert stored == []  # the runner did not go on to store the data
+
+  asyncio.run(scenario())
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from src.services.documentation_scraper import ScrapedPage
+from src.services.page_shards import ShardWriter, iter_sharded_pages, read_manifest
+
+
+def _page(n: int) -> ScrapedPage:
+  return ScrapedPage(
+    url=f"https://docs/p{n}", title=f"P{n}", raw_content="x", scraped_at="", depth=1
+  )
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_shards_round_trip_with_manifest(tmp_path, compression):
+  if compression == "zstd":
+    pytest.importorskip("zstandard")
+  writer = ShardWriter(tmp_path, pages_per_shard=2, compression=compression)
+
+  completed = [writer.write(_page(n)) for n in range(5)]
+  written = writer.close()
+
+  # A shard is reported when full, the last one and the manifest on close
+  assert [path.name for path in completed if path] == [
+    f"pages-00000.jsonl.{'gz' if compression == 'gzip' else 'zst'}",
+    f"pages-00001.jsonl.{'gz' if compression == 'gzip' else 'zst'}",
+  ]
+  assert [path.name for path in written][-1] == "manifest.json"
+
+  manifest = read_manifest(tmp_path)
+  assert manifest["pages"] == 5
+  assert [(s["first_page"], s["pages"]) for s in manifest["shards"]] == [
+    (0, 2),
+    (2, 2),
+    (4, 1),
+  ]
+  assert all(s["bytes"] > 0 for s in manifest["shards"])
+  assert [page["title"] for page in iter_sharded_pages(tmp_path)] == [
+    f"P{n}" for n in range(5)
+  ]
+
+
+def test_directory_without_manifest_is_the_legacy_layout(tmp_path):
+  (tmp_path / "index.json").write_text(json.dumps(_page(0).model_dump()))
+
+  assert read_manifest(tmp_path) is None
+  assert list(iter_sharded_pages(tmp_path)) == []
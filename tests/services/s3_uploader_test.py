@@ -0,0 +1,56 @@
+import asyncio
+import json
+
+import pytest
+
+from src.core.config import config
+from src.services import s3_uploader
+
+moto = pytest.importorskip("moto")
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+  monkeypatch.setattr(config, "AWS_ACCESS_KEY_ID", "testing")
+  monkeypatch.setattr(config, "AWS_SECRET_ACCESS_KEY", "testing")
+  monkeypatch.setattr(config, "AWS_REGION", "us-east-1")
+  monkeypatch.setattr(config, "AWS_ENDPOINT_URL", "")
+  monkeypatch.setattr(config, "AWS_S3_BUCKET_NAME", "docs")
+  with moto.mock_aws():
+    s3 = s3_uploader.get_s3_client()
+    s3.create_bucket(Bucket="docs")
+    yield s3
+
+
+def _keys(s3) -> list:
+  return sorted(obj["Key"] for obj in s3.list_objects_v2(Bucket="docs")["Contents"])
+
+
+def test_upload_is_concurrent_and_skips_unchanged_files(bucket, tmp_path):
+  index_dir = tmp_path / "data" / "index"
+  (index_dir / "guide").mkdir(parents=True)
+  for name in ["a", "b", "guide/c"]:
+    (index_dir / f"{name}.json").write_text(json.dumps({"page": name}))
+  (index_dir / "notes.txt").write_text("not uploaded")
+
+  first = asyncio.run(s3_uploader.upload_to_s3(index_dir)).unwrap()
+  assert (first.files_uploaded, first.files_skipped) == (3, 0)
+  assert first.bytes_uploaded > 0
+  assert _keys(bucket) == ["index/a.json", "index/b.json", "index/guide/c.json"]
+
+  (index_dir / "b.json").write_text(json.dumps({"page": "b", "changed": True}))
+  second = asyncio.run(s3_uploader.upload_to_s3(index_dir)).unwrap()
+  assert (second.files_uploaded, second.files_skipped) == (1, 2)
+  body = bucket.get_object(Bucket="docs", Key="index/b.json")["Body"].read()
+  assert json.loads(body)["changed"] is True
+
+
+def test_upload_to_missing_bucket_fails(bucket, tmp_path, monkeypatch):
+  monkeypatch.setattr(config, "AWS_S3_BUCKET_NAME", "missing")
+  (tmp_path / "index").mkdir()
+  (tmp_path / "index" / "a.json").write_text("{}")
+
+  result = asyncio.run(s3_uploader.upload_to_s3(tmp_path / "index"))
+
+  assert result.is_err()
+  assert "client error" in result.err()
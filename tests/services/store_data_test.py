@@ -0,0 +1,308 @@
+import asyncio
+from functools import partial
+import json
+from pathlib import Path
+import time
+
+import pytest
+from result import Err, Ok
+
+from src.core.config import config
+from src.models.models import ChunkData, InsertStats
+from src.rag.chunker import split_into_token_windows, truncate_to_tokens
+from src.services import store_data
+from src.services.documentation_scraper import ScrapedPage
+from src.services.page_shards import ShardWriter
+from src.services.s3_uploader import get_s3_client, upload_to_s3
+
+
+def _fake_process_json_file(file_path: Path):
+  n = int(file_path.stem)
+  time.sleep(0.01 * (n % 3))  # finish out of order
+  if n == 2:
+    return Err("broken file")
+  return Ok(
+    [ChunkData(content=f"{n}-{i}", url="u", char_length=3, tokens=1) for i in range(2)]
+  )
+
+
+def test_collect_chunks_parallel_keeps_order_and_debug_limit(monkeypatch):
+  monkeypatch.setattr(store_data, "_process_json_file", _fake_process_json_file)
+  monkeypatch.setattr(config, "INGEST_PREPROCESS_EXECUTOR", "thread")
+  files = [Path(f"{n}.json") for n in range(10)]
+
+  serial_chunks, serial_files = asyncio.run(
+    store_data._collect_chunks(files, False, 0, workers=1)
+  )
+  parallel_chunks, parallel_files = asyncio.run(
+    store_data._collect_chunks(files, False, 0, workers=4)
+  )
+  assert [c.content for c in parallel_chunks] == [c.content for c in serial_chunks]
+  assert parallel_files == serial_files == 9
+
+  debug_chunks, debug_files = asyncio.run(
+    store_data._collect_chunks(files, True, 5, workers=4)
+  )
+  assert [c.content for c in debug_chunks] == ["0-0", "0-1", "1-0", "1-1", "3-0", "3-1"]
+  assert debug_files == 3
+
+
+class FakeConn:
+  def __init__(self):
+    self.commits = 0
+    self.rollbacks = 0
+
+  async def commit(self):
+    self.commits += 1
+
+  async def rollback(self):
+    self.rollbacks += 1
+
+
+@pytest.fixture()
+def s3_bucket(monkeypatch):
+  """A moto S3 with the "docs" bucket, the config pointed at it."""
+  moto = pytest.importorskip("moto")
+  for name, value in [
+    ("AWS_ACCESS_KEY_ID", "testing"),
+    ("AWS_SECRET_ACCESS_KEY", "testing"),
+    ("AWS_REGION", "us-east-1"),
+    ("AWS_ENDPOINT_URL", ""),
+    ("AWS_S3_BUCKET_NAME", "docs"),
+  ]:
+    monkeypatch.setattr(config, name, value)
+  with moto.mock_aws():
+    s3 = get_s3_client()
+    s3.create_bucket(Bucket="docs")
+    yield s3
+
+
+def test_insert_with_checkpoints_commits_whole_pages(monkeypatch):
+  inserted_batches: list = []
+  checkpoints: list = []
+
+  async def fake_insert_chunks(conn, chunks, provider, index_id, bulk_load, **kwargs):
+    if any(chunk.url == "broken" for chunk in chunks):
+      return Err("embedding failed")
+    inserted_batches.append([chunk.content for chunk in chunks])
+    return Ok(InsertStats(chunks_inserted=len(chunks)))
+
+  async def fake_store_checkpoints(conn, index_id, items):
+    checkpoints.append(items)
+    return Ok(None)
+
+  monkeypatch.setattr(store_data, "insert_chunks", fake_insert_chunks)
+  monkeypatch.setattr(store_data, "store_checkpoints", fake_store_checkpoints)
+  monkeypatch.setattr(config, "INGEST_CHECKPOINT_CHUNKS", 3)
+
+  chunks = [
+    ChunkData(content=f"{url}-{i}", url=url, char_length=3, tokens=1)
+    for url, n in [("a", 2), ("b", 2), ("c", 1), ("broken", 1)]
+    for i in range(n)
+  ]
+  conn = FakeConn()
+
+  result = asyncio.run(
+    store_data._insert_with_checkpoints(conn, 1, chunks, None, bulk_load=True)
+  )
+
+  assert isinstance(result, Err)
+  # Pages are not split between commits, the failed last batch is rolled back
+  assert inserted_batches == [["a-0", "a-1", "b-0", "b-1"]]
+  assert checkpoints == [[("a", 2), ("b", 2)]]
+  assert (conn.commits, conn.rollbacks) == (1, 1)
+
+
+def test_insert_with_checkpoints_skips_pages_with_failed_chunks(monkeypatch):
+  checkpoints: list = []
+
+  async def fake_insert_chunks(conn, chunks, provider, index_id, bulk_load, **kwargs):
+    failed = [chunk for chunk in chunks if chunk.content == "b-1"]
+    return Ok(
+      InsertStats(
+        chunks_inserted=len(chunks) - len(failed),
+        chunks_failed=len(failed),
+        failed_urls={chunk.url for chunk in failed},
+      )
+    )
+
+  async def fake_store_checkpoints(conn, index_id, items):
+    checkpoints.extend(items)
+    return Ok(None)
+
+  monkeypatch.setattr(store_data, "insert_chunks", fake_insert_chunks)
+  monkeypatch.setattr(store_data, "store_checkpoints", fake_store_checkpoints)
+  monkeypatch.setattr(config, "INGEST_CHECKPOINT_CHUNKS", 3)
+
+  chunks = [
+    ChunkData(content=f"{url}-{i}", url=url, char_length=3, tokens=1)
+    for url in ["a", "b", "c"]
+    for i in range(2)
+  ]
+
+  stats = asyncio.run(
+    store_data._insert_with_checkpoints(FakeConn(), 1, chunks, None, bulk_load=True)
+  ).unwrap()
+
+  # "b" is not checkpointed, a resume inserts it again
+  assert checkpoints == [("a", 2), ("c", 2)]
+  assert (stats.chunks_inserted, stats.chunks_failed) == (5, 1)
+
+
+def _fake_chunk_page_data(data, default_url=""):
+  return [
+    ChunkData(
+      content=data["title"],
+      url=data.get("url", default_url),
+      char_length=1,
+      tokens=1,
+    )
+  ]
+
+
+def test_collect_s3_chunks_streams_the_index_prefix(s3_bucket, monkeypatch):
+  monkeypatch.setattr(config, "S3_INGEST_WORKERS", 2)
+  monkeypatch.setattr(store_data, "chunk_page_data", _fake_chunk_page_data)
+
+  objects = {
+    "index/summary.json": {"base_url": "https://docs.example.com"},
+    "other/a.json": {"title": "other index"},
+    "index/broken.json": None,
+    **{f"index/guide/p{n}.json": {"title": f"p{n}"} for n in range(6)},
+    "index/notes.txt": {"title": "not json"},
+  }
+  for key, data in objects.items():
+    body = "{not json" if data is None else json.dumps(data)
+    s3_bucket.put_object(Bucket="docs", Key=key, Body=body)
+
+  result = asyncio.run(store_data._collect_s3_chunks("index", False, 0))
+
+  chunks, objects_processed, summary = result.unwrap()
+  # Listing order, the broken object is skipped like a broken local file
+  assert [chunk.content for chunk in chunks] == [f"p{n}" for n in range(6)]
+  assert chunks[0].url == "s3://docs/index/guide/p0.json"
+  assert objects_processed == 6
+  assert summary == {"base_url": "https://docs.example.com"}
+
+
+def _write_shards(output_path, n_pages: int) -> None:
+  writer = ShardWriter(output_path, pages_per_shard=2)
+  for n in range(n_pages):
+    writer.write(
+      ScrapedPage(url=f"u{n}", title=f"p{n}", raw_content="", scraped_at="", depth=0)
+    )
+  writer.close()
+
+
+def test_sharded_scrapes_are_read_locally_and_from_s3(s3_bucket, tmp_path, monkeypatch):
+  monkeypatch.setattr(store_data, "chunk_page_data", _fake_chunk_page_data)
+  monkeypatch.setattr(config, "INGEST_PREPROCESS_EXECUTOR", "thread")
+  _write_shards(tmp_path / "index", 5)
+  manifest = store_data.read_manifest(tmp_path / "index")
+  shard_files = [tmp_path / "index" / shard["file"] for shard in manifest["shards"]]
+
+  local_chunks, shards_processed = asyncio.run(
+    store_data._collect_chunks(
+      shard_files,
+      False,
+      0,
+      workers=2,
+      process=partial(store_data._process_shard_file, compression="gzip"),
+    )
+  )
+  assert [chunk.content for chunk in local_chunks] == [f"p{n}" for n in range(5)]
+  assert shards_processed == 3
+
+  upload_stats = asyncio.run(upload_to_s3(tmp_path / "index")).unwrap()
+  result = asyncio.run(store_data._collect_s3_chunks("index", False, 0))
+
+  # 3 shards and the manifest, not one object per page
+  assert upload_stats.files_uploaded == 4
+  s3_chunks, objects_processed, _ = result.unwrap()
+  assert [chunk.content for chunk in s3_chunks] == [f"p{n}" for n in range(5)]
+  assert objects_processed == 3
+
+
+def test_incremental_update_adds_removes_and_keeps_unfetched_pages(monkeypatch):
+  def chunk(url: str, content: str) -> ChunkData:
+    return ChunkData(content=content, url=url, char_length=1, tokens=1)
+
+  stored_chunks = {
+    1: chunk("a", "same"),
+    2: chunk("a", "old"),
+    3: chunk("a", "same"),  # duplicate of a kept chunk
+    4: chunk("gone", "failed this crawl"),
+  }
+  deleted: list = []
+  inserted: list = []
+
+  async def fake_get_chunk_identities(conn, index_id):
+    identities: dict = {}
+    for chunk_id, stored in stored_chunks.items():
+      identities.setdefault(stored.identity, []).append(chunk_id)
+    return Ok(identities)
+
+  async def fake_delete_chunks(conn, chunk_ids):
+    deleted.extend(chunk_ids)
+    return Ok(len(chunk_ids))
+
+  async def fake_insert_chunks(conn, chunks, provider, index_id, bulk_load, **kwargs):
+    inserted.extend(chunks)
+    return Ok(InsertStats(chunks_inserted=len(chunks)))
+
+  monkeypatch.setattr(store_data, "get_chunk_identities", fake_get_chunk_identities)
+  monkeypatch.setattr(store_data, "delete_chunks", fake_delete_chunks)
+  monkeypatch.setattr(store_data, "insert_chunks", fake_insert_chunks)
+  new_chunks = [chunk("a", "same"), chunk("a", "new"), chunk("b", "added")]
+
+  conn = FakeConn()
+  result = asyncio.run(
+    store_data._update_index_incrementally(conn, 1, new_chunks, None, True)
+  )
+
+  insert_stats, removed, unchanged, not_refetched = result.unwrap()
+  assert [c.content for c in inserted] == ["new", "added"]
+  assert sorted(deleted) == [2, 3]
+  assert insert_stats.chunks_inserted == 2
+  assert (removed, unchanged, not_refetched) == (2, 1, 1)
+  assert conn.commits == 1
+
+  deleted.clear()
+  result = asyncio.run(
+    store_data._update_index_incrementally(
+      FakeConn(), 1, new_chunks, None, True, prune=True
+    )
+  )
+  assert sorted(deleted) == [2, 3, 4]
+  assert result.unwrap()[3] == 0
+
+
+def test_long_titles_are_truncated_instead_of_starving_the_content(
+  char_encoding, monkeypatch
+):
+  # One token per character
+  monkeypatch.setattr(store_data, "get_embed_token_count", len)
+  monkeypatch.setattr(
+    store_data,
+    "split_into_token_windows",
+    partial(split_into_token_windows, encoding=char_encoding),
+  )
+  monkeypatch.setattr(
+    store_data,
+    "truncate_to_tokens",
+    partial(truncate_to_tokens, encoding=char_encoding),
+  )
+  monkeypatch.setattr(config, "CHUNK_MAX_TOKENS", 100)
+  monkeypatch.setattr(config, "CHUNK_OVERLAP_TOKENS", 0)
+  page = {
+    "url": "u",
+    "title": "P" * 500,
+    "structured_content": [{"title": "S" * 500, "content": "word " * 60}],
+  }
+
+  chunks = store_data.chunk_page_data(page)
+
+  # 300 characters of content in windows of at least 100 - 25 - 8 tokens
+  assert len(chunks) <= 5
+  assert all(chunk.tokens <= 100 for chunk in chunks)
+  assert all(len(chunk.section) <= 25 for chunk in chunks)
@@ -0,0 +1,198 @@
+import asyncio
+
+from result import Err, Ok
+
+from src.core.config import config
+from src.models.models import ChunkData
+from src.rag.providers import LocalEmbeddingProvider
+from src.services import stream_ingest
+from src.services.documentation_scraper import ScrapedPage
+from src.services.stream_ingest import StreamIngestConfig
+
+
+class FakeConn:
+  def __init__(self):
+    self.committed_rows: list = []
+    self.pending_rows: list = []
+    self.rolled_back = False
+
+  async def commit(self):
+    self.committed_rows.extend(self.pending_rows)
+    self.pending_rows = []
+
+  async def rollback(self):
+    self.pending_rows = []
+    self.rolled_back = True
+
+
+def _fake_scraper(n_pages: int):
+  class FakeScraper:
+    def __init__(self, scraper_config):
+      pass
+
+    async def scrape_website(self, base_url, index_name, on_page, **kwargs):
+      for n in range(n_pages):
+        await on_page(
+          ScrapedPage(
+            url=f"u{n}", title=f"p{n}", raw_content="", scraped_at="", depth=0
+          )
+        )
+      return Ok({"total_pages": n_pages})
+
+  return FakeScraper
+
+
+def _fake_chunk_page_data(data, default_url=""):
+  return [
+    ChunkData(content=f"{data['title']}-{i}", url=data["url"], char_length=4, tokens=1)
+    for i in range(3)
+  ]
+
+
+def _setup(monkeypatch, conn: FakeConn, n_pages: int, fail_insert_at: int = 0):
+  checkpoints: list = []
+  inserts = 0
+
+  async def fake_begin(conn, index_name, source_url, resume):
+    return Ok((1, {}))
+
+  async def fake_finish(conn, index_id):
+    return Ok(None)
+
+  async def fake_bulk_insert_chunks(conn, rows):
+    nonlocal inserts
+    inserts += 1
+    if inserts == fail_insert_at:
+      return Err("insert failed")
+    conn.pending_rows.extend(rows)
+    return Ok(len(rows))
+
+  async def fake_store_checkpoints(conn, index_id, pages):
+    # A page is checkpointed only once all of its chunks were inserted
+    inserted_urls = [row[2] for row in conn.committed_rows + conn.pending_rows]
+    for url, n_chunks in pages:
+      assert inserted_urls.count(url) == n_chunks
+    checkpoints.extend(pages)
+    return Ok(None)
+
+  monkeypatch.setattr(stream_ingest, "DocumentationScraper", _fake_scraper(n_pages))
+  monkeypatch.setattr(stream_ingest, "chunk_page_data", _fake_chunk_page_data)
+  monkeypatch.setattr(stream_ingest, "begin_checkpointed_ingest", fake_begin)
+  monkeypatch.setattr(stream_ingest, "finish_checkpointed_ingest", fake_finish)
+  monkeypatch.setattr(stream_ingest, "bulk_insert_chunks", fake_bulk_insert_chunks)
+  monkeypatch.setattr(stream_ingest, "store_checkpoints", fake_store_checkpoints)
+  monkeypatch.setattr(
+    stream_ingest, "get_embedding_provider", lambda: Ok(LocalEmbeddingProvider())
+  )
+  monkeypatch.setattr(config, "EMBEDDING_BATCH_MAX_ITEMS", 4)
+  monkeypatch.setattr(config, "INGEST_CHECKPOINT_CHUNKS", 8)
+  return checkpoints
+
+
+def _run(conn: FakeConn, cache_conn=None, page_queue_size: int = 16):
+  return asyncio.run(
+    asyncio.wait_for(
+      stream_ingest.stream_ingest(
+        conn,
+        "http://docs/",
+        "docs",
+        stream_config=StreamIngestConfig(
+          page_queue_size=page_queue_size, embed_workers=2, batch_linger_seconds=0.01
+        ),
+        cache_conn=cache_conn,
+      ),
+      5,
+    )
+  )
+
+
+def test_stream_ingest_inserts_every_chunk_and_checkpoints_pages(monkeypatch):
+  conn = FakeConn()
+  checkpoints = _setup(monkeypatch, conn, n_pages=7)
+  monkeypatch.setattr(config, "EMBEDDING_CACHE_ENABLED", False)
+
+  scraping_summary, statistics = _run(conn).unwrap()
+
+  assert scraping_summary == {"total_pages": 7}
+  assert (statistics.total_files_processed, statistics.chunks_inserted) == (7, 21)
+  assert sorted(row[0] for row in conn.committed_rows) == sorted(
+    f"p{n}-{i}" for n in range(7) for i in range(3)
+  )
+  assert sorted(checkpoints) == [(f"u{n}", 3) for n in range(7)]
+  assert not conn.pending_rows
+
+
+def test_stream_ingest_looks_up_the_cache_on_its_own_connection(monkeypatch):
+  conn, cache_conn = FakeConn(), FakeConn()
+  _setup(monkeypatch, conn, n_pages=2)
+  monkeypatch.setattr(config, "EMBEDDING_CACHE_ENABLED", True)
+  cache_conns: list = []
+
+  async def fake_embed_chunks_cached(cache_conn, provider, chunks, progress):
+    cache_conns.append(cache_conn)
+    results = await stream_ingest.embed_chunks(provider, chunks)
+    return Ok((results, 0, len(chunks)))
+
+  monkeypatch.setattr(stream_ingest, "embed_chunks_cached", fake_embed_chunks_cached)
+
+  statistics = _run(conn, cache_conn=cache_conn).unwrap()[1]
+
+  assert statistics.chunks_inserted == 6
+  assert cache_conns and all(c is cache_conn for c in cache_conns)
+
+
+def test_stream_ingest_stops_every_stage_when_one_fails(monkeypatch):
+  conn = FakeConn()
+  _setup(monkeypatch, conn, n_pages=50, fail_insert_at=2)
+  monkeypatch.setattr(config, "EMBEDDING_CACHE_ENABLED", False)
+
+  # Small queues: the scraper is blocked on a full queue when the insert fails
+  result = _run(conn, page_queue_size=1)
+
+  assert isinstance(result, Err)
+  assert "insert failed" in result.err()
+  assert conn.rolled_back
+  assert not conn.committed_rows
+
+
+def test_stream_ingest_does_not_checkpoint_pages_with_failed_chunks(monkeypatch):
+  conn = FakeConn()
+  checkpoints = _setup(monkeypatch, conn, n_pages=4)
+  monkeypatch.setattr(config, "EMBEDDING_CACHE_ENABLED", False)
+
+  async def fake_embed_chunks(provider, chunks, progress=None):
+    return [
+      Err("embedding failed") if chunk.content == "p1-2" else Ok([0.0])
+      for chunk in chunks
+    ]
+
+  monkeypatch.setattr(stream_ingest, "embed_chunks", fake_embed_chunks)
+
+  statistics = _run(conn).unwrap()[1]
+
+  assert statistics.chunks_inserted == 11
+  assert sorted(checkpoints) == [("u0", 3), ("u2", 3), ("u3", 3)]
+
+
+def test_stream_ingest_chunks_a_repeated_url_once(monkeypatch):
+  conn = FakeConn()
+  checkpoints = _setup(monkeypatch, conn, n_pages=0)
+  monkeypatch.setattr(config, "EMBEDDING_CACHE_ENABLED", False)
+
+  class RepeatingScraper:
+    def __init__(self, scraper_config):
+      pass
+
+    async def scrape_website(self, base_url, index_name, on_page, **kwargs):
+      for url in ["u0", "u1", "u0"]:
+        await on_page(
+          ScrapedPage(url=url, title=url, raw_content="", scraped_at="", depth=0)
+        )
+      return Ok({"total_pages": 3})
+
+  monkeypatch.setattr(stream_ingest, "DocumentationScraper", RepeatingScraper)
+
+  statistics = _run(conn).unwrap()[1]
+
+  assert statistics.chunks_inserted == 6
+  assert sorted(checkpoints) == [("u0", 3), ("u1", 3)]
@@ -0,0 +1,43 @@
+from src.utils.url_utils import (
+  VisitedUrls,
+  canonicalize_url,
+  clean_url,
+  compile_patterns,
+)
+
+
+def test_canonicalize_url_merges_variants_of_a_page():
+  variants = [
+    "https://Docs.Example.com/guide/page",
+    "https://docs.example.com/guide/page/",
+    "https://docs.example.com:443/guide/page/index.html",
+    "https://docs.example.com/guide/page?utm_source=x&utm_medium=y#install",
+  ]
+  assert {canonicalize_url(url) for url in variants} == {
+    "https://docs.example.com/guide/page"
+  }
+  assert canonicalize_url("http://example.com") == "http://example.com/"
+  assert canonicalize_url("http://example.com/p?b=2&a=1") == (
+    "http://example.com/p?a=1&b=2"
+  )
+  assert canonicalize_url("http://example.com:8080/") == "http://example.com:8080/"
+
+
+def test_clean_url_keeps_meaningful_query():
+  assert clean_url("https://e.com/s?q=a+b&gclid=x#top") == "https://e.com/s?q=a+b"
+  # ref often selects content (a git ref, a release), it is not dropped
+  assert clean_url("https://e.com/s?ref=v2&utm_source=x") == "https://e.com/s?ref=v2"
+  assert clean_url("https://e.com/s?version=2&flag") == "https://e.com/s?version=2&flag"
+
+
+def test_compile_patterns_and_visited_urls():
+  assert compile_patterns([]) is None
+  pattern = compile_patterns([r".*\.pdf$", r"/api/"])
+  assert pattern.search("https://e.com/FILE.PDF")
+  assert not pattern.search("https://e.com/docs")
+
+  visited = VisitedUrls()
+  visited.add("https://e.com/docs/")
+  assert "https://E.com/docs#x" in visited
+  assert "https://e.com/other" not in visited
+  assert len(visited) == 1